@@ -2,12 +2,30 @@ import serial
 import serial.tools.list_ports
 import tkinter as tk
 from tkinter import ttk, messagebox
-import socket
-import threading
+import argparse
+import os
+import sys
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.command_server import COMMAND_FRAMINGS, CommandServer
+from common.gui_bus import GuiBus
+from common.serial_reader import SerialReader, TelemetryOutlet
+from common.serial_writer import SerialWriter
 
 # Variables globales
 arduino = None  # Objeto para la conexión serial
-client_socket = None  # Socket del cliente conectado
+server = None  # Servidor de comandos (varios estudiantes a la vez)
+
+HOST_SERVIDOR = '0.0.0.0'  # Dirección de escucha (todas las interfaces)
+PUERTO_SERVIDOR = 5555  # Puerto al que se conectan los estudiantes
+FORMATO_COMANDOS = 'line'  # 'line' (un comando por línea) o 'length' (prefijo de longitud)
+PUERTO_UDP = None  # Puerto UDP opcional para control continuo (p. ej. 5556); None = solo TCP
+MAX_LINEAS_LOG = 1000  # Líneas conservadas en el área de mensajes
+COLA_SERIE = 64  # Comandos pendientes como máximo en el escritor serie
+POLITICA_SERIE = 'drop_oldest'  # drop_oldest, drop_newest o block (contrapresión)
+SECUENCIA_SERIE = False  # Prefijar "@<seq> " a cada comando; el Arduino responde "ACK <seq>"
+FORMATO_TELEMETRIA = 'line'  # 'line' ("T v1,v2") o 'binary' (tramas con checksum)
 
 # Función para detectar los puertos disponibles
 def detectar_puertos():
@@ -23,52 +41,62 @@ def conectar_arduino():
     if port and baudrate:
         try:
             arduino = serial.Serial(port, int(baudrate), timeout=1)
+            writer.set_port(arduino)
+            reader.set_port(arduino)
             messagebox.showinfo("Conexión", f"Conectado a {port} con {baudrate} baud.")
         except serial.SerialException:
             messagebox.showerror("Error", "No se pudo conectar al puerto seleccionado.")
     else:
         messagebox.showwarning("Advertencia", "Seleccione un puerto y un baudrate.")
 
-# Función para manejar mensajes del cliente
-def handle_client(sock, address):
-    global client_socket, arduino
-    client_socket = sock
-    print(f"Cliente conectado desde {address}")
-    
-    while True:
-        try:
-            message = sock.recv(1024).decode('utf-8')
-            if not message:
-                break
-            
-            # Mostrar el mensaje recibido en la interfaz
-            mensaje_recibido.insert(tk.END, f"Mensaje recibido: {message}\n")
-            mensaje_recibido.see(tk.END)
-            
-            # Si Arduino está conectado, enviar el mensaje
-            if arduino and arduino.is_open:
-                arduino.write((message + "\n").encode())
-                mensaje_recibido.insert(tk.END, f"Enviado a Arduino: {message}\n")
-                mensaje_recibido.see(tk.END)
-            
-        except:
-            break
-    
-    sock.close()
-    client_socket = None
-    print(f"Cliente desconectado: {address}")
-
-# Función para iniciar el servidor socket
-def start_server():
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(('192.168.0.47', 8000))
-    server.listen(1)
-    print("Servidor iniciado en puerto 5555")
+# Función para registrar los comandos ya escritos (desde el hilo escritor)
+def comandos_escritos(comandos):
+    for comando in comandos:
+        bus.post('log', f"Enviado a Arduino: {comando}")
+
+# Función para publicar la telemetría del Arduino (desde el hilo lector)
+def telemetria_recibida(valores):
+    telemetria.push(valores)
+
+    # Reenviar la telemetría a los estudiantes conectados
+    server.send_all(f"TELEMETRIA {','.join(f'{v:g}' for v in valores)}\n".encode())
+
+# Función para mostrar el histograma de RTT de los comandos confirmados
+def mostrar_rtt():
+    bus.post('log', writer.format_rtt_histogram())
+
+# Función para actualizar las métricas del puerto serie (hilo de Tk)
+def actualizar_metricas():
+    metricas_label.config(text=writer.format_stats())
+    clientes_label.config(text=server.format_stats())
+    root.after(1000, actualizar_metricas)
+
+# Función para mostrar mensajes en lote (se ejecuta en el hilo de Tk)
+def mostrar_mensajes(mensajes):
+    mensaje_recibido.insert(tk.END, "".join(f"{m}\n" for m in mensajes))
+    mensaje_recibido.delete("1.0", f"end-{MAX_LINEAS_LOG + 1}l")
+    mensaje_recibido.see(tk.END)
+
+# Función para manejar cada comando recibido (desde el hilo del servidor)
+def comando_recibido(message, client):
+    # Mostrar el mensaje recibido en la interfaz
+    bus.post('log', f"Mensaje recibido de {client.address[0]}: {message}")
     
-    while True:
-        client_sock, address = server.accept()
-        client_handler = threading.Thread(target=handle_client, args=(client_sock, address))
-        client_handler.start()
+    # Si Arduino está conectado, enviar el mensaje
+    if arduino and arduino.is_open:
+        # El hilo escritor hace el write; aquí solo se encola
+        if not writer.send(message):
+            bus.post('log', f"Descartado (cola serie llena): {message}")
+
+# Opciones del servidor de comandos
+parser = argparse.ArgumentParser(description="Master - Control Arduino")
+parser.add_argument('--host', default=HOST_SERVIDOR, help='Dirección de escucha')
+parser.add_argument('--port', type=int, default=PUERTO_SERVIDOR, help='Puerto de escucha')
+parser.add_argument('--framing', choices=COMMAND_FRAMINGS, default=FORMATO_COMANDOS,
+                    help='Delimitación de comandos en el socket')
+parser.add_argument('--udp-port', type=int, default=PUERTO_UDP,
+                    help='Aceptar también comandos por UDP en este puerto')
+args = parser.parse_args()
 
 # Crear ventana principal
 root = tk.Tk()
@@ -97,6 +125,17 @@ baudrate_dropdown.grid(row=1, column=1, padx=5, pady=5)
 # Botón para conectar
 ttk.Button(frame_conexion, text="Conectar", command=conectar_arduino).grid(row=1, column=2, padx=5, pady=5)
 
+# Botón para ver el histograma de RTT (requiere SECUENCIA_SERIE)
+ttk.Button(frame_conexion, text="RTT", command=mostrar_rtt).grid(row=2, column=2, padx=5, pady=5)
+
+# Métricas del escritor serie (cola, throughput, descartes)
+metricas_label = ttk.Label(frame_conexion, text="Cola: -")
+metricas_label.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
+# Clientes conectados y su tasa de comandos
+clientes_label = ttk.Label(frame_conexion, text="Clientes: 0")
+clientes_label.grid(row=3, column=0, columnspan=3, padx=5, pady=5, sticky="w")
+
 # Frame para mostrar mensajes recibidos
 frame_mensajes = ttk.LabelFrame(root, text="Mensajes Recibidos")
 frame_mensajes.pack(pady=10, padx=10, fill="both", expand=True)
@@ -110,9 +149,33 @@ scrollbar = ttk.Scrollbar(frame_mensajes, command=mensaje_recibido.yview)
 scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 mensaje_recibido.config(yscrollcommand=scrollbar.set)
 
-# Iniciar el servidor en un hilo separado
-server_thread = threading.Thread(target=start_server, daemon=True)
-server_thread.start()
+# Bus de mensajes: los hilos de red solo encolan, Tk vacía la cola por lotes
+bus = GuiBus(root)
+bus.subscribe('log', mostrar_mensajes)
+bus.start()
+
+# Escritor serie en su propio hilo: cola acotada, fusión de consignas y métricas
+writer = SerialWriter(COLA_SERIE, POLITICA_SERIE, seq_ids=SECUENCIA_SERIE)
+writer.on_written = comandos_escritos
+writer.on_error = lambda e: bus.post('log', f"Error de escritura serie: {e}")
+writer.start()
+
+# Lector serie en su propio hilo: ACK (RTT por comando), telemetría (LSL) y mensajes del Arduino
+telemetria = TelemetryOutlet()
+reader = SerialReader(FORMATO_TELEMETRIA)
+reader.on_ack = writer.acknowledge
+reader.on_telemetry = telemetria_recibida
+reader.on_line = lambda linea: bus.post('log', f"Arduino: {linea}")
+reader.start()
+
+# Servidor de comandos asyncio en un hilo separado: varios clientes, comandos delimitados
+server = CommandServer(args.host, args.port, args.framing, args.udp_port)
+server.on_command = comando_recibido
+server.start()
+print(f"Servidor iniciado en {args.host}:{args.port} (comandos '{args.framing}')")
+if args.udp_port is not None:
+    print(f"Comandos UDP en {args.host}:{args.udp_port}")
+actualizar_metricas()
 
 # Ejecutar la interfaz
 root.mainloop() 
\ No newline at end of file
@@ -1,19 +1,51 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox
 import socket
 import threading
+import time
+import os
+import sys
+from collections import deque
+
+import numpy as np
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.command_server import COMMAND_FRAMINGS, PING, PONG, encode_command, encode_datagram, tune_socket
+from common.gui_bus import GuiBus
+
+HOST_MASTER = '192.168.0.47'  # Dirección del master
+PUERTO_MASTER = 5555
+FORMATO_COMANDOS = 'line'  # Debe coincidir con el del master
+PUERTO_UDP_MASTER = 5556  # Puerto UDP del master (transporte 'udp')
 
 class ArduinoStudent:
-    def __init__(self):
+    def __init__(self, host=HOST_MASTER, port=PUERTO_MASTER, framing=FORMATO_COMANDOS, transport='tcp',
+                 udp_port=PUERTO_UDP_MASTER):
         self.root = tk.Tk()
         self.root.title("Student - Envío de Comandos")
         self.root.geometry("400x300")
         
+        self.host = host
+        self.port = port
+        self.framing = framing  # Delimitación de cada comando en el flujo TCP
+        self.transport = transport  # 'tcp' o 'udp' (sin retransmisiones, gana el último comando)
+        self.udp_port = udp_port
+        self.seq = 0  # Secuencia de los datagramas UDP
+        self.rtts = deque(maxlen=100)  # Últimas latencias PING -> PONG (s)
         self.socket = None
         self.connected = False
         
         self.setup_gui()
         
+        # La telemetría llega en un hilo de red; Tk la muestra por lotes
+        self.bus = GuiBus(self.root)
+        self.bus.subscribe('log', self.log_messages)
+        self.bus.subscribe('telemetria', self.mostrar_telemetria, coalesce=True)
+        self.bus.subscribe('desconexion', self.conexion_perdida, coalesce=True)
+        self.bus.start()
+    
     def setup_gui(self):
         # Frame de conexión
         frame_conexion = ttk.LabelFrame(self.root, text="Conexión al Master")
@@ -23,6 +55,10 @@ class ArduinoStudent:
         self.btn_conectar = ttk.Button(frame_conexion, text="Conectar al Master", command=self.toggle_connection)
         self.btn_conectar.pack(pady=5)
         
+        # Última telemetría del Arduino reenviada por el master
+        self.telemetria_label = ttk.Label(frame_conexion, text="Telemetría: -")
+        self.telemetria_label.pack(pady=5)
+        
         # Frame para enviar comandos
         frame_comando = ttk.LabelFrame(self.root, text="Enviar Comando")
         frame_comando.pack(pady=10, padx=10, fill="both")
@@ -36,22 +72,35 @@ class ArduinoStudent:
         self.btn_enviar.pack(pady=5)
         self.btn_enviar.config(state="disabled")
         
+        # Sonda de latencia hasta el master
+        self.btn_ping = ttk.Button(frame_comando, text="Ping", command=self.enviar_ping)
+        self.btn_ping.pack(pady=5)
+        self.btn_ping.config(state="disabled")
+        
         # Área de mensajes
         frame_mensajes = ttk.LabelFrame(self.root, text="Registro de Mensajes")
         frame_mensajes.pack(pady=10, padx=10, fill="both", expand=True)
         
         self.mensaje_log = tk.Text(frame_mensajes, height=8)
         self.mensaje_log.pack(pady=5, padx=5, fill="both", expand=True)
-        
+    
     def toggle_connection(self):
         if not self.connected:
             try:
-                self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.socket.connect(('192.168.0.47', 5555))
+                if self.transport == 'udp':
+                    self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    tune_socket(self.socket)
+                    self.socket.connect((self.host, self.udp_port))
+                else:
+                    self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    tune_socket(self.socket)
+                    self.socket.connect((self.host, self.port))
                 self.connected = True
                 self.btn_conectar.config(text="Desconectar")
                 self.btn_enviar.config(state="normal")
-                self.log_message("Conectado al master")
+                self.btn_ping.config(state="normal")
+                self.log_message(f"Conectado al master ({self.transport.upper()})")
+                threading.Thread(target=self.recibir_datos, args=(self.socket,), daemon=True).start()
             except ConnectionRefusedError:
                 messagebox.showerror("Error", "No se pudo conectar al master. Asegúrese de que esté en ejecución.")
             except:
@@ -63,17 +112,26 @@ class ArduinoStudent:
                 self.connected = False
                 self.btn_conectar.config(text="Conectar al Master")
                 self.btn_enviar.config(state="disabled")
+                self.btn_ping.config(state="disabled")
                 self.log_message("Desconectado del master")
     
+    def enviar(self, texto):
+        # Un comando por mensaje: datagrama con secuencia (UDP) o comando delimitado (TCP)
+        if self.transport == 'udp':
+            self.socket.send(encode_datagram(self.seq, texto))
+            self.seq += 1
+        else:
+            self.socket.sendall(encode_command(texto, self.framing))
+    
     def enviar_comando(self):
         if not self.connected:
             messagebox.showwarning("Advertencia", "No hay conexión con el master")
             return
-            
+        
         comando = self.entrada_comando.get().strip()
         if comando:
             try:
-                self.socket.send(comando.encode())
+                self.enviar(comando)
                 self.log_message(f"Comando enviado: {comando}")
                 self.entrada_comando.delete(0, tk.END)
             except:
@@ -82,6 +140,62 @@ class ArduinoStudent:
         else:
             messagebox.showwarning("Advertencia", "Ingrese un comando")
     
+    def enviar_ping(self):
+        try:
+            self.enviar(f"{PING} {time.perf_counter_ns()}")
+        except OSError:
+            messagebox.showerror("Error", "Error al enviar el ping")
+            self.toggle_connection()
+    
+    def recibir_pong(self, texto):
+        # El master devuelve el instante de envío: RTT con el reloj local
+        try:
+            rtt = (time.perf_counter_ns() - int(texto.split()[1])) / 1e9
+        except (IndexError, ValueError):
+            return
+        self.rtts.append(rtt)
+        p50, p95 = np.percentile(self.rtts, (50, 95)) * 1000
+        self.bus.post('log', f"Ping: {rtt * 1000:.2f} ms (p50/p95: {p50:.2f}/{p95:.2f} ms)")
+    
+    def recibir_datos(self, sock):
+        # Líneas del master: "TELEMETRIA v1,v2,...", "PONG <t>" u otros mensajes de texto
+        buffer = b''
+        while True:
+            try:
+                data = sock.recv(1024)
+            except ConnectionRefusedError:
+                # UDP: el master aún no escucha (ICMP); seguir esperando
+                continue
+            except OSError:
+                break
+            if not data:
+                break
+            *lineas, buffer = (buffer + data).split(b'\n')
+            for linea in lineas:
+                texto = linea.decode('utf-8', errors='replace').strip()
+                if texto.startswith("TELEMETRIA "):
+                    self.bus.post('telemetria', texto.split(' ', 1)[1])
+                elif texto.startswith(PONG):
+                    self.recibir_pong(texto)
+                elif texto:
+                    self.bus.post('log', f"Master: {texto}")
+        
+        # El master cerró la conexión o hubo un error: la interfaz se actualiza en el hilo de Tk
+        self.bus.post('desconexion', sock)
+    
+    def conexion_perdida(self, sock):
+        # Ignorar avisos de conexiones anteriores o de una desconexión pedida por el usuario
+        if sock is self.socket and self.connected:
+            self.log_message("El master cerró la conexión")
+            self.toggle_connection()
+    
+    def mostrar_telemetria(self, valores):
+        self.telemetria_label.config(text=f"Telemetría: {valores}")
+    
+    def log_messages(self, messages):
+        for message in messages:
+            self.log_message(message)
+    
     def log_message(self, message):
         self.mensaje_log.insert(tk.END, f"{message}\n")
         self.mensaje_log.see(tk.END)
@@ -90,5 +204,14 @@ class ArduinoStudent:
         self.root.mainloop()
 
 if __name__ == "__main__":
-    app = ArduinoStudent()
+    parser = argparse.ArgumentParser(description="Student - Envío de Comandos")
+    parser.add_argument('--host', default=HOST_MASTER, help='Dirección del master')
+    parser.add_argument('--port', type=int, default=PUERTO_MASTER, help='Puerto del master')
+    parser.add_argument('--framing', choices=COMMAND_FRAMINGS, default=FORMATO_COMANDOS,
+                        help='Delimitación de comandos en el socket')
+    parser.add_argument('--transport', choices=('tcp', 'udp'), default='tcp',
+                        help='Transporte de los comandos (udp: menor latencia, sin retransmisiones)')
+    parser.add_argument('--udp-port', type=int, default=PUERTO_UDP_MASTER, help='Puerto UDP del master')
+    args = parser.parse_args()
+    app = ArduinoStudent(args.host, args.port, args.framing, args.transport, args.udp_port)
     app.run() 
\ No newline at end of file
@@ -0,0 +1,276 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Permitir importar common/ y los simuladores/receptores de eeg_simulation/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'eeg_simulation'))
+
+# Transportes comparados: LSL y socket TCP con protocolo binario o JSON
+TRANSPORTS = ('lsl', 'socket-binary', 'socket-json')
+
+def memory_mb():
+    # Memoria residente actual; psutil si está instalado, si no /proc o el pico de getrusage
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB en Linux
+    except ImportError:
+        return None
+
+class TransportBenchmark:
+    def __init__(self, transport, n_channels, srate, chunk_size, duration=3.0, warmup=0.5, port=5600,
+                 connect_timeout=10.0):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Transporte desconocido: {transport} (opciones: {', '.join(TRANSPORTS)})")
+
+        # Un caso: productor y consumidor en este proceso, sin GUI
+        self.transport = transport
+        self.n_channels = n_channels
+        self.srate = srate
+        self.chunk_size = chunk_size
+        self.duration = duration  # Segundos de emisión medidos
+        self.warmup = warmup  # Segundos iniciales excluidos de las latencias
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.simulator = None
+        self.receiver = None
+
+        # Medidas del consumidor (hilo de recepción)
+        self.received = 0
+        self.latencies = []
+        self.start_time = None
+
+    def create(self):
+        # Importar solo lo que usa el transporte (pylsl no es necesario para los sockets)
+        if self.transport == 'lsl':
+            from pylsl import local_clock
+            from eeg_receiver import EEGReceiver
+            from eeg_simulator import EEGSimulator
+            self.clock = local_clock
+            self.simulator = EEGSimulator(self.n_channels, self.srate, self.chunk_size)
+            self.receiver = EEGReceiver(self.n_channels, max_chunk_len=max(1024, self.chunk_size))
+        else:
+            from socket_eeg_receiver import SocketEEGReceiver
+            from socket_eeg_simulator import SocketEEGSimulator
+            from common.scheduler import default_clock
+            self.clock = default_clock()
+            self.simulator = SocketEEGSimulator(self.n_channels, self.srate, self.chunk_size,
+                                                host='127.0.0.1', port=self.port)
+            self.receiver = SocketEEGReceiver(self.n_channels, '127.0.0.1', self.port,
+                                              binary=self.transport == 'socket-binary',
+                                              max_chunk_len=max(256, self.chunk_size))
+        self.receiver.on_chunk = self.on_chunk
+
+    def on_chunk(self, chunk, timestamps, received):
+        # Latencia de un sentido de cada muestra: llegada menos su timestamp (mismo reloj). Incluye
+        # lo que esperan las primeras muestras del bloque a que se complete y a que se lea
+        self.received += len(chunk)
+        if timestamps is None or self.start_time is None:
+            return
+        if received - self.start_time >= self.warmup:
+            self.latencies.append(received - np.atleast_1d(np.asarray(timestamps, dtype=np.float64)))
+
+    def wait_connected(self):
+        # El productor no emite hasta que el consumidor está listo: toda muestra enviada cuenta
+        deadline = time.monotonic() + self.connect_timeout
+        while time.monotonic() < deadline:
+            if self.transport == 'lsl':
+                if self.receiver.srate is not None:
+                    time.sleep(0.5)  # Dar tiempo a que el inlet abra el stream
+                    return
+            elif self.simulator.server.client_count() > 0 and (self.receiver.srate is not None
+                                                               or self.transport == 'socket-json'):
+                return  # En JSON la frecuencia llega con el primer mensaje
+            time.sleep(0.05)
+        raise TimeoutError("El consumidor no se conectó a tiempo")
+
+    def run(self):
+        self.create()
+        try:
+            self.receiver.start()
+            self.wait_connected()
+
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            self.start_time = self.clock()
+            self.simulator.start()
+            time.sleep(self.duration)
+            self.simulator.stop()
+            self.simulator.stream_thread.join()
+            elapsed = time.perf_counter() - wall_start
+
+            # Esperar a que deje de llegar lo que está en tránsito
+            previous = -1
+            while previous != self.received:
+                previous = self.received
+                time.sleep(0.25)
+            cpu = time.process_time() - cpu_start
+            wall = time.perf_counter() - wall_start
+            return self.result(elapsed, cpu / wall * 100)
+        finally:
+            self.close()
+
+    def result(self, elapsed, cpu_percent):
+        scheduler = self.simulator.scheduler.stats()
+        sent = self.simulator.scheduler.sample_count - scheduler['skipped_samples']
+        lost = max(sent - self.received, 0)
+        latencies = np.concatenate(self.latencies) * 1000 if self.latencies else np.array([])
+        percentiles = np.percentile(latencies, (50, 95, 99)) if len(latencies) else [None] * 3
+        return {
+            'transport': self.transport,
+            'channels': self.n_channels,
+            'srate': self.srate,
+            'chunk_size': self.chunk_size,
+            'duration_s': elapsed,
+            'sent_samples': int(sent),
+            'received_samples': int(self.received),
+            'lost_samples': int(lost),
+            'loss_percent': lost / sent * 100 if sent else 0.0,
+            'skipped_samples': int(scheduler['skipped_samples']),  # Descartadas por el productor
+            'throughput_samples_per_s': self.received / elapsed,
+            'throughput_mb_per_s': self.received * self.n_channels * 4 / elapsed / 2 ** 20,
+            'latency_p50_ms': percentiles[0],
+            'latency_p95_ms': percentiles[1],
+            'latency_p99_ms': percentiles[2],
+            'latency_max_ms': float(latencies.max()) if len(latencies) else None,
+            'cpu_percent': cpu_percent,  # Productor + consumidor, % de un núcleo
+            'memory_mb': memory_mb(),
+            'error': None,
+        }
+
+    def close(self):
+        if self.receiver is not None:
+            self.receiver.stop()
+        if self.simulator is not None:
+            self.simulator.stop()
+            if self.transport != 'lsl':
+                self.simulator.close()
+
+def run_case(case, path):
+    # Proceso hijo: un caso aislado (memoria, CPU y estado de LSL independientes)
+    try:
+        result = TransportBenchmark(**case).run()
+    except Exception as e:
+        result = dict(transport=case['transport'], channels=case['n_channels'], srate=case['srate'],
+                      chunk_size=case['chunk_size'], error=f"{type(e).__name__}: {e}")
+    with open(path, 'w') as f:
+        json.dump(result, f)
+
+def run_subprocess(case, timeout):
+    # El resultado vuelve en un fichero: la salida estándar del hijo mezcla mensajes de varios hilos
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'result.json')
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(case),
+                            '--case-output', path], capture_output=True, timeout=timeout)
+            with open(path) as f:
+                return json.load(f)
+        except (subprocess.TimeoutExpired, OSError, ValueError) as e:
+            error = f"El proceso terminó sin resultado ({type(e).__name__})"
+    return dict(transport=case['transport'], channels=case['n_channels'], srate=case['srate'],
+                chunk_size=case['chunk_size'], error=error)
+
+def environment():
+    # Contexto de la ejecución para comparar resultados entre máquinas y versiones
+    meta = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+    }
+    try:
+        import pylsl
+        meta['pylsl'] = pylsl.__version__
+    except (ImportError, AttributeError):
+        meta['pylsl'] = None
+    try:
+        meta['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                        capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        meta['commit'] = None
+    return meta
+
+def format_result(result):
+    name = f"{result['transport']:<14} {result['channels']:>4} ch {result['srate']:>6g} Hz {result['chunk_size']:>4}/bloque"
+    if result.get('error'):
+        return f"{name} | Error: {result['error']}"
+    p50, p99 = result['latency_p50_ms'], result['latency_p99_ms']
+    latency = "-" if p50 is None else f"{p50:.2f}/{p99:.2f} ms"
+    return (f"{name} | {result['throughput_samples_per_s']:9.0f} muestras/s | "
+            f"Pérdidas: {result['loss_percent']:.2f} % | Latencia p50/p99: {latency} | "
+            f"CPU: {result['cpu_percent']:.0f} % | Memoria: {result['memory_mb'] or 0:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia y throughput de los transportes EEG")
+    parser.add_argument('--transports', nargs='+', choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument('--channels', type=int, nargs='+', default=[8, 32, 64, 128, 256])
+    parser.add_argument('--srates', type=float, nargs='+', default=[100, 250, 1000, 4000])
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[1, 10, 32])
+    parser.add_argument('--duration', type=float, default=3.0, help='Segundos de emisión por caso')
+    parser.add_argument('--warmup', type=float, default=0.5, help='Segundos iniciales sin medir latencia')
+    parser.add_argument('--port', type=int, default=5600, help='Primer puerto TCP (uno por caso)')
+    parser.add_argument('--output', default=None,
+                        help='Fichero JSON de resultados (por defecto benchmarks/results/transport-<fecha>.json)')
+    parser.add_argument('--csv', default=None, help='Escribir también los resultados en CSV')
+    parser.add_argument('--case', default=None, help=argparse.SUPPRESS)  # Uso interno (proceso hijo)
+    parser.add_argument('--case-output', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        run_case(json.loads(args.case), args.case_output)
+        return
+
+    cases = []
+    for i, (transport, n_channels, srate, chunk_size) in enumerate(
+            itertools.product(args.transports, args.channels, args.srates, args.chunk_sizes)):
+        cases.append(dict(transport=transport, n_channels=n_channels, srate=srate, chunk_size=chunk_size,
+                          duration=args.duration, warmup=args.warmup, port=args.port + i))
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results',
+                                         f"transport-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {'environment': environment(), 'settings': vars(args), 'results': []}
+
+    print(f"{len(cases)} casos de {args.duration:g} s")
+    for case in cases:
+        result = run_subprocess(case, timeout=args.duration + 60)
+        print(format_result(result), flush=True)
+        report['results'].append(result)
+
+        # Reescribir tras cada caso: una ejecución interrumpida conserva lo medido
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.csv:
+        fields = list(dict.fromkeys(key for result in report['results'] for key in result))
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(report['results'])
+    print(f"Resultados en {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Módulos compartidos por los scripts del taller (simulación EEG, LSL y Arduino)
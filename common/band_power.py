@@ -0,0 +1,172 @@
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from common.broadcast_server import BroadcastServer
+from common.ring_buffer import RingBuffer
+from common.wire_protocol import encode_frame, encode_header
+
+# Bandas clásicas de EEG (Hz), límite inferior incluido y superior excluido
+BANDS = {
+    'delta': (1.0, 4.0),
+    'theta': (4.0, 8.0),
+    'alpha': (8.0, 13.0),
+    'beta': (13.0, 30.0),
+}
+
+
+class BandPowerEngine:
+    def __init__(self, srate, n_channels, segment_seconds=0.5, n_segments=3, bands=BANDS):
+        # Welch incremental: cada salto de medio segmento calcula una sola FFT nueva
+        # y actualiza la media de los últimos n_segments periodogramas
+        self.srate = srate
+        self.n_channels = n_channels
+        self.bands = dict(bands)
+        self.nperseg = max(int(segment_seconds * srate), 2)
+        self.hop = self.nperseg // 2  # Solapamiento del 50 %
+        self.n_segments = n_segments
+        self.rate = srate / self.hop  # Actualizaciones por segundo
+
+        # Ventana, escala y matriz de integración por banda calculadas una sola vez
+        window = np.hanning(self.nperseg)
+        self.window = window[:, np.newaxis]
+        self.scale = 1.0 / (srate * np.sum(window ** 2))
+        freqs = np.fft.rfftfreq(self.nperseg, 1.0 / srate)
+        df = srate / self.nperseg
+        self.band_matrix = np.array([((freqs >= low) & (freqs < high)) * df
+                                     for low, high in self.bands.values()])
+        self.one_sided = np.full((len(freqs), 1), 2.0)
+        self.one_sided[0] = 1.0
+        if self.nperseg % 2 == 0:
+            self.one_sided[-1] = 1.0
+
+        # Últimas nperseg muestras y periodogramas de los últimos segmentos
+        self.buffer = RingBuffer(self.nperseg, n_channels, dtype=np.float64)
+        self.periodograms = np.zeros((n_segments, len(freqs), n_channels))
+        self.psd_sum = np.zeros((len(freqs), n_channels))
+        self.segment_index = 0
+        self.filled_segments = 0
+        self.pending = 0  # Muestras recibidas desde el último segmento
+
+    def update(self, chunk, timestamps=None):
+        # Añadir un bloque (n_samples, n_channels); devuelve (potencias (n_bandas, n_canales),
+        # timestamp) del último segmento completado en este bloque, o None
+        chunk = np.asarray(chunk)
+        n_samples = len(chunk)
+        if timestamps is None:
+            timestamps = np.nan
+        timestamps = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), (n_samples,))
+
+        result = None
+        start = 0
+        while start < n_samples:
+            # Avanzar hasta el siguiente salto, como mucho
+            take = min(self.hop - self.pending, n_samples - start)
+            self.buffer.extend(chunk[start:start + take], timestamps[start:start + take])
+            self.pending += take
+            start += take
+            if self.pending == self.hop:
+                self.pending = 0
+                if len(self.buffer) == self.nperseg:
+                    result = self.add_segment()
+        return result
+
+    def add_segment(self):
+        data, timestamps = self.buffer.latest(self.nperseg)
+        segment = (data - data.mean(axis=0)) * self.window
+        periodogram = np.abs(np.fft.rfft(segment, axis=0)) ** 2 * self.scale * self.one_sided
+
+        # Media móvil de periodogramas: sumar el nuevo y restar el que sale
+        self.psd_sum += periodogram - self.periodograms[self.segment_index]
+        self.periodograms[self.segment_index] = periodogram
+        self.segment_index = (self.segment_index + 1) % self.n_segments
+        self.filled_segments = min(self.filled_segments + 1, self.n_segments)
+
+        psd = self.psd_sum / self.filled_segments
+        return self.band_matrix @ psd, timestamps[-1]
+
+
+def feature_names(channel_names, bands=BANDS):
+    # Nombres de las características en el orden de powers.ravel(): banda y después canal
+    return [f"{band}_{channel}" for band in bands for channel in channel_names]
+
+
+class BandPowerPublisher:
+    def __init__(self, srate, channel_names, lsl=True, port=None, host='localhost', **engine_options):
+        # Calcula potencias por banda y las publica por LSL y/o por socket
+        self.channel_names = list(channel_names)
+        self.engine = BandPowerEngine(srate, len(self.channel_names), **engine_options)
+        self.names = feature_names(self.channel_names, self.engine.bands)
+        self.outlet = None
+        self.server = None
+        self.seq = 0
+        self.update_times = deque(maxlen=200)  # Tiempo de cálculo de cada actualización (s)
+
+        if lsl:
+            self.setup_lsl()
+        if port is not None:
+            self.server = BroadcastServer(host, port, binary_header=encode_header(self.names, self.engine.rate))
+            self.server.start()
+            print(f"Servidor de potencias por banda en {host}:{port}")
+
+    def setup_lsl(self):
+        from pylsl import StreamInfo, StreamOutlet
+
+        # Stream de características con una etiqueta por banda y canal
+        info = StreamInfo(
+            name='EEGBandPower',
+            type='BandPower',
+            channel_count=len(self.names),
+            nominal_srate=self.engine.rate,
+            channel_format='float32',
+            source_id='BandPower001'
+        )
+        channels = info.desc().append_child("channels")
+        for name in self.names:
+            channels.append_child("channel")\
+                   .append_child_value("label", name)\
+                   .append_child_value("unit", "microvolts^2")
+        self.outlet = StreamOutlet(info)
+        print("Publicando stream LSL 'EEGBandPower'")
+
+    def push(self, chunk, timestamps=None):
+        # Actualizar con un bloque y publicar si se completó un segmento nuevo
+        start = time.perf_counter()
+        result = self.engine.update(chunk[:, :self.engine.n_channels], timestamps)
+        if result is None:
+            return None
+        powers, timestamp = result
+        features = powers.reshape(1, -1)
+
+        if self.outlet is not None:
+            self.outlet.push_chunk(features.astype(np.float32), timestamp)
+        if self.server is not None:
+            modes = self.server.client_modes()
+            if modes:
+                frames = {}
+                if 'binary' in modes:
+                    frames['binary'] = encode_frame(self.seq, timestamp, features)
+                if 'json' in modes:
+                    frames['json'] = (json.dumps({
+                        'timestamp': timestamp,
+                        'data': features.tolist(),
+                        'channels': self.names
+                    }) + '\n').encode()
+                self.server.broadcast(frames)
+        self.seq += 1
+
+        self.update_times.append(time.perf_counter() - start)
+        return powers, timestamp
+
+    def close(self):
+        if self.server is not None:
+            self.server.stop()
+        self.outlet = None
+
+    def format_stats(self):
+        if not self.update_times:
+            return "Potencias: -"
+        mean_ms = sum(self.update_times) / len(self.update_times) * 1000
+        return f"Potencias: {self.engine.rate:.1f} Hz ({mean_ms:.2f} ms)"
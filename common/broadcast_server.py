@@ -0,0 +1,160 @@
+import asyncio
+import threading
+
+from common.wire_protocol import HELLO, HELLO_JSON, HELLO_TIMEOUT
+
+# Políticas para clientes lentos cuando su cola está llena
+SLOW_CLIENT_POLICIES = ('drop_oldest', 'drop_newest', 'disconnect')
+
+
+class BroadcastClient:
+    def __init__(self, writer, mode, queue_size):
+        self.writer = writer
+        self.mode = mode  # 'json', 'json-chunks' o 'binary'
+        self.address = writer.get_extra_info('peername')
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped_frames = 0
+        self.closed = False
+
+
+class BroadcastServer:
+    def __init__(self, host='localhost', port=5555, binary_header=None, queue_size=64, policy='drop_oldest'):
+        if policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Política desconocida: {policy} (opciones: {', '.join(SLOW_CLIENT_POLICIES)})")
+
+        # Servidor asyncio en su propio hilo; cada cliente tiene una cola acotada
+        self.host = host
+        self.port = port
+        self.binary_header = binary_header  # Cabecera enviada a los clientes binarios
+        self.queue_size = queue_size
+        self.policy = policy
+        self.clients = set()
+        self.senders = set()  # Tareas de envío de los clientes conectados
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+
+        # Estadísticas globales
+        self.dropped_frames = 0
+        self.slow_disconnects = 0
+
+    def start(self):
+        # Arrancar el bucle de eventos y esperar a que el puerto esté abierto
+        self.thread = threading.Thread(target=self.run_loop, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_client, self.host, self.port, reuse_address=True))
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+
+        # Cerrar clientes y servidor al detener el bucle; las tareas de envío de los clientes
+        # se cancelan y se esperan antes de cerrar el bucle
+        for client in list(self.clients):
+            client.writer.close()
+        self.server.close()
+        senders = list(self.senders)
+        for sender in senders:
+            sender.cancel()
+        self.loop.run_until_complete(asyncio.gather(*senders, return_exceptions=True))
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def handle_client(self, reader, writer):
+        # Negociar protocolo: binario o JSON por bloques si el cliente envía su saludo, JSON si no
+        mode = 'json'
+        try:
+            hello = await asyncio.wait_for(reader.readexactly(len(HELLO)), HELLO_TIMEOUT)
+            if hello == HELLO:
+                mode = 'binary'
+            elif hello == HELLO_JSON:
+                mode = 'json-chunks'
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError):
+            pass
+
+        client = BroadcastClient(writer, mode, self.queue_size)
+        if mode == 'binary' and self.binary_header is not None:
+            writer.write(self.binary_header)
+        self.clients.add(client)
+        print(f"Cliente conectado desde {client.address} (protocolo {mode})")
+
+        # Tarea de escritura; la lectura solo sirve para detectar el cierre
+        sender = asyncio.ensure_future(self.send_loop(client))
+        self.senders.add(sender)
+        sender.add_done_callback(self.senders.discard)
+        try:
+            while await reader.read(1024):
+                pass
+        except OSError:
+            pass
+        finally:
+            sender.cancel()
+            self.remove_client(client)
+
+    async def send_loop(self, client):
+        try:
+            while True:
+                frame = await client.queue.get()
+                client.writer.write(frame)
+                await client.writer.drain()
+        except (ConnectionError, OSError):
+            self.remove_client(client)
+
+    def remove_client(self, client):
+        if client.closed:
+            return
+        client.closed = True
+        self.clients.discard(client)
+        client.writer.close()
+        print(f"Cliente desconectado: {client.address}")
+
+    def enqueue(self, frames):
+        # Se ejecuta en el hilo del bucle: repartir la misma trama a todos
+        for client in list(self.clients):
+            frame = frames.get(client.mode)
+            if frame is None:
+                continue
+            if client.queue.full():
+                client.dropped_frames += 1
+                self.dropped_frames += 1
+                if self.policy == 'drop_newest':
+                    continue
+                if self.policy == 'disconnect':
+                    self.slow_disconnects += 1
+                    self.remove_client(client)
+                    continue
+                client.queue.get_nowait()  # drop_oldest
+            client.queue.put_nowait(frame)
+
+    def broadcast(self, frames):
+        # Llamable desde cualquier hilo; frames = {modo: bytes} ('json', 'json-chunks', 'binary')
+        if self.loop is not None and self.loop.is_running() and self.clients:
+            self.loop.call_soon_threadsafe(self.enqueue, frames)
+
+    def client_modes(self):
+        # Protocolos en uso, para codificar solo los necesarios
+        return {client.mode for client in list(self.clients)}
+
+    def client_count(self):
+        return len(self.clients)
+
+    def format_stats(self):
+        return (f"Clientes: {self.client_count()} | Tramas descartadas: {self.dropped_frames} | "
+                f"Desconexiones por lentitud: {self.slow_disconnects}")
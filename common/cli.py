@@ -0,0 +1,87 @@
+import argparse
+import time
+
+from common.metrics_server import MetricsServer
+
+
+def create_parser(description, srate=True, network=False, chunk_size=10, record=False, replay=False, dsp=False,
+                  gui=True, metrics=False, scenario=False):
+    # Parámetros de línea de comandos comunes a simuladores y receptores
+    parser = argparse.ArgumentParser(description=description)
+    if gui:
+        parser.add_argument('--headless', action='store_true',
+                            help='Ejecutar sin interfaz gráfica (no importa Tk ni Matplotlib)')
+    parser.add_argument('--channels', type=int, default=8, help='Número de canales')
+    if srate:
+        parser.add_argument('--srate', type=float, default=100, help='Frecuencia de muestreo (Hz)')
+    parser.add_argument('--chunk-size', type=int, default=chunk_size, help='Muestras por bloque')
+    if network:
+        parser.add_argument('--host', default='localhost', help='Dirección del servidor')
+        parser.add_argument('--port', type=int, default=5555, help='Puerto del servidor')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Segundos de ejecución (por defecto, hasta Ctrl+C o cerrar la ventana)')
+    if gui:
+        parser.add_argument('--fps', type=int, default=20, help='Fotogramas por segundo del gráfico')
+    if metrics:
+        parser.add_argument('--metrics-port', type=int, default=None, metavar='PORT',
+                            help='Sin GUI: servir métricas en JSON en http://localhost:PORT/metrics')
+    if record:
+        parser.add_argument('--record', metavar='PATH', default=None,
+                            help='Grabar los datos recibidos en un fichero .eegrec')
+    if replay:
+        parser.add_argument('--replay', metavar='PATH', default=None,
+                            help='Reproducir una grabación .eegrec en lugar de la señal simulada')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Multiplicador de velocidad (0 = lo más rápido posible)')
+        parser.add_argument('--original-timestamps', action='store_true',
+                            help='Enviar los timestamps grabados en lugar de rebasarlos al reloj actual')
+        parser.add_argument('--loop', action='store_true', help='Repetir la grabación al terminar')
+    if scenario:
+        parser.add_argument('--scenario', metavar='PATH', default=None,
+                            help='Escenario JSON del modelo de señal (fuentes, ruido 1/f, artefactos, eventos)')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Semilla aleatoria (reproducible; sustituye a la del escenario)')
+    if dsp:
+        parser.add_argument('--bandpass', type=float, nargs=2, metavar=('LOW', 'HIGH'), default=None,
+                            help='Filtro paso banda (Hz), requiere scipy')
+        parser.add_argument('--notch', type=float, metavar='HZ', default=None,
+                            help='Filtro notch (Hz, p. ej. 50), requiere scipy')
+        parser.add_argument('--car', action='store_true', help='Referencia a la media común')
+        parser.add_argument('--decimate', type=int, default=1, help='Factor de diezmado, requiere scipy')
+        parser.add_argument('--band-power', action='store_true',
+                            help="Publicar potencias por banda como stream LSL 'EEGBandPower'")
+        parser.add_argument('--band-power-port', type=int, metavar='PORT', default=None,
+                            help='Publicar potencias por banda en este puerto TCP')
+    return parser
+
+
+def dsp_options(args):
+    # Opciones de create_pipeline a partir de los argumentos de --bandpass/--notch/--car/--decimate
+    return {'bandpass': args.bandpass, 'notch': args.notch, 'car': args.car, 'decimate': args.decimate}
+
+
+def run_headless(app, duration=None, report_interval=5.0, metrics_port=None):
+    # Ejecutar un motor (start/stop/format_stats) sin GUI, informando periódicamente;
+    # con metrics_port, app.metrics() se sirve por HTTP mientras dure la ejecución
+    metrics = None
+    if metrics_port is not None:
+        metrics = MetricsServer(app.metrics, port=metrics_port)
+        metrics.start()
+    app.start()
+    start = time.monotonic()
+    next_report = start + report_interval
+    try:
+        while duration is None or time.monotonic() - start < duration:
+            time.sleep(0.1)
+            if not app.running:
+                break  # El motor se detuvo solo (p. ej. fin de una reproducción)
+            if time.monotonic() >= next_report:
+                next_report += report_interval
+                print(app.format_stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        app.stop()
+        if metrics is not None:
+            metrics.stop()
+    print(app.format_stats())
@@ -0,0 +1,331 @@
+import asyncio
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from common.serial_writer import actuator_key
+
+# Delimitación de comandos en el flujo TCP:
+#   'line': un comando por línea terminada en "\n"
+#   'length': prefijo de 2 bytes big-endian con la longitud del comando en UTF-8
+COMMAND_FRAMINGS = ('line', 'length')
+LENGTH_PREFIX = struct.Struct('>H')
+MAX_COMMAND_BYTES = 4096  # Líneas más largas se descartan (cliente sin delimitador)
+
+# Sonda de latencia: el master responde "PONG <dato>" a "PING <dato>" sin pasar por el Arduino.
+# Las respuestas del master al estudiante son siempre líneas de texto
+PING = 'PING'
+PONG = 'PONG'
+
+# UDP: un comando por datagrama precedido de su secuencia (uint32 big-endian)
+DATAGRAM_HEADER = struct.Struct('>I')
+SOCKET_BUFFER = 16384  # Buffers pequeños: mejor descartar que acumular comandos viejos
+
+
+def tune_socket(sock, buffer_size=SOCKET_BUFFER):
+    # Desactivar Nagle (los comandos son de pocos bytes) y ajustar los buffers del sistema
+    if sock.type == socket.SOCK_STREAM:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if buffer_size:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+
+
+def encode_command(command, framing='line'):
+    data = command.encode('utf-8')
+    if framing == 'length':
+        return LENGTH_PREFIX.pack(len(data)) + data
+    return data + b'\n'
+
+
+def is_ping(command):
+    return command == PING or command.startswith(PING + ' ')
+
+
+def encode_datagram(seq, command):
+    return DATAGRAM_HEADER.pack(seq & 0xFFFFFFFF) + command.encode('utf-8')
+
+
+def decode_datagram(data):
+    # (seq, comando) o None si el datagrama es demasiado corto
+    if len(data) < DATAGRAM_HEADER.size:
+        return None
+    (seq,) = DATAGRAM_HEADER.unpack_from(data)
+    return seq, data[DATAGRAM_HEADER.size:].decode('utf-8', errors='replace').strip()
+
+
+class CommandDecoder:
+    def __init__(self, framing='line'):
+        if framing not in COMMAND_FRAMINGS:
+            raise ValueError(f"Formato desconocido: {framing} (opciones: {', '.join(COMMAND_FRAMINGS)})")
+
+        # Parser incremental: un recv puede traer varios comandos o medio comando
+        self.framing = framing
+        self.buffer = bytearray()
+        self.errors = 0  # Comandos descartados por longitud excesiva
+
+    def feed(self, data):
+        # Devolver los comandos completos (str) contenidos en lo recibido hasta ahora
+        self.buffer += data
+        return self.split_lines() if self.framing == 'line' else self.split_length()
+
+    def split_lines(self):
+        *lines, rest = self.buffer.split(b'\n')
+        if len(rest) > MAX_COMMAND_BYTES:
+            self.errors += 1
+            rest = b''
+        self.buffer = bytearray(rest)
+        commands = []
+        for line in lines:
+            if len(line) > MAX_COMMAND_BYTES:
+                self.errors += 1
+                continue
+            command = line.decode('utf-8', errors='replace').strip()
+            if command:
+                commands.append(command)
+        return commands
+
+    def split_length(self):
+        commands = []
+        while len(self.buffer) >= LENGTH_PREFIX.size:
+            (length,) = LENGTH_PREFIX.unpack_from(self.buffer)
+            end = LENGTH_PREFIX.size + length
+            if len(self.buffer) < end:
+                break
+            command = self.buffer[LENGTH_PREFIX.size:end].decode('utf-8', errors='replace').strip()
+            del self.buffer[:end]
+            if command:
+                commands.append(command)
+        return commands
+
+
+class CommandClient:
+    def __init__(self, address, framing, writer=None, window=5.0):
+        self.writer = writer  # None para los clientes UDP
+        self.address = address
+        self.decoder = CommandDecoder(framing)
+        self.window = window  # Ventana (s) para la tasa de comandos
+        self.arrivals = deque()  # Instantes de llegada dentro de la ventana
+        self.commands = 0
+        self.bytes_received = 0
+        self.last_seq = {}  # UDP: clave de actuador -> última secuencia aceptada
+        self.last_seen = time.monotonic()
+
+    def count(self, n_commands, n_bytes):
+        now = time.monotonic()
+        self.last_seen = now
+        self.commands += n_commands
+        self.bytes_received += n_bytes
+        self.arrivals.extend([now] * n_commands)
+        self.expire(now)
+
+    def expire(self, now):
+        while self.arrivals and now - self.arrivals[0] > self.window:
+            self.arrivals.popleft()
+
+    def rate(self):
+        # Comandos/s en la ventana reciente (llamable desde otro hilo: sin modificar la cola)
+        now = time.monotonic()
+        return sum(now - t <= self.window for t in list(self.arrivals)) / self.window
+
+
+class DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        tune_socket(transport.get_extra_info('socket'))
+
+    def datagram_received(self, data, address):
+        self.server.handle_datagram(self.transport, data, address)
+
+
+class CommandServer:
+    def __init__(self, host='0.0.0.0', port=5555, framing='line', udp_port=None, key=actuator_key,
+                 udp_timeout=30.0):
+        if framing not in COMMAND_FRAMINGS:
+            raise ValueError(f"Formato desconocido: {framing} (opciones: {', '.join(COMMAND_FRAMINGS)})")
+
+        # Servidor asyncio en su propio hilo: varios operadores a la vez, cada uno con su parser
+        self.host = host
+        self.port = port
+        self.framing = framing
+        self.udp_port = udp_port  # Transporte UDP opcional para comandos de control continuo
+        self.key = key  # Comando -> actuador, para "gana el último" por actuador en UDP
+        self.udp_timeout = udp_timeout  # Sin datagramas durante este tiempo, el cliente UDP caduca
+        self.clients = set()
+        self.udp_clients = {}  # Dirección -> CommandClient
+        self.udp_transport = None
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+        self.on_command = None  # Callback (comando, cliente) desde el hilo del bucle
+        self.on_connect = None  # Callback (cliente)
+        self.on_disconnect = None  # Callback (cliente)
+
+        # Estadísticas globales
+        self.commands = 0
+        self.frame_errors = 0
+        self.stale_datagrams = 0  # Datagramas UDP llegados después de uno más nuevo
+        self.pings = 0
+
+    def start(self):
+        # Arrancar el bucle de eventos y esperar a que el puerto esté abierto
+        self.thread = threading.Thread(target=self.run_loop, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_client, self.host, self.port, reuse_address=True))
+            if self.udp_port is not None:
+                self.udp_transport, _ = self.loop.run_until_complete(self.loop.create_datagram_endpoint(
+                    lambda: DatagramProtocol(self), local_addr=(self.host, self.udp_port)))
+        except OSError as e:
+            # Sin puerto UDP no se arranca: liberar el puerto TCP ya abierto y el bucle
+            if self.server is not None:
+                self.server.close()
+                self.loop.run_until_complete(self.server.wait_closed())
+                self.server = None
+            self.loop.close()
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+
+        # Cerrar clientes y servidor al detener el bucle
+        for client in list(self.clients):
+            client.writer.close()
+        if self.udp_transport is not None:
+            self.udp_transport.close()
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def handle_client(self, reader, writer):
+        tune_socket(writer.get_extra_info('socket'))
+        client = CommandClient(writer.get_extra_info('peername'), self.framing, writer)
+        self.clients.add(client)
+        print(f"Cliente conectado desde {client.address}")
+        if self.on_connect is not None:
+            self.on_connect(client)
+
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                errors = client.decoder.errors
+                commands = client.decoder.feed(data)
+                self.frame_errors += client.decoder.errors - errors
+                client.count(sum(not is_ping(c) for c in commands), len(data))
+                for command in commands:
+                    if is_ping(command):
+                        self.pings += 1
+                        writer.write(f"{PONG}{command[len(PING):]}\n".encode())
+                        continue
+                    self.commands += 1
+                    if self.on_command is not None:
+                        self.on_command(command, client)
+        except OSError:
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+            print(f"Cliente desconectado: {client.address}")
+            if self.on_disconnect is not None:
+                self.on_disconnect(client)
+
+    def handle_datagram(self, transport, data, address):
+        # Se ejecuta en el hilo del bucle. Sin retransmisiones: un datagrama con secuencia
+        # anterior a la última aceptada para el mismo actuador llega tarde y se descarta
+        decoded = decode_datagram(data)
+        if decoded is None or not decoded[1]:
+            self.frame_errors += 1
+            return
+        seq, command = decoded
+        now = time.monotonic()
+        self.expire_udp_clients(now)
+        client = self.udp_clients.get(address)
+        if client is None:
+            client = self.udp_clients[address] = CommandClient(address, self.framing)
+            print(f"Cliente UDP desde {address}")
+        client.last_seen = now
+
+        if is_ping(command):
+            self.pings += 1
+            transport.sendto(f"{PONG}{command[len(PING):]}\n".encode(), address)
+            return
+
+        key = self.key(command) if self.key is not None else None
+        last = client.last_seq.get(key)
+        # Comparación con vuelta de la secuencia de 32 bits
+        if last is not None and (seq == last or (seq - last) & 0xFFFFFFFF >= 0x80000000):
+            self.stale_datagrams += 1
+            return
+        client.last_seq[key] = seq
+        client.count(1, len(data))
+        self.commands += 1
+        if self.on_command is not None:
+            self.on_command(command, client)
+
+    def expire_udp_clients(self, now):
+        # Olvidar los remitentes UDP sin datagramas durante udp_timeout (y su última secuencia):
+        # si vuelven, empiezan como clientes nuevos
+        for address, client in list(self.udp_clients.items()):
+            if now - client.last_seen > self.udp_timeout:
+                del self.udp_clients[address]
+                print(f"Cliente UDP caducado: {address}")
+                if self.on_disconnect is not None:
+                    self.on_disconnect(client)
+
+    def write_all(self, data):
+        # Se ejecuta en el hilo del bucle; los mensajes al estudiante son pequeños y no se esperan
+        for client in list(self.clients):
+            try:
+                client.writer.write(data)
+            except (ConnectionError, OSError):
+                pass
+
+    def send_all(self, data):
+        # Llamable desde cualquier hilo: enviar bytes a todos los clientes conectados
+        if self.loop is not None and self.loop.is_running() and self.clients:
+            self.loop.call_soon_threadsafe(self.write_all, data)
+
+    def client_count(self):
+        return len(self.clients)
+
+    def client_stats(self):
+        # [(dirección, comandos, comandos/s)] por cliente TCP y UDP activo
+        now = time.monotonic()
+        clients = list(self.clients) + [client for client in list(self.udp_clients.values())
+                                        if now - client.last_seen <= self.udp_timeout]
+        return [(client.address, client.commands, client.rate()) for client in clients]
+
+    def format_stats(self):
+        clients = self.client_stats()
+        total = sum(rate for _, _, rate in clients)
+        text = f"Clientes: {len(clients)} | {total:.1f} cmd/s"
+        for address, commands, rate in clients:
+            text += f" | {address[0]}:{address[1]} {rate:.1f} cmd/s ({commands})"
+        if self.frame_errors:
+            text += f" | Tramas inválidas: {self.frame_errors}"
+        if self.stale_datagrams:
+            text += f" | UDP fuera de orden: {self.stale_datagrams}"
+        return text
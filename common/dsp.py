@@ -0,0 +1,126 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class SOSFilter:
+    # Filtro IIR en secciones de segundo orden con estado entre bloques (scipy.signal.sosfilt + zi)
+    name = 'iir'
+
+    def __init__(self, sos):
+        self.sos = sos
+        self.zi = None  # (n_sections, 2, n_channels), se inicializa con el primer bloque
+
+    def process(self, chunk, timestamps):
+        from scipy.signal import sosfilt, sosfilt_zi
+
+        if self.zi is None or self.zi.shape[2] != chunk.shape[1]:
+            # Estado inicial en régimen permanente para evitar el transitorio de arranque
+            self.zi = sosfilt_zi(self.sos)[:, :, np.newaxis] * chunk[0]
+        filtered, self.zi = sosfilt(self.sos, chunk, axis=0, zi=self.zi)
+        return filtered, timestamps
+
+
+class BandpassFilter(SOSFilter):
+    def __init__(self, srate, low, high, order=4):
+        from scipy.signal import butter
+
+        super().__init__(butter(order, [low, high], btype='bandpass', fs=srate, output='sos'))
+        self.name = f"paso banda {low:g}-{high:g} Hz"
+
+
+class NotchFilter(SOSFilter):
+    def __init__(self, srate, freq=50.0, quality=30.0):
+        from scipy.signal import iirnotch, tf2sos
+
+        super().__init__(tf2sos(*iirnotch(freq, quality, fs=srate)))
+        self.name = f"notch {freq:g} Hz"
+
+
+class CommonAverageReference:
+    name = 'CAR'
+
+    def process(self, chunk, timestamps):
+        # Restar a cada muestra la media de todos los canales
+        return chunk - chunk.mean(axis=1, keepdims=True), timestamps
+
+
+class Decimator:
+    def __init__(self, factor, numtaps=None):
+        from scipy.signal import firwin
+
+        # FIR antialiasing; solo se calculan las salidas que se conservan (forma polifásica)
+        self.factor = factor
+        self.name = f"diezmado x{factor}"
+        numtaps = numtaps or 20 * factor + 1
+        self.taps = firwin(numtaps, 1.0 / factor)[::-1].copy()
+        self.history = None  # Últimas numtaps - 1 muestras del bloque anterior
+        self.phase = 0  # Posición de la próxima salida dentro del bloque
+
+    def process(self, chunk, timestamps):
+        n_taps = len(self.taps)
+        if self.history is None or self.history.shape[1] != chunk.shape[1]:
+            self.history = np.repeat(chunk[:1], n_taps - 1, axis=0)
+            self.phase = 0
+
+        # Ventanas de numtaps muestras terminadas en cada salida conservada
+        extended = np.concatenate([self.history, chunk])
+        kept = np.arange(self.phase, len(chunk), self.factor)
+        windows = np.lib.stride_tricks.sliding_window_view(extended, n_taps, axis=0)[kept]
+        output = windows @ self.taps
+
+        self.history = extended[-(n_taps - 1):]
+        self.phase = (self.phase - len(chunk)) % self.factor
+        if timestamps is not None and np.ndim(timestamps) > 0:
+            timestamps = np.asarray(timestamps)[kept]
+        return output, timestamps
+
+
+class DSPPipeline:
+    def __init__(self, stages, srate):
+        # Etapas encadenadas sobre bloques (n_samples, n_channels), con tiempos por etapa
+        self.stages = stages
+        self.srate = srate  # Frecuencia de salida (tras el diezmado)
+        self.wall_times = [deque(maxlen=200) for _ in stages]  # Latencia por bloque (s)
+        self.cpu_times = [deque(maxlen=200) for _ in stages]  # Tiempo de CPU por bloque (s)
+
+    def process(self, chunk, timestamps=None):
+        # Devolver (bloque procesado, timestamps); el diezmado reduce el número de muestras
+        for stage, wall_times, cpu_times in zip(self.stages, self.wall_times, self.cpu_times):
+            start_wall = time.perf_counter()
+            start_cpu = time.thread_time()
+            chunk, timestamps = stage.process(chunk, timestamps)
+            cpu_times.append(time.thread_time() - start_cpu)
+            wall_times.append(time.perf_counter() - start_wall)
+        return chunk, timestamps
+
+    def stats(self):
+        # Latencia y CPU medias por bloque de cada etapa (ms)
+        return [{
+            'stage': stage.name,
+            'latency_ms': sum(wall_times) / len(wall_times) * 1000 if wall_times else 0.0,
+            'cpu_ms': sum(cpu_times) / len(cpu_times) * 1000 if cpu_times else 0.0,
+        } for stage, wall_times, cpu_times in zip(self.stages, self.wall_times, self.cpu_times)]
+
+    def format_stats(self):
+        return " | ".join(f"{s['stage']}: {s['latency_ms']:.2f} ms" for s in self.stats())
+
+
+def create_pipeline(srate, bandpass=None, notch=None, car=False, decimate=1):
+    # Construir la cadena notch -> paso banda -> CAR -> diezmado; None si no hay etapas
+    stages = []
+    if (bandpass or notch) and not srate:
+        raise ValueError("Los filtros necesitan conocer la frecuencia de muestreo")
+    if notch:
+        stages.append(NotchFilter(srate, notch))
+    if bandpass:
+        stages.append(BandpassFilter(srate, *bandpass))
+    if car:
+        stages.append(CommonAverageReference())
+    if decimate > 1:
+        stages.append(Decimator(decimate))
+        srate = srate / decimate
+    if not stages:
+        return None
+    return DSPPipeline(stages, srate)
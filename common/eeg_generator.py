@@ -0,0 +1,62 @@
+import numpy as np
+
+# Nombres de los canales según el sistema 10-20
+DEFAULT_CHANNEL_NAMES = ['Fp1', 'Fp2', 'C3', 'C4', 'O1', 'O2', 'F7', 'F8']
+
+
+def channel_names(n_channels):
+    # Usar los nombres 10-20 y numerar los canales adicionales
+    names = DEFAULT_CHANNEL_NAMES[:n_channels]
+    names += [f'Ch{i+1}' for i in range(len(names), n_channels)]
+    return names
+
+
+class EEGChunkGenerator:
+    def __init__(self, n_channels=8, srate=100, chunk_size=10,
+                 alpha_freq=10.0, alpha_amp=10.0, noise_std=2.0, seed=None):
+        # Parámetros de la señal EEG
+        self.n_channels = n_channels
+        self.srate = srate
+        self.chunk_size = chunk_size
+        self.alpha_freq = alpha_freq
+        self.alpha_amp = alpha_amp
+        self.noise_std = noise_std
+        self.rng = np.random.default_rng(seed)
+
+        # Índice de la próxima muestra y fase actual del oscilador alfa
+        self.sample_index = 0
+        self.phase = 0.0
+
+        # Vector de tiempo precalculado para un bloque completo
+        self.t_chunk = np.arange(chunk_size) / srate
+        self.phase_step = 2 * np.pi * alpha_freq / srate
+        self.phase_offsets = 2 * np.pi * alpha_freq * self.t_chunk
+
+    def next_chunk(self, n_samples=None):
+        # Generar un bloque (n_samples, n_channels) en float32
+        if n_samples is None:
+            n_samples = self.chunk_size
+
+        if n_samples == self.chunk_size:
+            offsets = self.phase_offsets
+        else:
+            offsets = self.phase_step * np.arange(n_samples)
+
+        # Componente de onda alfa con fase continua entre bloques
+        alpha = np.sin(self.phase + offsets).astype(np.float32)
+        alpha *= self.alpha_amp
+
+        # Ruido gaussiano para todos los canales en una sola llamada
+        chunk = self.rng.standard_normal((n_samples, self.n_channels), dtype=np.float32)
+        chunk *= self.noise_std
+        chunk += alpha[:, np.newaxis]
+
+        # Avanzar la fase (acotada para no perder precisión)
+        self.phase = (self.phase + self.phase_step * n_samples) % (2 * np.pi)
+        self.sample_index += n_samples
+        return chunk
+
+    def skip(self, n_samples):
+        # Avanzar sin generar (muestras descartadas) para que la fase siga al reloj de muestras
+        self.phase = (self.phase + self.phase_step * n_samples) % (2 * np.pi)
+        self.sample_index += n_samples
@@ -0,0 +1,52 @@
+import queue
+
+
+class GuiBus:
+    def __init__(self, root, interval=50, max_batch=1000):
+        # Cola segura entre hilos: los hilos de E/S solo encolan mensajes
+        # y el bucle de Tk los procesa por lotes con un temporizador
+        self.root = root
+        self.interval = interval  # ms entre vaciados de la cola
+        self.max_batch = max_batch  # Mensajes máximos por vaciado
+        self.queue = queue.SimpleQueue()
+        self.handlers = {}
+        self.running = False
+
+    def subscribe(self, topic, handler, coalesce=False):
+        # coalesce=True: el handler recibe solo el último mensaje del lote
+        # coalesce=False: el handler recibe la lista de mensajes del lote
+        self.handlers[topic] = (handler, coalesce)
+
+    def post(self, topic, payload=None):
+        # Llamable desde cualquier hilo; nunca bloquea
+        self.queue.put((topic, payload))
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.root.after(self.interval, self.drain)
+
+    def stop(self):
+        self.running = False
+
+    def drain(self):
+        # Agrupar los mensajes pendientes por tema antes de tocar los widgets
+        batches = {}
+        for _ in range(self.max_batch):
+            try:
+                topic, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(topic, []).append(payload)
+
+        for topic, payloads in batches.items():
+            if topic not in self.handlers:
+                continue
+            handler, coalesce = self.handlers[topic]
+            try:
+                handler(payloads[-1] if coalesce else payloads)
+            except Exception as e:
+                print(f"Error procesando mensajes '{topic}': {e}")
+
+        if self.running:
+            self.root.after(self.interval, self.drain)
@@ -0,0 +1,53 @@
+from collections import deque
+
+import numpy as np
+
+
+class LatencyTracker:
+    def __init__(self, stages, budget=None, history=1000):
+        # stages: nombres en orden (p. ej. adquisición -> ... -> escritura serie);
+        # cada evento registra el instante en que pasó por cada etapa
+        self.stages = list(stages)
+        self.budget = budget  # Latencia extremo a extremo máxima (s), opcional
+        self.deltas = {stage: deque(maxlen=history) for stage in self.stages[1:]}
+        self.totals = deque(maxlen=history)  # Desde la primera etapa hasta la última registrada
+        self.events = 0
+        self.completed = 0  # Eventos que pasaron por todas las etapas
+        self.over_budget = 0
+
+    def record(self, times):
+        # times: {etapa: instante}; basta con un prefijo de las etapas (p. ej. sin escritura)
+        self.events += 1
+        previous = times[self.stages[0]]
+        for stage in self.stages[1:]:
+            if stage not in times:
+                break
+            self.deltas[stage].append(times[stage] - previous)
+            previous = times[stage]
+
+        # Total hasta la última etapa alcanzada (p. ej. la decisión si no hay escritura serie)
+        total = previous - times[self.stages[0]]
+        self.totals.append(total)
+        if len(times) == len(self.stages):
+            self.completed += 1
+        if self.budget is not None and total > self.budget:
+            self.over_budget += 1
+        return total
+
+    def percentiles(self, q=(50, 95, 99)):
+        # {etapa: {p50: ms, ...}} para cada tramo y para el total
+        result = {}
+        for stage, values in list(self.deltas.items()) + [('total', self.totals)]:
+            if values:
+                result[stage] = dict(zip((f"p{p}" for p in q), np.percentile(list(values), q) * 1000))
+        return result
+
+    def format_stats(self):
+        stats = self.percentiles()
+        if 'total' not in stats:
+            return "Latencia: -"
+        total = stats['total']
+        text = f"Latencia p50/p95/p99: {total['p50']:.1f}/{total['p95']:.1f}/{total['p99']:.1f} ms"
+        if self.budget is not None:
+            text += f" | Fuera de presupuesto: {self.over_budget}/{self.events}"
+        return text
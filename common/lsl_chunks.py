@@ -0,0 +1,57 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class ChunkedInlet:
+    def __init__(self, inlet, max_chunk_len=1024, timeout=0.05):
+        # Lectura por bloques con pull_chunk sobre un array preasignado
+        self.inlet = inlet
+        self.max_chunk_len = max_chunk_len
+        self.timeout = timeout
+        self.n_channels = inlet.channel_count
+        self.dest = np.empty((max_chunk_len, self.n_channels), dtype=np.dtype(inlet.value_type))
+
+        # Estadísticas de throughput y tamaño de bloque
+        self.total_samples = 0
+        self.total_chunks = 0
+        self.max_seen_chunk = 0
+        self.history = deque(maxlen=200)  # (instante, muestras) de las últimas lecturas
+
+    def pull(self):
+        # Devolver (vista del bloque, timestamps); el bloque se sobrescribe en la siguiente lectura.
+        # pull_chunk con dest_obj espera a llenar max_samples o a agotar el timeout: se espera solo
+        # la primera muestra y el resto disponible se recoge sin bloquear
+        _, timestamps = self.inlet.pull_chunk(timeout=self.timeout, max_samples=1, dest_obj=self.dest[:1])
+        if timestamps and self.max_chunk_len > 1:
+            _, more = self.inlet.pull_chunk(timeout=0.0, max_samples=self.max_chunk_len - 1,
+                                            dest_obj=self.dest[1:])
+            timestamps = list(timestamps) + list(more)
+        n_samples = len(timestamps)
+        if n_samples:
+            self.total_samples += n_samples
+            self.total_chunks += 1
+            self.max_seen_chunk = max(self.max_seen_chunk, n_samples)
+            self.history.append((time.monotonic(), n_samples))
+        return self.dest[:n_samples], np.asarray(timestamps, dtype=np.float64)
+
+    def stats(self):
+        # Muestras/s en la ventana reciente y tamaño medio/máximo de bloque
+        throughput = 0.0
+        if len(self.history) > 1:
+            elapsed = self.history[-1][0] - self.history[0][0]
+            if elapsed > 0:
+                throughput = sum(n for _, n in list(self.history)[1:]) / elapsed
+        return {
+            'throughput': throughput,
+            'total_samples': self.total_samples,
+            'chunks': self.total_chunks,
+            'mean_chunk': self.total_samples / self.total_chunks if self.total_chunks else 0.0,
+            'max_chunk': self.max_seen_chunk,
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        return (f"{stats['throughput']:.0f} muestras/s | "
+                f"Bloque medio: {stats['mean_chunk']:.1f} (máx {stats['max_chunk']})")
@@ -0,0 +1,44 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MetricsServer:
+    def __init__(self, provider, host='localhost', port=9100, path='/metrics'):
+        # Endpoint HTTP de solo lectura: GET /metrics devuelve provider() en JSON
+        self.provider = provider  # Función sin argumentos que devuelve un dict
+        self.host = host
+        self.port = port
+        self.path = path
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != metrics.path:
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.provider(), default=float).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Sin una línea por petición en la consola
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Métricas en http://{self.host}:{self.port}{self.path}")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,112 @@
+import time
+import tkinter as tk
+from collections import deque
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+
+class EEGPlotEngine:
+    def __init__(self, master, ring_buffer, channel_names, fps=20, ylim=(-30, 30)):
+        # Parámetros de visualización
+        self.master = master
+        self.buffer = ring_buffer
+        self.n_channels = len(channel_names)
+        self.frame_interval = max(int(1000 / fps), 1)  # ms entre fotogramas
+        self.autoscale_frames = max(int(fps), 1)  # Revisar escala ~1 vez por segundo
+        self.running = False
+        self.background = None
+        self.frame_count = 0
+        self.render_times = deque(maxlen=100)
+
+        # Crear figura y canvas una sola vez
+        self.fig, axes = plt.subplots(self.n_channels, 1, figsize=(10, 8), sharex=True, squeeze=False)
+        self.axes = axes[:, 0]
+        self.fig.tight_layout(pad=3.0)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+        # Crear una línea por canal; solo se actualizan sus datos
+        self.x = np.arange(ring_buffer.capacity)
+        self.lines = []
+        for ax, name in zip(self.axes, channel_names):
+            line, = ax.plot([], [], animated=True, linewidth=0.8)
+            self.lines.append(line)
+            ax.set_ylabel(name)
+            ax.set_xlim(0, ring_buffer.capacity - 1)
+            ax.set_ylim(*ylim)
+            ax.grid(True)
+        self.axes[-1].set_xlabel('Muestras')
+
+        # Guardar el fondo cada vez que se redibuja la figura completa
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for ax, line in zip(self.axes, self.lines):
+            ax.draw_artist(line)
+
+    def autoscale(self, data):
+        # Ajustar los límites Y si la señal se sale o queda muy pequeña
+        data = data[~np.isnan(data[:, 0])]  # Las filas NaN marcan cortes de la conexión
+        if len(data) == 0:
+            return False
+        lows = data[:, :self.n_channels].min(axis=0)
+        highs = data[:, :self.n_channels].max(axis=0)
+        changed = False
+        for ax, lo, hi in zip(self.axes, lows, highs):
+            y0, y1 = ax.get_ylim()
+            span = max(hi - lo, 1e-6)
+            if lo < y0 or hi > y1 or span < 0.25 * (y1 - y0):
+                margin = 0.1 * span
+                ax.set_ylim(lo - margin, hi + margin)
+                changed = True
+        return changed
+
+    def render_frame(self):
+        start = time.perf_counter()
+
+        # Actualizar las líneas con la vista del buffer circular
+        data, _ = self.buffer.latest()
+        n_samples = len(data)
+        for i, line in enumerate(self.lines):
+            line.set_data(self.x[:n_samples], data[:, i])
+
+        self.frame_count += 1
+        if self.frame_count % self.autoscale_frames == 0 and self.autoscale(data):
+            # Cambio de escala: redibujar todo y renovar el fondo
+            self.canvas.draw()
+        elif self.background is not None:
+            # Blitting: restaurar fondo, dibujar líneas y copiar solo la figura
+            self.canvas.restore_region(self.background)
+            self.draw_lines()
+            self.canvas.blit(self.fig.bbox)
+
+        self.render_times.append(time.perf_counter() - start)
+
+    def tick(self):
+        if not self.running:
+            return
+        self.render_frame()
+        self.master.after(self.frame_interval, self.tick)
+
+    def start(self):
+        # Temporizador de Tk independiente de la frecuencia de datos
+        if not self.running:
+            self.running = True
+            self.master.after(self.frame_interval, self.tick)
+
+    def stop(self):
+        self.running = False
+
+    def format_stats(self):
+        # Tiempo medio de render por fotograma
+        if not self.render_times:
+            return "Render: -"
+        mean_ms = 1000 * sum(self.render_times) / len(self.render_times)
+        return f"Render: {mean_ms:.1f} ms/frame"
@@ -0,0 +1,39 @@
+import random
+import time
+
+import numpy as np
+
+
+class Backoff:
+    def __init__(self, initial=0.5, maximum=10.0, factor=2.0, jitter=0.1):
+        # Espera exponencial entre reintentos: initial, initial·factor, ... hasta maximum,
+        # con una variación aleatoria de ±jitter para que varios clientes no reintenten a la vez
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def reset(self):
+        # Tras una reconexión correcta, el siguiente corte vuelve a empezar por la espera corta
+        self.attempts = 0
+
+    def next_delay(self):
+        delay = min(self.initial * self.factor ** self.attempts, self.maximum)
+        self.attempts += 1
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def sleep(self, cancel=None, step=0.1):
+        # Esperar el siguiente intervalo en pasos cortos; False si cancel() lo interrumpe
+        deadline = time.monotonic() + self.next_delay()
+        while time.monotonic() < deadline:
+            if cancel is not None and cancel():
+                return False
+            time.sleep(min(step, max(deadline - time.monotonic(), 0)))
+        return cancel is None or not cancel()
+
+
+def mark_gap(ring_buffer):
+    # Una fila NaN en el buffer de visualización: Matplotlib corta la línea en el hueco
+    # y los datos anteriores al corte se conservan
+    ring_buffer.extend(np.full((1, ring_buffer.n_channels), np.nan, dtype=ring_buffer.data.dtype), np.nan)
@@ -0,0 +1,165 @@
+import json
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+# Formato .eegrec: cabecera fija + metadatos JSON + registros (timestamp, muestra)
+MAGIC = b'EEGREC01'
+HEADER_SIZE = 4096
+HEADER_PREFIX = struct.Struct('<8sIQ')  # magic, tamaño de cabecera, muestras escritas
+
+
+def record_dtype(n_channels):
+    # Un registro por muestra: timestamp float64 + canales float32
+    return np.dtype([('timestamp', '<f8'), ('data', '<f4', (n_channels,))])
+
+
+class StreamRecorder:
+    def __init__(self, path, channel_names, srate=0.0, grow_seconds=60, queue_size=1000):
+        # Grabación en disco por un hilo escritor; la adquisición solo encola
+        self.path = path
+        self.channel_names = list(channel_names)
+        self.n_channels = len(self.channel_names)
+        self.srate = srate
+        self.dtype = record_dtype(self.n_channels)
+        self.grow_samples = max(int(grow_seconds * (srate or 1000)), 1024)  # Muestras por ampliación
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.n_samples = 0
+        self.dropped_chunks = 0
+        self.running = False
+
+        self.create_file()
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.running = True
+        self.thread.start()
+
+    def create_file(self):
+        # Escribir cabecera y preasignar el primer tramo del fichero
+        meta = json.dumps({
+            'channels': self.channel_names,
+            'n_channels': self.n_channels,
+            'srate': self.srate,
+            'created': time.time(),
+            'dtype': 'float32',
+        }).encode('utf-8')
+        if HEADER_PREFIX.size + len(meta) > HEADER_SIZE:
+            raise ValueError("Metadatos demasiado grandes para la cabecera")
+
+        with open(self.path, 'wb') as f:
+            f.write(HEADER_PREFIX.pack(MAGIC, HEADER_SIZE, 0))
+            f.write(meta)
+            f.truncate(HEADER_SIZE)
+        self.capacity = 0
+        self.map = None
+        self.grow()
+
+    def grow(self):
+        # Ampliar el fichero preasignado y volver a mapearlo
+        if self.map is not None:
+            self.map.flush()
+            del self.map
+        self.capacity += self.grow_samples
+        with open(self.path, 'r+b') as f:
+            f.truncate(HEADER_SIZE + self.capacity * self.dtype.itemsize)
+        self.map = np.memmap(self.path, dtype=self.dtype, mode='r+', offset=HEADER_SIZE, shape=(self.capacity,))
+
+    def write(self, chunk, timestamps=None):
+        # Llamable desde el hilo de adquisición: copia el bloque y nunca bloquea
+        chunk = np.atleast_2d(np.asarray(chunk))
+        n_samples = len(chunk)
+        if n_samples == 0 or not self.running:
+            return
+        if timestamps is None:
+            timestamps = np.nan
+        records = np.empty(n_samples, dtype=self.dtype)
+        records['timestamp'] = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), (n_samples,))
+        n_cols = min(chunk.shape[1], self.n_channels)
+        records['data'][:, :n_cols] = chunk[:, :n_cols]
+        if n_cols < self.n_channels:
+            records['data'][:, n_cols:] = np.nan
+        try:
+            self.queue.put_nowait(records)
+        except queue.Full:
+            self.dropped_chunks += 1
+
+    def write_loop(self):
+        last_flush = time.monotonic()
+        while self.running or not self.queue.empty():
+            try:
+                records = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                records = None
+
+            if records is not None:
+                while self.n_samples + len(records) > self.capacity:
+                    self.grow()
+                self.map[self.n_samples:self.n_samples + len(records)] = records
+                self.n_samples += len(records)
+
+            # Volcar a disco y actualizar el contador de la cabecera cada segundo
+            if time.monotonic() - last_flush >= 1.0:
+                self.flush()
+                last_flush = time.monotonic()
+
+        self.finalize()
+
+    def flush(self):
+        self.map.flush()
+        with open(self.path, 'r+b') as f:
+            f.write(HEADER_PREFIX.pack(MAGIC, HEADER_SIZE, self.n_samples))
+
+    def finalize(self):
+        # Recortar el espacio preasignado no usado
+        self.flush()
+        del self.map
+        self.map = None
+        with open(self.path, 'r+b') as f:
+            f.truncate(HEADER_SIZE + self.n_samples * self.dtype.itemsize)
+
+    def close(self):
+        # Esperar a que el hilo escritor vacíe la cola
+        self.running = False
+        self.thread.join()
+
+    def format_stats(self):
+        return f"Grabadas: {self.n_samples} muestras | Bloques descartados: {self.dropped_chunks}"
+
+
+class RecordingReader:
+    def __init__(self, path):
+        # Abrir una grabación de forma perezosa mediante mmap (sin cargarla en memoria)
+        self.path = path
+        with open(path, 'rb') as f:
+            prefix = f.read(HEADER_SIZE)
+        magic, header_size, n_samples = HEADER_PREFIX.unpack_from(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es una grabación .eegrec")
+        meta_bytes = prefix[HEADER_PREFIX.size:header_size].rstrip(b'\0')
+        self.meta = json.loads(meta_bytes.decode('utf-8'))
+        self.n_channels = self.meta['n_channels']
+        self.channel_names = self.meta['channels']
+        self.srate = self.meta['srate']
+        self.n_samples = n_samples
+        self.records = np.memmap(path, dtype=record_dtype(self.n_channels), mode='r',
+                                 offset=header_size, shape=(n_samples,))
+
+    def __len__(self):
+        return self.n_samples
+
+    @property
+    def data(self):
+        # Vista (n_samples, n_channels) sobre el fichero
+        return self.records['data']
+
+    @property
+    def timestamps(self):
+        return self.records['timestamp']
+
+    def iter_chunks(self, chunk_size):
+        # Recorrer la grabación por bloques sin leerla entera
+        for start in range(0, self.n_samples, chunk_size):
+            block = self.records[start:start + chunk_size]
+            yield block['data'], block['timestamp']
@@ -0,0 +1,66 @@
+import numpy as np
+
+from common.recorder import RecordingReader
+
+
+class RecordingReplay:
+    def __init__(self, path, loop=False):
+        # Fuente de bloques leída por partes de una grabación .eegrec (mmap)
+        self.reader = RecordingReader(path)
+        if len(self.reader) == 0:
+            raise ValueError(f"{path} no contiene muestras")
+
+        self.path = path
+        self.n_channels = self.reader.n_channels
+        self.channel_names = self.reader.channel_names
+        self.srate = self.reader.srate or self.estimate_srate()
+        self.loop = loop  # Volver al principio al llegar al final
+        self.position = 0  # Próxima muestra a leer
+        self.time_offset = 0.0  # Desplazamiento de timestamps originales en cada vuelta
+        self.finished = False
+
+    def estimate_srate(self):
+        # Grabaciones sin frecuencia anunciada (JSON): usar la duración total
+        timestamps = self.reader.timestamps
+        duration = timestamps[-1] - timestamps[0]
+        if not np.isfinite(duration) or duration <= 0:
+            raise ValueError(f"No se puede deducir la frecuencia de muestreo de {self.path}")
+        return (len(timestamps) - 1) / duration
+
+    def rewind(self):
+        self.position = 0
+        self.time_offset = 0.0
+        self.finished = False
+
+    def wrap(self):
+        # En bucle, al llegar al final: volver al principio desplazando los timestamps originales
+        if self.position >= len(self.reader) and self.loop:
+            timestamps = self.reader.timestamps
+            self.time_offset += timestamps[-1] - timestamps[0] + 1.0 / self.srate
+            self.position = 0
+
+    def next_chunk(self, n_samples):
+        # Devolver (bloque float32 contiguo, timestamps originales); bloque vacío al terminar.
+        # El bloque es más corto que n_samples al final de la grabación (también en bucle)
+        self.wrap()
+        block = self.reader.records[self.position:self.position + n_samples]
+        self.position += len(block)
+        if self.position >= len(self.reader) and not self.loop:
+            self.finished = True
+
+        chunk = np.ascontiguousarray(block['data'])
+        timestamps = block['timestamp'] + self.time_offset
+        return chunk, timestamps
+
+    def skip(self, n_samples):
+        # Avanzar sin leer (muestras saltadas por el planificador al ir con retraso)
+        while n_samples > 0 and not self.finished:
+            self.wrap()
+            step = min(n_samples, len(self.reader) - self.position)
+            self.position += step
+            n_samples -= step
+            if self.position >= len(self.reader) and not self.loop:
+                self.finished = True
+
+    def format_stats(self):
+        return f"Reproducción: {self.position}/{len(self.reader)} muestras"
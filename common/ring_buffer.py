@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, n_channels, dtype=np.float32):
+        # Buffer circular preasignado (capacity, n_channels) con columna de timestamps.
+        # Cada muestra se escribe dos veces (posición i e i + capacity) para que
+        # las últimas N muestras sean siempre un bloque contiguo sin copias.
+        self.capacity = capacity
+        self.n_channels = n_channels
+        self.data = np.zeros((2 * capacity, n_channels), dtype=dtype)
+        self.timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self.write_index = 0  # Posición de la próxima muestra (0..capacity-1)
+        self.total_written = 0  # Muestras escritas desde el inicio
+
+    def __len__(self):
+        return min(self.total_written, self.capacity)
+
+    def extend(self, chunk, timestamps=None):
+        # Añadir un bloque (n_samples, n_channels) en una sola operación
+        chunk = np.asarray(chunk)
+        if chunk.ndim == 1:
+            chunk = chunk[np.newaxis, :]
+        n_samples = len(chunk)
+        if n_samples == 0:
+            return
+
+        if timestamps is None:
+            timestamps = np.nan
+        timestamps = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), (n_samples,))
+
+        # Si el bloque supera la capacidad solo se conservan las últimas muestras
+        self.total_written += n_samples
+        if n_samples > self.capacity:
+            chunk = chunk[-self.capacity:]
+            timestamps = timestamps[-self.capacity:]
+            n_samples = self.capacity
+
+        n_cols = min(chunk.shape[1], self.n_channels)
+        start = self.write_index
+        first = min(n_samples, self.capacity - start)
+        for offset in (0, self.capacity):
+            # Tramo hasta el final del anillo y resto desde el principio
+            self.data[offset + start:offset + start + first, :n_cols] = chunk[:first, :n_cols]
+            self.timestamps[offset + start:offset + start + first] = timestamps[:first]
+            if first < n_samples:
+                rest = n_samples - first
+                self.data[offset:offset + rest, :n_cols] = chunk[first:, :n_cols]
+                self.timestamps[offset:offset + rest] = timestamps[first:]
+
+        self.write_index = (start + n_samples) % self.capacity
+
+    def latest(self, n_samples=None):
+        # Vista (sin copia) de las últimas n_samples muestras y sus timestamps
+        available = len(self)
+        if n_samples is None or n_samples > available:
+            n_samples = available
+        end = self.write_index + self.capacity
+        return self.data[end - n_samples:end], self.timestamps[end - n_samples:end]
+
+    def clear(self):
+        self.write_index = 0
+        self.total_written = 0
@@ -0,0 +1,169 @@
+import statistics
+import time
+from collections import deque
+
+import numpy as np
+
+
+def default_clock():
+    # Reloj de las muestras: pylsl.local_clock (el de los timestamps LSL) o time.monotonic sin pylsl
+    try:
+        from pylsl import local_clock
+    except ImportError:
+        return time.monotonic
+    return local_clock
+
+
+class DeadlineScheduler:
+    def __init__(self, srate, chunk_size=1, max_backlog=None, clock=time.monotonic):
+        # Frecuencia nominal y tamaño de bloque
+        self.srate = srate
+        self.chunk_size = chunk_size
+        self.clock = clock  # Reloj monótono (time.monotonic o pylsl.local_clock)
+
+        # Máximo de muestras recuperadas en una sola emisión (por defecto 1 s)
+        if max_backlog is None:
+            max_backlog = max(int(srate), chunk_size)
+        self.max_backlog = max(max_backlog, chunk_size)
+
+        self.start_time = None
+        self.sample_count = 0  # Muestras programadas desde el inicio
+        self.skipped_samples = 0  # Muestras descartadas por exceso de retraso
+        self.catchup_count = 0  # Emisiones con más de un bloque pendiente
+        self.lateness = deque(maxlen=1000)  # Retraso al despertar (s)
+
+    def start(self):
+        # Anclar los deadlines al instante actual
+        self.start_time = self.clock()
+        self.sample_count = 0
+        self.skipped_samples = 0
+        self.catchup_count = 0
+        self.lateness.clear()
+
+    def wait(self):
+        # Dormir hasta el siguiente deadline absoluto y devolver
+        # (muestras a emitir, timestamp de la última muestra)
+        if self.start_time is None:
+            self.start()
+
+        deadline = self.start_time + (self.sample_count + self.chunk_size) / self.srate
+        now = self.clock()
+        if now < deadline:
+            time.sleep(deadline - now)
+            now = self.clock()
+        self.lateness.append(now - deadline)
+
+        # Muestras vencidas según el reloj, redondeadas a bloques completos
+        due = int((now - self.start_time) * self.srate) - self.sample_count
+        n_samples = max(due // self.chunk_size, 1) * self.chunk_size
+
+        if n_samples > self.max_backlog:
+            # Demasiado retraso: saltar muestras en lugar de acumularlas
+            max_samples = (self.max_backlog // self.chunk_size) * self.chunk_size
+            skipped = n_samples - max_samples
+            self.skipped_samples += skipped
+            self.sample_count += skipped
+            n_samples = max_samples
+        if n_samples > self.chunk_size:
+            self.catchup_count += 1
+
+        # Timestamp (retrofechado si vamos tarde) de la última muestra del bloque
+        self.sample_count += n_samples
+        timestamp = self.start_time + (self.sample_count - 1) / self.srate
+        return n_samples, timestamp
+
+    def timestamps(self, n_samples):
+        # Reloj de muestras: la muestra k se fecha en start_time + k / srate, al generarla y no al enviarla
+        first = self.sample_count - n_samples
+        return self.start_time + (first + np.arange(n_samples)) / self.srate
+
+    def give_back(self, n_samples):
+        # Muestras programadas que no se emitieron (bloque corto al final de una reproducción):
+        # el siguiente deadline se adelanta y el reloj de muestras continúa sin hueco
+        self.sample_count -= n_samples
+
+    def stats(self):
+        # Tasa efectiva frente a la nominal y jitter de los despertares
+        if self.start_time is None:
+            return None
+
+        elapsed = self.clock() - self.start_time
+        emitted = self.sample_count - self.skipped_samples
+        lateness = list(self.lateness)
+        return {
+            'nominal_rate': self.srate,
+            'achieved_rate': emitted / elapsed if elapsed > 0 else 0.0,
+            'jitter_ms': statistics.pstdev(lateness) * 1000 if lateness else 0.0,
+            'mean_lateness_ms': statistics.fmean(lateness) * 1000 if lateness else 0.0,
+            'max_lateness_ms': max(lateness) * 1000 if lateness else 0.0,
+            'catchups': self.catchup_count,
+            'skipped_samples': self.skipped_samples,
+        }
+
+    def format_stats(self):
+        # Texto breve para etiquetas de estado y logs
+        stats = self.stats()
+        if stats is None:
+            return "Tasa: -"
+        return (f"Tasa: {stats['achieved_rate']:.1f}/{stats['nominal_rate']:g} Hz | "
+                f"Jitter: {stats['jitter_ms']:.2f} ms")
+
+
+class FreeRunScheduler:
+    def __init__(self, srate, chunk_size=1, clock=time.monotonic):
+        # Misma interfaz que DeadlineScheduler pero sin esperar: emite lo más rápido posible
+        self.srate = srate  # Solo se usa para los timestamps (línea temporal nominal)
+        self.chunk_size = chunk_size
+        self.clock = clock
+        self.start_time = None
+        self.sample_count = 0
+        self.skipped_samples = 0  # Nunca salta muestras (misma interfaz que DeadlineScheduler)
+
+    def start(self):
+        self.start_time = self.clock()
+        self.sample_count = 0
+
+    def wait(self):
+        # Sin dormir: un bloque por llamada con timestamps a la frecuencia nominal
+        if self.start_time is None:
+            self.start()
+        self.sample_count += self.chunk_size
+        timestamp = self.start_time + (self.sample_count - 1) / self.srate
+        return self.chunk_size, timestamp
+
+    def timestamps(self, n_samples):
+        first = self.sample_count - n_samples
+        return self.start_time + (first + np.arange(n_samples)) / self.srate
+
+    def give_back(self, n_samples):
+        self.sample_count -= n_samples
+
+    def stats(self):
+        if self.start_time is None:
+            return None
+
+        elapsed = self.clock() - self.start_time
+        return {
+            'nominal_rate': self.srate,
+            'achieved_rate': self.sample_count / elapsed if elapsed > 0 else 0.0,
+            'jitter_ms': 0.0,
+            'mean_lateness_ms': 0.0,
+            'max_lateness_ms': 0.0,
+            'catchups': 0,
+            'skipped_samples': 0,
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        if stats is None:
+            return "Tasa: -"
+        return f"Tasa: {stats['achieved_rate']:.1f} Hz (sin límite)"
+
+
+def create_scheduler(srate, chunk_size=1, speed=1.0, clock=None):
+    # speed multiplica la frecuencia nominal; 0 emite lo más rápido posible
+    if clock is None:
+        clock = default_clock()
+    if speed <= 0:
+        return FreeRunScheduler(srate, chunk_size, clock)
+    return DeadlineScheduler(srate * speed, chunk_size, clock=clock)
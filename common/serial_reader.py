@@ -0,0 +1,176 @@
+import struct
+import threading
+import time
+
+# Protocolo de texto con el Arduino (una línea por mensaje):
+#   master -> Arduino: "@<seq> <comando>" si se activan los números de secuencia
+#   Arduino -> master: "ACK <seq>" al ejecutar un comando, "T <v1>,<v2>,..." con telemetría
+SEQ_PREFIX = '@'
+ACK_PREFIX = 'ACK'
+TELEMETRY_PREFIX = 'T'
+
+# Protocolo binario: sincronismo, tipo ('T' o 'A'), longitud, payload y checksum (suma módulo 256).
+# Telemetría: float32 little-endian; ACK: uint32 little-endian con la secuencia
+BINARY_SYNC = b'\xaa\x55'
+FRAMINGS = ('line', 'binary')
+
+
+def format_command(seq, command):
+    return f"{SEQ_PREFIX}{seq} {command}"
+
+
+class LineParser:
+    def __init__(self):
+        self.buffer = b''
+
+    def feed(self, data):
+        # Devolver eventos ('ack', seq), ('telemetry', valores) o ('line', texto)
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b'\n')
+        events = []
+        for raw in lines:
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+            kind, _, rest = line.partition(' ')
+            try:
+                if kind == ACK_PREFIX:
+                    events.append(('ack', int(rest)))
+                    continue
+                if kind == TELEMETRY_PREFIX:
+                    events.append(('telemetry', [float(v) for v in rest.split(',')]))
+                    continue
+            except ValueError:
+                pass
+            events.append(('line', line))
+        return events
+
+
+class BinaryParser:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        self.buffer += data
+        events = []
+        while True:
+            start = self.buffer.find(BINARY_SYNC)
+            if start < 0:
+                # Conservar un posible primer byte de sincronismo
+                del self.buffer[:max(len(self.buffer) - 1, 0)]
+                return events
+            del self.buffer[:start]
+            if len(self.buffer) < 4:
+                return events
+            kind, length = self.buffer[2], self.buffer[3]
+            if len(self.buffer) < 5 + length:
+                return events
+            payload = bytes(self.buffer[4:4 + length])
+            checksum = self.buffer[4 + length]
+            if sum(payload) & 0xFF != checksum:
+                # Trama corrupta: saltar el sincronismo y buscar el siguiente
+                self.errors += 1
+                del self.buffer[:2]
+                continue
+            del self.buffer[:5 + length]
+
+            if kind == ord('A') and length == 4:
+                events.append(('ack', struct.unpack('<I', payload)[0]))
+            elif kind == ord('T') and length % 4 == 0:
+                events.append(('telemetry', list(struct.unpack(f'<{length // 4}f', payload))))
+            else:
+                self.errors += 1
+
+
+class SerialReader:
+    def __init__(self, framing='line'):
+        if framing not in FRAMINGS:
+            raise ValueError(f"Formato desconocido: {framing} (opciones: {', '.join(FRAMINGS)})")
+
+        # Hilo de lectura no bloqueante para telemetría y confirmaciones del Arduino
+        self.framing = framing
+        self.parser = LineParser() if framing == 'line' else BinaryParser()
+        self.port = None
+        self.running = False
+        self.thread = None
+        self.on_ack = None  # Callback (seq, instante monotónico de llegada)
+        self.on_telemetry = None  # Callback (lista de valores)
+        self.on_line = None  # Callback (texto) para líneas que no son ACK ni telemetría
+
+        # Métricas
+        self.bytes_read = 0
+        self.acks = 0
+        self.telemetry_samples = 0
+
+    def set_port(self, port):
+        # Al cambiar de puerto se descartan los bytes a medias del anterior
+        self.parser = LineParser() if self.framing == 'line' else BinaryParser()
+        self.port = port
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.read_loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def read_loop(self):
+        while self.running:
+            port = self.port
+            if port is None or not port.is_open:
+                time.sleep(0.1)
+                continue
+            try:
+                # Leer lo disponible; si no hay nada, esperar como mucho el timeout del puerto
+                data = port.read(max(port.in_waiting, 1))
+            except (OSError, TypeError):
+                # Puerto cerrado desde otro hilo
+                time.sleep(0.1)
+                continue
+            if not data:
+                continue
+            received = time.monotonic()
+            self.bytes_read += len(data)
+            self.dispatch(self.parser.feed(data), received)
+
+    def dispatch(self, events, received):
+        for kind, value in events:
+            if kind == 'ack':
+                self.acks += 1
+                if self.on_ack is not None:
+                    self.on_ack(value, received)
+            elif kind == 'telemetry':
+                self.telemetry_samples += 1
+                if self.on_telemetry is not None:
+                    self.on_telemetry(value)
+            elif self.on_line is not None:
+                self.on_line(value)
+
+
+class TelemetryOutlet:
+    def __init__(self, name='ArduinoTelemetry', source_id='ArduinoTelemetry001'):
+        # Stream LSL creado con la primera muestra (el número de valores lo fija el Arduino)
+        self.name = name
+        self.source_id = source_id
+        self.outlet = None
+        self.n_values = 0
+
+    def push(self, values):
+        from pylsl import StreamInfo, StreamOutlet
+
+        if self.outlet is None or len(values) != self.n_values:
+            self.n_values = len(values)
+            info = StreamInfo(
+                name=self.name,
+                type='Telemetry',
+                channel_count=self.n_values,
+                nominal_srate=0,  # Muestreo irregular
+                channel_format='float32',
+                source_id=self.source_id
+            )
+            self.outlet = StreamOutlet(info)
+            print(f"Stream LSL '{self.name}' creado con {self.n_values} valores")
+        self.outlet.push_sample(values)
@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from common.serial_reader import format_command
+
+# Políticas cuando la cola de comandos está llena
+SERIAL_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+def actuator_key(command):
+    # "servo1:90" o "servo1=90" -> "servo1": solo importa la última consigna de cada actuador.
+    # Los comandos sin actuador (p. ej. "ON") nunca se fusionan.
+    for separator in (':', '='):
+        if separator in command:
+            return command.split(separator, 1)[0].strip()
+    return None
+
+
+class SerialWriter:
+    def __init__(self, max_queue=64, policy='drop_oldest', coalesce=actuator_key, max_batch=32,
+                 block_timeout=1.0, seq_ids=False):
+        if policy not in SERIAL_POLICIES:
+            raise ValueError(f"Política desconocida: {policy} (opciones: {', '.join(SERIAL_POLICIES)})")
+
+        # Hilo dedicado de escritura serie: los hilos de red solo encolan comandos
+        self.max_queue = max_queue
+        self.policy = policy
+        self.coalesce = coalesce  # Función comando -> clave de actuador (o None)
+        self.max_batch = max_batch  # Comandos agrupados en una sola escritura
+        self.block_timeout = block_timeout  # Espera máxima con la política 'block' (s)
+        self.seq_ids = seq_ids  # Prefijar "@<seq> " para que el Arduino confirme con "ACK <seq>"
+        self.next_seq = 0
+        self.sent_times = OrderedDict()  # seq -> instante de escritura, pendientes de ACK
+        self.port = None  # Objeto serial.Serial (o compatible) en uso
+        self.pending = OrderedDict()  # Clave -> comando, en orden de llegada
+        self.condition = threading.Condition()
+        self.next_key = 0  # Claves únicas para comandos no fusionables
+        self.running = False
+        self.thread = None
+        self.on_written = None  # Callback (lista de comandos) desde el hilo de escritura
+        self.on_error = None  # Callback (excepción) desde el hilo de escritura
+
+        # Métricas
+        self.enqueued = 0
+        self.written = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.history = deque(maxlen=200)  # (instante, comandos, bytes) de las últimas escrituras
+        self.write_times = deque(maxlen=200)  # Duración de cada write (s)
+        self.rtts = deque(maxlen=1000)  # Ida y vuelta comando -> ACK (s)
+
+    def set_port(self, port):
+        with self.condition:
+            self.port = port
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.write_loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        # Vaciar lo pendiente y terminar el hilo
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+
+    def send(self, command):
+        # Llamable desde cualquier hilo; devuelve False si el comando se descarta
+        key = self.coalesce(command) if self.coalesce is not None else None
+        with self.condition:
+            self.enqueued += 1
+            if key is not None and key in self.pending:
+                # Sustituir la consigna pendiente del mismo actuador sin perder su turno
+                self.pending[key] = command
+                self.coalesced += 1
+                return True
+            if key is None:
+                key = ('#', self.next_key)
+                self.next_key += 1
+
+            if len(self.pending) >= self.max_queue:
+                if self.policy == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                if self.policy == 'drop_oldest':
+                    self.pending.popitem(last=False)
+                    self.dropped += 1
+                elif not self.condition.wait_for(lambda: len(self.pending) < self.max_queue or not self.running,
+                                                 self.block_timeout):
+                    # block: contrapresión sobre el hilo de red hasta que haya sitio
+                    self.dropped += 1
+                    return False
+
+            self.pending[key] = command
+            self.max_depth = max(self.max_depth, len(self.pending))
+            self.condition.notify_all()
+            return True
+
+    def write_loop(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or not self.running)
+                if not self.pending:
+                    return
+                # Agrupar varios comandos en una sola escritura
+                batch = []
+                while self.pending and len(batch) < self.max_batch:
+                    batch.append(self.pending.popitem(last=False)[1])
+                port = self.port
+                self.condition.notify_all()  # Despertar productores bloqueados
+
+            if port is None or not port.is_open:
+                self.dropped += len(batch)
+                continue
+
+            lines = batch
+            if self.seq_ids:
+                lines = []
+                for command in batch:
+                    lines.append(format_command(self.next_seq, command))
+                    self.sent_times[self.next_seq] = time.monotonic()
+                    self.next_seq += 1
+                while len(self.sent_times) > 1000:
+                    self.sent_times.popitem(last=False)  # ACK perdido
+            data = "".join(line + "\n" for line in lines).encode()
+            start = time.perf_counter()
+            try:
+                port.write(data)
+            except OSError as e:
+                self.errors += 1
+                if self.on_error is not None:
+                    self.on_error(e)
+                continue
+            self.write_times.append(time.perf_counter() - start)
+            self.written += len(batch)
+            self.history.append((time.monotonic(), len(batch), len(data)))
+
+            if self.on_written is not None:
+                self.on_written(batch)
+
+    def acknowledge(self, seq, received=None):
+        # Llamable desde el hilo lector: RTT del comando confirmado (s) o None si no se conoce
+        sent = self.sent_times.pop(seq, None)
+        if sent is None:
+            return None
+        rtt = (received if received is not None else time.monotonic()) - sent
+        self.rtts.append(rtt)
+        return rtt
+
+    def rtt_histogram(self, bins=10):
+        # (cuentas, bordes en ms) de los últimos RTT
+        return np.histogram(np.array(self.rtts) * 1000, bins=bins)
+
+    def format_rtt_histogram(self, bins=10, width=30):
+        if not self.rtts:
+            return "RTT: sin confirmaciones"
+        counts, edges = self.rtt_histogram(bins)
+        lines = [f"RTT ({len(self.rtts)} ACK):"]
+        for count, low, high in zip(counts, edges[:-1], edges[1:]):
+            bar = '#' * int(round(width * count / counts.max()))
+            lines.append(f"{low:7.1f}-{high:7.1f} ms | {bar} {count}")
+        return "\n".join(lines)
+
+    def queue_depth(self):
+        return len(self.pending)
+
+    def stats(self):
+        # Comandos/s y bytes/s en la ventana reciente, profundidad de cola y descartes
+        history = list(self.history)
+        commands_per_s = bytes_per_s = 0.0
+        if len(history) > 1:
+            elapsed = history[-1][0] - history[0][0]
+            if elapsed > 0:
+                commands_per_s = sum(h[1] for h in history[1:]) / elapsed
+                bytes_per_s = sum(h[2] for h in history[1:]) / elapsed
+        write_times = list(self.write_times)
+        return {
+            'queue_depth': self.queue_depth(),
+            'max_depth': self.max_depth,
+            'commands_per_s': commands_per_s,
+            'bytes_per_s': bytes_per_s,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'mean_write_ms': sum(write_times) / len(write_times) * 1000 if write_times else 0.0,
+            'rtt_p50_ms': np.percentile(self.rtts, 50) * 1000 if self.rtts else None,
+            'rtt_p95_ms': np.percentile(self.rtts, 95) * 1000 if self.rtts else None,
+            'unacknowledged': len(self.sent_times),
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        text = (f"Cola: {stats['queue_depth']} (máx {stats['max_depth']}) | "
+                f"{stats['commands_per_s']:.1f} cmd/s, {stats['bytes_per_s']:.0f} B/s | "
+                f"Fusionados: {stats['coalesced']} | Descartados: {stats['dropped']}")
+        if stats['rtt_p50_ms'] is not None:
+            text += f" | RTT p50/p95: {stats['rtt_p50_ms']:.1f}/{stats['rtt_p95_ms']:.1f} ms"
+        return text
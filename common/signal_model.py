@@ -0,0 +1,219 @@
+import json
+from collections import deque
+
+import numpy as np
+
+from common.dsp import SOSFilter
+from common.eeg_generator import EEGChunkGenerator, channel_names
+
+# Aproximación de ruido rosa (1/f) con un IIR de 3 polos (Paul Kellet), válida en casi toda la banda
+PINK_B = [0.049922035, -0.095993537, 0.050612699, -0.004408786]
+PINK_A = [1.0, -2.494956002, 2.017265875, -0.522189400]
+
+
+def topography(names, spec, default=1.0):
+    # Pesos por canal a partir de {"nombre": peso}; los canales no listados reciben default_weight
+    # (0 si se listan canales, 1 si no). Los nombres desconocidos se ignoran
+    weights = spec.get('channels', {})
+    default = spec.get('default_weight', 0.0 if weights else default)
+    return np.array([weights.get(name, default) for name in names], dtype=np.float32)
+
+
+def gaussian_components(t, components):
+    # Respuesta evocada: suma de gaussianas {latency (s), amplitude (µV), width (s)}
+    wave = np.zeros_like(t)
+    for c in components:
+        wave += c['amplitude'] * np.exp(-0.5 * ((t - c['latency']) / c['width']) ** 2)
+    return wave
+
+
+class PinkNoise:
+    def __init__(self, n_channels, amplitude, correlation, rng):
+        from scipy.signal import lfilter, tf2sos
+
+        # Ruido 1/f con estado entre bloques; una columna extra aporta el componente común
+        self.n_channels = n_channels
+        self.amplitude = amplitude
+        self.correlation = correlation  # Fracción de varianza compartida entre canales (0-1)
+        self.rng = rng
+        self.filter = SOSFilter(tf2sos(PINK_B, PINK_A))
+        self.filter.zi = np.zeros((len(self.filter.sos), 2, n_channels + 1))
+
+        # Normalizar: desviación típica 'amplitude' en régimen permanente
+        impulse = np.zeros(1 << 15)
+        impulse[0] = 1.0
+        self.gain = amplitude / np.sqrt(np.sum(lfilter(PINK_B, PINK_A, impulse) ** 2))
+        self.mix = np.float32(np.sqrt(1 - correlation)), np.float32(np.sqrt(correlation))
+
+    def next_chunk(self, n_samples):
+        white = self.rng.standard_normal((n_samples, self.n_channels + 1), dtype=np.float32)
+        pink, _ = self.filter.process(white, None)
+        pink = pink.astype(np.float32) * np.float32(self.gain)
+        return self.mix[0] * pink[:, :-1] + self.mix[1] * pink[:, -1:]
+
+
+class EventTrain:
+    def __init__(self, srate, rate=None, interval=None, jitter=0.0, rng=None):
+        # Instantes de aparición (en muestras): Poisson con 'rate' (eventos/s) o periódicos
+        # cada 'interval' s con una variación uniforme de ±jitter s
+        self.srate = srate
+        self.rate = rate
+        self.interval = interval
+        self.jitter = jitter
+        self.rng = rng
+        self.next_onset = self.draw(0)
+
+    def draw(self, previous):
+        if self.interval is not None:
+            gap = self.interval + self.rng.uniform(-self.jitter, self.jitter)
+        else:
+            gap = self.rng.exponential(1.0 / self.rate)
+        return previous + max(int(round(gap * self.srate)), 1)
+
+    def onsets(self, end):
+        # Apariciones anteriores a la muestra 'end'
+        onsets = []
+        while self.next_onset < end:
+            onsets.append(self.next_onset)
+            self.next_onset = self.draw(self.next_onset)
+        return onsets
+
+
+class SignalModel:
+    def __init__(self, n_channels=8, srate=100, chunk_size=10, config=None, seed=None):
+        # Modelo de señal EEG: fuentes oscilatorias con mezcla espacial, ruido rosa y blanco,
+        # artefactos (parpadeos, músculo) y respuestas evocadas. Misma interfaz que EEGChunkGenerator
+        config = config or {}
+        self.n_channels = n_channels
+        self.srate = srate
+        self.chunk_size = chunk_size
+        self.names = channel_names(n_channels)
+        self.seed = seed if seed is not None else config.get('seed')
+        self.rng = np.random.default_rng(self.seed)
+        self.sample_index = 0
+        self.markers = deque(maxlen=1000)  # (muestra, etiqueta) de los estímulos, para un stream de marcadores
+        self.active = []  # (muestra de inicio, forma de onda (n, n_channels)) en curso
+
+        # Fuentes oscilatorias: (n_fuentes, n_canales) de mezcla precalculada
+        sources = config.get('sources', [])
+        self.freqs = np.array([s['freq'] for s in sources], dtype=np.float64)
+        self.amplitudes = np.array([s.get('amplitude', 1.0) for s in sources], dtype=np.float64)
+        self.mixing = np.array([topography(self.names, s) for s in sources],
+                               dtype=np.float32).reshape(len(sources), n_channels)
+        self.phases = self.rng.uniform(0, 2 * np.pi, len(sources))
+        self.phase_steps = 2 * np.pi * self.freqs / srate
+
+        # Modulación lenta de amplitud (p. ej. alfa que aparece y desaparece)
+        self.mod_freqs = np.array([s.get('modulation', {}).get('freq', 0.0) for s in sources])
+        self.mod_depths = np.array([s.get('modulation', {}).get('depth', 0.0) for s in sources])
+        self.mod_phases = self.rng.uniform(0, 2 * np.pi, len(sources))
+        self.mod_steps = 2 * np.pi * self.mod_freqs / srate
+
+        # Ruido de fondo
+        pink = config.get('pink_noise')
+        self.pink = None
+        if pink:
+            self.pink = PinkNoise(n_channels, pink.get('amplitude', 5.0), pink.get('correlation', 0.0), self.rng)
+        self.white_std = np.float32(config.get('white_noise', 0.0))
+
+        # Artefactos y estímulos con sus topografías
+        artifacts = config.get('artifacts', {})
+        self.artifacts = []
+        for kind, spec in artifacts.items():
+            train = EventTrain(srate, rate=spec.get('rate', 0.1), rng=self.rng)
+            self.artifacts.append((kind, spec, topography(self.names, spec), train))
+
+        events = config.get('events')
+        self.events = None
+        if events:
+            train = EventTrain(srate, interval=events.get('interval', 1.0), jitter=events.get('jitter', 0.0),
+                               rng=self.rng)
+            types = events['types']
+            probabilities = np.array([t.get('probability', 1.0) for t in types])
+            templates = []
+            for t in types:
+                length = max(c['latency'] + 4 * c['width'] for c in t['components'])
+                times = np.arange(int(length * srate)) / srate
+                templates.append(np.outer(gaussian_components(times, t['components']),
+                                          topography(self.names, t)).astype(np.float32))
+            self.events = (train, [t['label'] for t in types], probabilities / probabilities.sum(), templates)
+
+    @classmethod
+    def from_file(cls, path, n_channels=8, srate=100, chunk_size=10, seed=None):
+        with open(path) as f:
+            return cls(n_channels, srate, chunk_size, json.load(f), seed)
+
+    def artifact_wave(self, kind, spec, weights):
+        # Parpadeo: campana suave, sobre todo frontal. Músculo: ráfaga de ruido de alta frecuencia
+        n = max(int(spec.get('duration', 0.3) * self.srate), 2)
+        amplitude = spec.get('amplitude', 100.0 if kind == 'blink' else 20.0)
+        if kind == 'muscle':
+            noise = np.diff(self.rng.standard_normal((n + 1, self.n_channels)), axis=0) / np.sqrt(2)
+            return (noise * np.hanning(n)[:, np.newaxis] * amplitude * weights).astype(np.float32)
+        bump = np.sin(np.pi * np.arange(n) / n) ** 2 * amplitude
+        return np.outer(bump, weights).astype(np.float32)
+
+    def start_events(self, end):
+        for kind, spec, weights, train in self.artifacts:
+            for onset in train.onsets(end):
+                self.active.append((onset, self.artifact_wave(kind, spec, weights)))
+        if self.events is not None:
+            train, labels, probabilities, templates = self.events
+            for onset in train.onsets(end):
+                index = self.rng.choice(len(labels), p=probabilities)
+                self.active.append((onset, templates[index]))
+                self.markers.append((onset, labels[index]))
+
+    def next_chunk(self, n_samples=None):
+        # Generar un bloque (n_samples, n_channels) en float32
+        if n_samples is None:
+            n_samples = self.chunk_size
+        start, end = self.sample_index, self.sample_index + n_samples
+        steps = np.arange(n_samples)[:, np.newaxis]
+
+        # Osciladores (n_samples, n_fuentes) mezclados en los canales con una sola multiplicación
+        envelope = 1 + self.mod_depths * np.sin(self.mod_phases + self.mod_steps * steps)
+        sources = (self.amplitudes * envelope * np.sin(self.phases + self.phase_steps * steps)).astype(np.float32)
+        chunk = sources @ self.mixing
+
+        if self.pink is not None:
+            chunk += self.pink.next_chunk(n_samples)
+        if self.white_std:
+            chunk += self.rng.standard_normal((n_samples, self.n_channels), dtype=np.float32) * self.white_std
+
+        # Artefactos y respuestas evocadas que se solapan con este bloque
+        self.start_events(end)
+        active = []
+        for onset, wave in self.active:
+            first, last = max(onset, start), min(onset + len(wave), end)
+            if first < last:
+                chunk[first - start:last - start] += wave[first - onset:last - onset]
+            if onset + len(wave) > end:
+                active.append((onset, wave))
+        self.active = active
+
+        self.advance(n_samples)
+        return chunk
+
+    def advance(self, n_samples):
+        # Fases acotadas para no perder precisión
+        self.phases = (self.phases + self.phase_steps * n_samples) % (2 * np.pi)
+        self.mod_phases = (self.mod_phases + self.mod_steps * n_samples) % (2 * np.pi)
+        self.sample_index += n_samples
+
+    def skip(self, n_samples):
+        # Avanzar sin generar; los eventos que caen en el hueco se pierden como las muestras
+        self.start_events(self.sample_index + n_samples)
+        self.advance(n_samples)
+
+    def pop_markers(self):
+        markers = list(self.markers)
+        self.markers.clear()
+        return markers
+
+
+def create_generator(n_channels=8, srate=100, chunk_size=10, scenario=None, seed=None):
+    # Sin escenario: la onda alfa con ruido blanco de siempre
+    if scenario is None:
+        return EEGChunkGenerator(n_channels, srate, chunk_size, seed=seed)
+    return SignalModel.from_file(scenario, n_channels, srate, chunk_size, seed)
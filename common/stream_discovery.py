@@ -0,0 +1,158 @@
+import threading
+import time
+
+from common.eeg_generator import channel_names
+
+# Propiedades por las que se buscan streams, de la más a la menos específica
+# (resolve_byprop solo admite una; el resto se filtra en la caché)
+PROPERTIES = ('source_id', 'name', 'type')
+
+
+def matches(info, name=None, type=None, source_id=None):
+    return ((name is None or info.name() == name) and (type is None or info.type() == type)
+            and (source_id is None or info.source_id() == source_id))
+
+
+def stream_channel_names(info):
+    # Etiquetas <channels><channel><label> de un StreamInfo completo (el de inlet.info());
+    # nombres por defecto si el stream no las anuncia todas
+    n_channels = info.channel_count()
+    names = []
+    channel = info.desc().child('channels').child('channel')
+    while not channel.empty() and len(names) < n_channels:
+        names.append(channel.child_value('label'))
+        channel = channel.next_sibling('channel')
+    if len(names) != n_channels or not all(names):
+        return channel_names(n_channels)
+    return names
+
+
+class StreamDiscovery:
+    def __init__(self, interval=0.5, forget_after=5.0, resolve_timeout=1.0):
+        # Descubrimiento en segundo plano con un ContinuousResolver: caché de los streams visibles
+        # por (nombre, tipo, source_id) y avisos cuando aparecen o desaparecen
+        self.interval = interval  # Periodo de consulta del resolver (s)
+        self.forget_after = forget_after  # Un stream sin responder este tiempo se da por desaparecido
+        self.resolve_timeout = resolve_timeout  # Espera máxima de cada búsqueda directa (s)
+        self.streams = {}  # uid -> StreamInfo
+        self.last_seen = {}  # uid -> última vez (time.monotonic) que el stream respondió
+        self.lock = threading.Lock()
+        self.resolver = None
+        self.thread = None
+        self.running = False
+        self.on_appear = None  # Callback (StreamInfo) desde el hilo de descubrimiento
+        self.on_vanish = None  # Callback (StreamInfo)
+
+    def start(self):
+        from pylsl import ContinuousResolver
+
+        if self.running:
+            return
+        self.resolver = ContinuousResolver(forget_after=self.forget_after)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            self.update(self.resolver.results())
+            time.sleep(self.interval)
+
+    def update(self, infos, complete=True):
+        # Incorporar resultados; con complete=True (lista del resolver) los streams que llevan
+        # forget_after s sin aparecer se dan por desaparecidos
+        current = {info.uid(): info for info in infos}
+        now = time.monotonic()
+        with self.lock:
+            appeared = [info for uid, info in current.items() if uid not in self.streams]
+            self.streams.update(current)
+            self.last_seen.update(dict.fromkeys(current, now))
+            vanished = []
+            if complete:
+                vanished = [info for uid, info in self.streams.items()
+                            if now - self.last_seen[uid] > self.forget_after]
+            for info in vanished:
+                del self.streams[info.uid()]
+                del self.last_seen[info.uid()]
+
+        for info in appeared:
+            if self.on_appear is not None:
+                self.on_appear(info)
+        for info in vanished:
+            if self.on_vanish is not None:
+                self.on_vanish(info)
+
+    def find(self, name=None, type=None, source_id=None, exclude=()):
+        # Streams en caché que cumplen todas las propiedades indicadas (sin bloquear); exclude: uids
+        # descartados, p. ej. el de un stream perdido que sigue en la caché hasta forget_after
+        with self.lock:
+            infos = list(self.streams.values())
+        return [info for info in infos if matches(info, name, type, source_id) and info.uid() not in exclude]
+
+    def resolve(self, name=None, type=None, source_id=None, timeout=None, exclude=()):
+        # Devolver un StreamInfo de la caché o, si no hay, buscarlo directamente con resolve_byprop
+        # durante 'timeout' s como máximo; None si no aparece
+        from pylsl import resolve_byprop
+
+        infos = self.find(name, type, source_id, exclude)
+        if infos:
+            return infos[0]
+        props = {'source_id': source_id, 'name': name, 'type': type}
+        prop = next((p for p in PROPERTIES if props[p] is not None), None)
+        if prop is None:
+            raise ValueError("Indique al menos una propiedad: name, type o source_id")
+        if timeout is None:
+            timeout = self.resolve_timeout
+        found = [info for info in resolve_byprop(prop, props[prop], minimum=1, timeout=timeout)
+                 if matches(info, name, type, source_id) and info.uid() not in exclude]
+        if found:
+            self.update(found, complete=False)
+        return found[0] if found else None
+
+    def wait_for(self, name=None, type=None, source_id=None, timeout=None, cancel=None):
+        # Repetir resolve() hasta encontrar el stream, agotar 'timeout' (None: sin límite)
+        # o que cancel() devuelva True (p. ej. el usuario detuvo la recepción)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while cancel is None or not cancel():
+            remaining = self.resolve_timeout if deadline is None else min(deadline - time.monotonic(),
+                                                                          self.resolve_timeout)
+            if remaining <= 0:
+                return None
+            info = self.resolve(name, type, source_id, timeout=remaining)
+            if info is not None:
+                return info
+        return None
+
+    def format_stats(self):
+        with self.lock:
+            infos = list(self.streams.values())
+        names = ', '.join(sorted(info.name() for info in infos))
+        return f"Streams LSL visibles: {len(infos)}" + (f" ({names})" if names else "")
+
+
+class ConnectionTimer:
+    def __init__(self, clock=time.monotonic):
+        # Tiempos de arranque de un consumidor: búsqueda, apertura del inlet y primera muestra
+        self.clock = clock
+        self.start()
+
+    def start(self):
+        self.started = self.clock()
+        self.marks = {}
+
+    def mark(self, event):
+        # Solo la primera vez: resolved, opened, first_sample
+        if event not in self.marks:
+            self.marks[event] = self.clock() - self.started
+
+    def stats(self):
+        return {f"{event}_ms": elapsed * 1000 for event, elapsed in self.marks.items()}
+
+    def format_stats(self):
+        labels = {'resolved': 'búsqueda', 'opened': 'inlet', 'first_sample': 'primera muestra'}
+        parts = [f"{labels.get(event, event)} {elapsed * 1000:.0f} ms" for event, elapsed in self.marks.items()]
+        return "Arranque: " + ", ".join(parts) if parts else "Arranque: -"
+
@@ -0,0 +1,128 @@
+import time
+from collections import deque
+
+# Huecos de la secuencia recordados para reconocer los bloques tardíos que los rellenan
+MAX_MISSING_RANGES = 256
+
+
+class StreamStats:
+    def __init__(self, srate=None, window=5.0):
+        # Contabilidad por número de secuencia: cada bloque indica el índice de su primera muestra
+        self.window = window  # Ventana (s) para la tasa efectiva
+        self.reset(srate)
+
+    def reset(self, srate=None):
+        # Al conectar a un stream nuevo: contadores a cero
+        self.srate = srate  # Frecuencia nominal, para el jitter si no hay timestamps
+        self.next_seq = None  # Secuencia esperada del próximo bloque
+        self.gaps = 0  # Cortes de la conexión (reconexiones o streams reanudados)
+        self.received = 0
+        self.dropped = 0  # Muestras que faltan en la secuencia
+        self.missing = []  # Huecos [inicio, fin) aún sin rellenar, del más antiguo al más reciente
+        self.out_of_order = 0  # Bloques llegados después de uno posterior
+        self.duplicates = 0  # Muestras recibidas más de una vez
+        self.malformed = 0  # Mensajes descartados por no poder decodificarse
+        self.jitter = 0.0  # Jitter entre llegadas (s), estimador de RFC 3550
+        self.last_transit = None
+        self.history = deque()  # (instante de llegada, muestras) dentro de la ventana
+
+    def restart(self):
+        # Tras un corte: el emisor puede haber reiniciado su secuencia y su reloj, así que no se
+        # cuentan pérdidas ni jitter a través del hueco; el resto de contadores se conserva
+        self.next_seq = None
+        self.missing = []
+        self.last_transit = None
+        self.gaps += 1
+
+    def update(self, seq, n_samples, received=None, timestamp=None):
+        # seq: índice de la primera muestra del bloque; timestamp: de la última (reloj del emisor)
+        if received is None:
+            received = time.monotonic()
+        end = seq + n_samples
+        duplicates = 0
+
+        if self.next_seq is not None:
+            if seq > self.next_seq:
+                self.dropped += seq - self.next_seq
+                self.missing.append((self.next_seq, seq))
+                del self.missing[:-MAX_MISSING_RANGES]  # Los huecos más antiguos quedan como pérdida
+            elif seq < self.next_seq:
+                # Bloque tardío: solo las muestras que caen en un hueco recuperan pérdidas; el resto
+                # ya se había recibido
+                self.out_of_order += 1
+                late = min(end, self.next_seq) - seq
+                filled = self.fill(seq, seq + late)
+                self.dropped -= filled
+                duplicates = late - filled
+        self.duplicates += duplicates
+        self.received += n_samples - duplicates
+        self.next_seq = end if self.next_seq is None else max(self.next_seq, end)
+
+        # Variación del tiempo de tránsito entre bloques consecutivos (no requiere relojes sincronizados)
+        sent = timestamp
+        if sent is None and self.srate:
+            sent = (end - 1) / self.srate
+        if sent is not None:
+            transit = received - sent
+            if self.last_transit is not None:
+                self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16
+            self.last_transit = transit
+
+        self.history.append((received, n_samples))
+        while received - self.history[0][0] > self.window:
+            self.history.popleft()
+
+    def fill(self, start, end):
+        # Quitar [start, end) de los huecos pendientes; devuelve las muestras que rellena
+        filled = 0
+        missing = []
+        for first, last in self.missing:
+            overlap = min(last, end) - max(first, start)
+            if overlap <= 0:
+                missing.append((first, last))
+                continue
+            filled += overlap
+            if first < start:
+                missing.append((first, start))
+            if end < last:
+                missing.append((end, last))
+        self.missing = missing
+        return filled
+
+    def count_malformed(self):
+        self.malformed += 1
+
+    def rate(self):
+        # Muestras/s en la ventana reciente (llamable desde otro hilo: sin modificar la cola)
+        history = list(self.history)
+        if len(history) < 2:
+            return 0.0
+        elapsed = history[-1][0] - history[0][0]
+        return sum(n for _, n in history[1:]) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        expected = self.received + self.dropped
+        return {
+            'received': self.received,
+            'dropped': self.dropped,
+            'loss_percent': self.dropped / expected * 100 if expected else 0.0,
+            'out_of_order': self.out_of_order,
+            'duplicates': self.duplicates,
+            'malformed': self.malformed,
+            'gaps': self.gaps,
+            'jitter_ms': self.jitter * 1000,
+            'rate': self.rate(),
+            'nominal_rate': self.srate,
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        text = (f"Tasa: {stats['rate']:.1f} Hz | Pérdidas: {stats['dropped']} ({stats['loss_percent']:.2f} %) | "
+                f"Desordenados: {stats['out_of_order']} | Jitter: {stats['jitter_ms']:.2f} ms")
+        if stats['duplicates']:
+            text += f" | Duplicados: {stats['duplicates']}"
+        if stats['malformed']:
+            text += f" | Mensajes inválidos: {stats['malformed']}"
+        if stats['gaps']:
+            text += f" | Cortes: {stats['gaps']}"
+        return text
@@ -0,0 +1,108 @@
+import json
+import socket
+import struct
+import time
+
+import numpy as np
+
+# Saludo que envía un cliente para pedir el modo binario, o JSON con un bloque por línea
+# (sin saludo: JSON de siempre, una muestra por línea). Ambos de la misma longitud
+HELLO = b'EEGBIN1\n'
+HELLO_JSON = b'EEGJSN1\n'
+HELLO_TIMEOUT = 0.5  # Segundos que espera el servidor antes de usar JSON
+
+# Cabecera única: magic + longitud + metadatos JSON
+HEADER_MAGIC = b'EEGH'
+HEADER_PREFIX = struct.Struct('<4sI')
+
+# Trama: magic, longitud del bloque, secuencia, timestamp, muestras, canales
+FRAME_MAGIC = b'EEGF'
+FRAME_HEADER = struct.Struct('<4sIQdII')
+SAMPLE_DTYPE = np.dtype('<f4')
+
+
+def encode_header(channel_names, srate):
+    # Metadatos de los canales que se envían una sola vez por cliente
+    meta = json.dumps({
+        'channels': list(channel_names),
+        'n_channels': len(channel_names),
+        'srate': srate,
+        'dtype': 'float32',
+    }).encode('utf-8')
+    return HEADER_PREFIX.pack(HEADER_MAGIC, len(meta)) + meta
+
+
+def encode_frame(seq, timestamp, chunk):
+    # Bloque (n_samples, n_channels) empaquetado como float32 little-endian
+    data = np.ascontiguousarray(chunk, dtype=SAMPLE_DTYPE)
+    n_samples, n_channels = data.shape
+    header = FRAME_HEADER.pack(FRAME_MAGIC, data.nbytes, seq, timestamp, n_samples, n_channels)
+    return header + data.tobytes()
+
+
+def recv_exact_into(sock, view):
+    # Llenar la vista completa con recv_into; False si se cierra la conexión
+    view = memoryview(view).cast('B')
+    received = 0
+    while received < len(view):
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return False
+        received += n
+    return True
+
+
+def peek_header(sock, timeout=1.0):
+    # Mirar sin consumir si el servidor empieza con la cabecera binaria. Un segmento partido puede
+    # traer menos bytes que el magic: se vuelve a mirar mientras lo recibido sea un prefijo suyo
+    # (con un límite de tiempo, por si la conexión se cierra a medias)
+    deadline = time.monotonic() + timeout
+    data = sock.recv(len(HEADER_MAGIC), socket.MSG_PEEK)
+    while (data and len(data) < len(HEADER_MAGIC) and HEADER_MAGIC.startswith(data)
+           and time.monotonic() < deadline):
+        time.sleep(0.001)
+        data = sock.recv(len(HEADER_MAGIC), socket.MSG_PEEK)
+    return data == HEADER_MAGIC
+
+
+class BinaryFrameReader:
+    def __init__(self, sock, max_samples=256):
+        self.sock = sock
+        self.meta = None
+        self.header_buffer = bytearray(FRAME_HEADER.size)
+        self.data = None  # Buffer NumPy preasignado para los bloques
+        self.max_samples = max_samples
+
+    def read_header(self):
+        # Leer la cabecera única con los metadatos de los canales
+        prefix = bytearray(HEADER_PREFIX.size)
+        if not recv_exact_into(self.sock, prefix):
+            return None
+        magic, length = HEADER_PREFIX.unpack(prefix)
+        if magic != HEADER_MAGIC:
+            raise ValueError(f"Cabecera binaria inválida: {magic!r}")
+
+        payload = bytearray(length)
+        if not recv_exact_into(self.sock, payload):
+            return None
+        self.meta = json.loads(payload.decode('utf-8'))
+        self.data = np.empty((self.max_samples, self.meta['n_channels']), dtype=SAMPLE_DTYPE)
+        return self.meta
+
+    def read_frame(self):
+        # Devolver (seq, timestamp, bloque) o None si se cierra la conexión
+        if not recv_exact_into(self.sock, self.header_buffer):
+            return None
+        magic, length, seq, timestamp, n_samples, n_channels = FRAME_HEADER.unpack(self.header_buffer)
+        if magic != FRAME_MAGIC or length != n_samples * n_channels * SAMPLE_DTYPE.itemsize:
+            raise ValueError(f"Trama binaria inválida: {magic!r}")
+
+        # Ampliar el buffer si llega un bloque mayor que el previsto
+        if self.data is None or n_samples > self.data.shape[0] or n_channels != self.data.shape[1]:
+            self.data = np.empty((max(n_samples, self.max_samples), n_channels), dtype=SAMPLE_DTYPE)
+
+        # Recibir el bloque directamente en el array NumPy
+        chunk = self.data[:n_samples]
+        if not recv_exact_into(self.sock, chunk):
+            return None
+        return seq, timestamp, chunk
@@ -0,0 +1,163 @@
+import os
+import sys
+import serial
+from pylsl import local_clock
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.band_power import BANDS
+from common.cli import create_parser, dsp_options, run_headless
+from common.eeg_generator import channel_names
+from common.latency import LatencyTracker
+from common.serial_writer import SerialWriter
+from eeg_receiver import EEGReceiver
+from socket_eeg_receiver import SocketEEGReceiver
+
+# Etapas medidas para cada actualización de características
+STAGES = ('adquisicion', 'recepcion', 'caracteristica', 'decision', 'escritura')
+
+class EEGArduinoBridge:
+    def __init__(self, receiver, clock=local_clock, band='alpha', channels=None, threshold=20.0,
+                 hysteresis=0.2, on_command='ON', off_command='OFF', serial_port=None, baudrate=9600,
+                 budget=0.1):
+        # Receptor EEG (LSL o socket) cuyas potencias por banda deciden los comandos
+        self.receiver = receiver
+        self.clock = clock  # Mismo reloj que los timestamps de las muestras
+        self.band_index = list(BANDS).index(band)
+        self.channels = channels if channels is not None else slice(None)  # Canales promediados
+        self.threshold = threshold  # Potencia (µV²) a partir de la cual se envía on_command
+        self.hysteresis = hysteresis  # Fracción bajo el umbral para volver a off_command
+        self.on_command = on_command
+        self.off_command = off_command
+        self.serial_port = serial_port  # Puerto o URL de pyserial; None = simulación
+        self.baudrate = baudrate
+        self.budget = budget  # Latencia máxima (s) desde la muestra hasta la decisión
+        self.arduino = None
+        self.state = None  # Último comando enviado
+        self.value = None  # Última potencia calculada
+        self.commands_sent = 0
+        self.stale_decisions = 0
+        self.latency = LatencyTracker(STAGES, budget)
+        self.awaiting = None  # Instantes del comando pendiente de escribir
+        
+        # Escritor serie compartido con los masters; solo importa la última decisión pendiente
+        self.writer = SerialWriter(max_queue=1, coalesce=lambda command: 'estado')
+        self.writer.on_written = self.on_written
+        
+        # Las características llegan en el hilo de recepción, sin pasar por colas
+        self.receiver.on_features = self.on_features
+    
+    @property
+    def running(self):
+        return self.receiver.running
+    
+    def decide(self, value):
+        # Umbral con histéresis: solo devuelve un comando si cambia el estado
+        if value > self.threshold:
+            command = self.on_command
+        elif value < self.threshold * (1 - self.hysteresis):
+            command = self.off_command
+        else:
+            return None
+        return command if command != self.state else None
+    
+    def on_features(self, powers, timestamp, received):
+        times = {'adquisicion': timestamp, 'recepcion': received, 'caracteristica': self.clock()}
+        self.value = powers[self.band_index, self.channels].mean()
+        command = self.decide(self.value)
+        times['decision'] = self.clock()
+        
+        if command is not None:
+            if times['decision'] - timestamp > self.budget:
+                # Fuera de presupuesto: no actuar con datos viejos (se reintenta con los siguientes)
+                self.stale_decisions += 1
+            else:
+                # La etapa de escritura se completa en el hilo escritor
+                self.send_command(command, times)
+                return
+        self.latency.record(times)
+    
+    def send_command(self, command, times):
+        # Mismo camino que lsl_master.py: escritor serie, comando terminado en salto de línea
+        self.state = command
+        self.commands_sent += 1
+        if self.arduino and self.arduino.is_open:
+            self.awaiting = times
+            self.writer.send(command)
+        else:
+            print(f"Comando (sin Arduino): {command}")
+            self.latency.record(times)
+    
+    def on_written(self, commands):
+        times, self.awaiting = self.awaiting, None
+        if times is not None:
+            times['escritura'] = self.clock()
+            self.latency.record(times)
+    
+    def start(self):
+        if self.serial_port:
+            self.arduino = serial.serial_for_url(self.serial_port, self.baudrate, timeout=1)
+            self.writer.set_port(self.arduino)
+            self.writer.start()
+            print(f"Conectado a {self.serial_port} con {self.baudrate} baud.")
+        self.receiver.start()
+    
+    def stop(self):
+        self.receiver.stop()
+        self.writer.stop()
+        if self.arduino:
+            self.arduino.close()
+    
+    def format_stats(self):
+        value = "-" if self.value is None else f"{self.value:.1f}"
+        text = (f"Potencia: {value} | Comandos: {self.commands_sent} | "
+                f"Descartados por latencia: {self.stale_decisions} | {self.latency.format_stats()}")
+        if self.arduino:
+            text = f"{text} | {self.writer.format_stats()}"
+        return text
+    
+    def format_report(self):
+        # Percentiles por etapa (ms) al terminar
+        lines = ["Etapa            p50      p95      p99 (ms)"]
+        for stage, values in self.latency.percentiles().items():
+            lines.append(f"{stage:<14} {values['p50']:7.2f}  {values['p95']:7.2f}  {values['p99']:7.2f}")
+        return "\n".join(lines)
+
+def main():
+    parser = create_parser("Puente EEG - Arduino", srate=False, network=True, chunk_size=256, dsp=True, gui=False)
+    parser.add_argument('--source', choices=('lsl', 'socket'), default='lsl', help='Origen del EEG')
+    parser.add_argument('--band', choices=list(BANDS), default='alpha', help='Banda usada para decidir')
+    parser.add_argument('--feature-channels', nargs='+', default=None, metavar='NAME',
+                        help='Canales promediados (por defecto, todos)')
+    parser.add_argument('--threshold', type=float, default=20.0, help='Umbral de potencia (µV²)')
+    parser.add_argument('--hysteresis', type=float, default=0.2, help='Histéresis relativa bajo el umbral')
+    parser.add_argument('--on-command', default='ON', help='Comando al superar el umbral')
+    parser.add_argument('--off-command', default='OFF', help='Comando al bajar del umbral')
+    parser.add_argument('--serial', default=None, metavar='PORT',
+                        help='Puerto serie o URL de pyserial (p. ej. COM3, /dev/ttyACM0, loop://)')
+    parser.add_argument('--baudrate', type=int, default=9600, help='Baudrate del puerto serie')
+    parser.add_argument('--budget-ms', type=float, default=100.0,
+                        help='Latencia máxima desde la muestra hasta la decisión (ms)')
+    parser.add_argument('--segment', type=float, default=0.5,
+                        help='Segmento de la estimación de potencia (s); más corto = menos latencia')
+    args = parser.parse_args()
+    
+    # Ambos simuladores fechan las muestras con pylsl.local_clock; el inlet LSL entrega cada bloque
+    # en cuanto llega su primera muestra, sin esperar al timeout de lectura
+    if args.source == 'lsl':
+        receiver = EEGReceiver(args.channels, max_chunk_len=args.chunk_size, dsp_options=dsp_options(args))
+    else:
+        receiver = SocketEEGReceiver(args.channels, args.host, args.port, max_chunk_len=args.chunk_size,
+                                     dsp_options=dsp_options(args))
+    receiver.band_power_options = {'segment_seconds': args.segment}
+    
+    names = channel_names(args.channels)
+    channels = [names.index(name) for name in args.feature_channels] if args.feature_channels else None
+    bridge = EEGArduinoBridge(receiver, local_clock, args.band, channels, args.threshold, args.hysteresis,
+                              args.on_command, args.off_command, args.serial, args.baudrate,
+                              args.budget_ms / 1000)
+    run_headless(bridge, args.duration)
+    print(bridge.format_report())
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,305 @@
-import numpy as np
-from pylsl import StreamInlet, resolve_stream
-import time
+from pylsl import StreamInlet, local_clock
+try:
+    from pylsl import LostError
+except ImportError:
+    from pylsl.util import LostError  # pylsl >= 1.17
 import threading
-import tkinter as tk
-from tkinter import ttk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from collections import deque
+import os
+import sys
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.band_power import BandPowerPublisher
+from common.cli import create_parser, dsp_options, run_headless
+from common.dsp import create_pipeline
+from common.eeg_generator import channel_names
+from common.lsl_chunks import ChunkedInlet
+from common.reconnect import Backoff, mark_gap
+from common.recorder import StreamRecorder
+from common.stream_discovery import ConnectionTimer, StreamDiscovery, stream_channel_names
+from common.stream_stats import StreamStats
+from common.ring_buffer import RingBuffer
 
 class EEGReceiver:
-    def __init__(self):
-        # Parámetros de visualización
-        self.n_channels = 8  # Número de canales esperados
-        self.buffer_size = 500  # Tamaño del buffer para visualización
+    def __init__(self, n_channels=8, max_chunk_len=1024, pull_timeout=0.05, buffer_size=500, dsp_options=None,
+                 band_power_lsl=False, band_power_port=None, stream_name='SimulatedEEG', discovery=None,
+                 stall_timeout=2.0):
+        # Parámetros de recepción
+        self.n_channels = n_channels  # Número de canales esperados
+        self.channel_names = channel_names(n_channels)  # Etiquetas del stream al conectar
+        self.buffer_size = buffer_size  # Tamaño del buffer para visualización
+        self.max_chunk_len = max_chunk_len  # Máximo de muestras por pull_chunk
+        self.pull_timeout = pull_timeout  # Timeout de cada pull_chunk (s)
+        self.chunk_reader = None
         self.running = False
+        self.srate = None  # Frecuencia nominal del stream (se conoce al conectar)
+        self.recorder = None
+        self.record_path = None
+        self.dsp_options = dsp_options or {}  # Argumentos de create_pipeline
+        self.pipeline = None
+        self.band_power_lsl = band_power_lsl  # Publicar potencias por banda por LSL
+        self.band_power_port = band_power_port  # ... y/o por este puerto TCP
+        self.band_power = None
+        self.band_power_options = {}  # Opciones de BandPowerEngine (p. ej. segment_seconds)
+        self.on_features = None  # Callback (potencias, timestamp, llegada) desde el hilo de recepción
+        self.on_chunk = None  # Callback (bloque en bruto, timestamps, llegada) desde el hilo de recepción
+        self.on_status = print  # Callback de estado (la GUI lo redirige a su bus)
+        self.stream_stats = StreamStats()  # Pérdidas, desorden, jitter y tasa efectiva
+        self.first_timestamp = None  # Timestamp de la muestra 0 del stream
+        self.stream_name = stream_name  # Nombre del stream LSL buscado
+        self.discovery = discovery or StreamDiscovery()  # Caché de streams, se conserva entre conexiones
+        self.connection_timer = ConnectionTimer(local_clock)  # Tiempo hasta encontrar el stream y la primera muestra
+        self.stall_timeout = stall_timeout  # Segundos sin datos para considerar cortado un stream regular
+        
+        # Buffer circular preasignado (buffer_size, n_channels)
+        self.data_buffer = RingBuffer(self.buffer_size, self.n_channels)
+    
+    def receive_data(self):
+        # Buscar el stream EEG en la caché o en la red, con timeouts cortos para que stop() la cancele
+        self.connection_timer.start()
+        self.discovery.start()
+        print(f"Buscando stream LSL '{self.stream_name}'...")
+        info = self.discovery.wait_for(name=self.stream_name, cancel=lambda: not self.running)
+        
+        if info is None:
+            print("No se encontró el stream LSL")
+            self.on_status("Estado: Stream no encontrado")
+            return
+        self.connection_timer.mark('resolved')
+        
+        # Crear inlet y lector por bloques con array de destino preasignado
+        self.open_inlet(info)
+        print(f"Stream LSL encontrado: {info.name()} ({info.hostname()})")
+        if not self.accept_channels(self.chunk_reader.inlet.info()):
+            self.running = False
+            return
+        self.on_status(f"Estado: Conectado a {info.name()}")
+        
+        self.connection_timer.mark('opened')
+        self.stream_stats.reset(self.srate)
+        self.first_timestamp = None
+        self.setup_pipeline()
+        self.setup_band_power()
+        
+        # Abrir la grabación pendiente ahora que se conocen los metadatos
+        if self.record_path is not None and self.recorder is None:
+            self.open_recorder()
+        
+        # Recibir datos; los cortes no detienen la recepción ni vacían el buffer
+        backoff = Backoff()
+        last_data = local_clock()
+        stalled = False
+        while self.running:
+            try:
+                # Recibir un bloque completo de muestras
+                chunk, timestamps = self.chunk_reader.pull()
+                
+                if len(chunk):
+                    received = local_clock()  # Instante de llegada (mismo reloj que los timestamps)
+                    last_data = received
+                    if 'first_sample' not in self.connection_timer.marks:
+                        self.connection_timer.mark('first_sample')
+                        print(self.connection_timer.format_stats())
+                    if stalled:
+                        # Datos de nuevo tras un corte (liblsl recuperó el inlet o el emisor se reanudó)
+                        stalled = False
+                        backoff.reset()
+                        self.resume(info)
+                    if self.on_chunk is not None:
+                        self.on_chunk(chunk, timestamps, received)
+                    self.stream_stats.update(self.sequence(timestamps), len(chunk), received, timestamps[-1])
+                    
+                    # Encolar los datos sin procesar para el hilo escritor (no bloquea la recepción)
+                    recorder = self.recorder
+                    if recorder is not None:
+                        recorder.write(chunk, timestamps)
+                    
+                    # Filtrar, re-referenciar y diezmar antes de visualizar
+                    if self.pipeline is not None:
+                        chunk, timestamps = self.pipeline.process(chunk, timestamps)
+                    
+                    # Actualizar buffer en una sola operación (canales extra se ignoran)
+                    self.data_buffer.extend(chunk, timestamps)
+                    
+                    # Potencias por banda incrementales sobre los datos procesados
+                    band_power = self.band_power
+                    if band_power is not None:
+                        features = band_power.push(chunk, timestamps)
+                        if features is not None and self.on_features is not None:
+                            self.on_features(*features, received)
+                
+                elif not stalled and self.srate and local_clock() - last_data > self.stall_timeout:
+                    # Stream regular sin datos: emisor detenido o caído (liblsl sigue intentando recuperarlo)
+                    stalled = True
+                    print(f"Sin datos de {info.name()} durante {self.stall_timeout:g} s")
+                    self.on_status(f"Estado: Sin datos de {info.name()}, esperando...")
+            
+            except LostError:
+                # El inlet no se puede recuperar (emisor sin source_id): buscar el stream de nuevo
+                print(f"Stream LSL perdido: {info.name()}")
+                self.on_status("Estado: Stream perdido, reconectando...")
+                info = self.reconnect(info, backoff)
+                if info is None:
+                    break
+                stalled = True
+            
+            except Exception as e:
+                print(f"Error al recibir datos: {e}")
+                break
         
-        # Crear buffer circular para cada canal
-        self.data_buffer = [deque(maxlen=self.buffer_size) for _ in range(self.n_channels)]
+        print("Recepción de datos detenida")
+    
+    def open_inlet(self, info):
+        # recover=True: si el emisor reaparece con el mismo source_id, liblsl reconecta el inlet sola
+        inlet = StreamInlet(info, recover=True)
+        self.chunk_reader = ChunkedInlet(inlet, self.max_chunk_len, self.pull_timeout)
+        self.srate = inlet.info().nominal_srate()
+    
+    def accept_channels(self, info):
+        # Grabación y potencias se etiquetan con los canales del stream; el buffer de visualización
+        # se dimensionó con --channels, así que un stream con otro número de canales se rechaza
+        names = stream_channel_names(info)
+        if len(names) != self.n_channels:
+            print(f"El stream {info.name()} tiene {len(names)} canales y se esperaban {self.n_channels} "
+                  f"(use --channels {len(names)})")
+            self.on_status(f"Estado: {info.name()} tiene {len(names)} canales, se esperaban {self.n_channels}")
+            return False
+        self.channel_names = names
+        return True
+    
+    def reconnect(self, lost, backoff):
+        # Buscar el stream perdido (mismo source_id si lo tiene) con espera exponencial entre intentos,
+        # descartando su entrada caducada en la caché; devuelve el StreamInfo con el inlet ya abierto
+        source_id = lost.source_id() or None
+        exclude = {lost.uid()}
+        while backoff.sleep(cancel=lambda: not self.running):
+            info = self.discovery.resolve(name=self.stream_name, source_id=source_id, exclude=exclude)
+            if info is None:
+                continue
+            try:
+                self.open_inlet(info)
+            except LostError:
+                exclude.add(info.uid())
+                continue
+            if not self.accept_channels(self.chunk_reader.inlet.info()):
+                exclude.add(info.uid())
+                continue
+            print(f"Stream LSL reencontrado: {info.name()} ({info.hostname()})")
+            return info
+        return None
+    
+    def resume(self, info):
+        # Marcar el hueco en el buffer (se conserva lo anterior) y empezar de nuevo la secuencia,
+        # que el emisor puede haber reiniciado; el procesado no filtra a través del corte
+        mark_gap(self.data_buffer)
+        self.stream_stats.restart()
+        self.first_timestamp = None
+        self.setup_pipeline()
+        print(f"Datos de {info.name()} reanudados (corte {self.stream_stats.gaps})")
+        self.on_status(f"Estado: Conectado a {info.name()}")
+    
+    def sequence(self, timestamps):
+        # El simulador fecha la muestra k en t0 + k / srate: la secuencia viaja en el timestamp
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamps[0]
+        if not self.srate:
+            return self.stream_stats.next_seq or 0  # Muestreo irregular: sin detección de pérdidas
+        return int(round((timestamps[0] - self.first_timestamp) * self.srate))
+    
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.receive_thread = threading.Thread(target=self.receive_data)
+            self.receive_thread.daemon = True
+            self.receive_thread.start()
+    
+    def stop(self):
+        self.running = False
+        self.srate = None
+        self.stop_recording()
+        self.close_band_power()
+    
+    def setup_pipeline(self):
+        # Cadena de procesado según la frecuencia del stream (sin etapas: datos en bruto)
+        try:
+            self.pipeline = create_pipeline(self.srate, **self.dsp_options)
+        except (ImportError, ValueError) as e:
+            self.pipeline = None
+            print(f"Procesado desactivado: {e}")
+    
+    def setup_band_power(self):
+        # Publicador de potencias por banda a la frecuencia de salida del procesado
+        if not (self.band_power_lsl or self.band_power_port or self.on_features):
+            return
+        srate = self.pipeline.srate if self.pipeline is not None else self.srate
+        if not srate:
+            print("Potencias por banda desactivadas: frecuencia de muestreo desconocida")
+            return
+        self.band_power = BandPowerPublisher(srate, self.channel_names,
+                                             lsl=self.band_power_lsl, port=self.band_power_port,
+                                             **self.band_power_options)
+    
+    def close_band_power(self):
+        band_power, self.band_power = self.band_power, None
+        if band_power is not None:
+            band_power.close()
+    
+    def start_recording(self, path):
+        # Si aún no hay stream, la grabación se abre al conectar
+        self.record_path = path
+        if self.srate is not None:
+            self.open_recorder()
+    
+    def open_recorder(self):
+        self.recorder = StreamRecorder(self.record_path, self.channel_names, self.srate)
+        print(f"Grabando en {self.record_path}")
+    
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        self.record_path = None
+        if recorder is not None:
+            recorder.close()
+            print(f"Grabación cerrada: {recorder.path} ({recorder.n_samples} muestras)")
+    
+    def metrics(self):
+        # Métricas para el endpoint HTTP del modo sin GUI
+        return {
+            'connected': self.chunk_reader is not None and self.running,
+            'srate': self.srate,
+            'stream': self.stream_stats.stats(),
+            'chunks': self.chunk_reader.stats() if self.chunk_reader is not None else None,
+            'pipeline': self.pipeline.stats() if self.pipeline is not None else None,
+            'startup': self.connection_timer.stats(),
+        }
+    
+    def format_stats(self):
+        if self.chunk_reader is None:
+            return "Sin datos"
+        text = f"{self.chunk_reader.format_stats()} | {self.stream_stats.format_stats()}"
+        if self.pipeline is not None:
+            text = f"{text} | {self.pipeline.format_stats()}"
+        if self.band_power is not None:
+            text = f"{text} | {self.band_power.format_stats()}"
+        if self.recorder is not None:
+            text = f"{text} | {self.recorder.format_stats()}"
+        return text
+
+class EEGReceiverGUI:
+    def __init__(self, receiver, fps=20, duration=None):
+        self.receiver = receiver
+        self.n_plot_channels = min(receiver.n_channels, 8)  # Canales visualizados
+        self.fps = fps  # Fotogramas por segundo del gráfico
+        self.duration = duration  # Cierre automático (s), opcional
         
         # Configurar GUI
         self.setup_gui()
-        
+    
     def setup_gui(self):
+        # Tk solo se importa cuando se usa la interfaz gráfica
+        import tkinter as tk
+        from tkinter import ttk
+        from common.gui_bus import GuiBus
+        
         self.root = tk.Tk()
         self.root.title("Receptor EEG - LSL")
         self.root.geometry("800x600")
@@ -34,93 +312,99 @@ class EEGReceiver:
         self.toggle_button = ttk.Button(control_frame, text="Conectar", command=self.toggle_receiving)
         self.toggle_button.pack(side=tk.LEFT, padx=5)
         
+        # Botón de grabación a disco
+        record_text = "Grabar" if self.receiver.record_path is None else "Detener grabación"
+        self.record_button = ttk.Button(control_frame, text=record_text, command=self.toggle_recording)
+        self.record_button.pack(side=tk.LEFT, padx=5)
+        
         # Estado del stream
         self.status_label = ttk.Label(control_frame, text="Estado: Desconectado")
         self.status_label.pack(side=tk.LEFT, padx=5)
         
+        # Throughput de recepción y tiempo de render por fotograma
+        self.render_label = ttk.Label(control_frame, text="Render: -")
+        self.render_label.pack(side=tk.LEFT, padx=5)
+        
         # Configurar gráfico
         self.setup_plot()
         
-    def setup_plot(self):
-        self.fig, self.axes = plt.subplots(self.n_channels, 1, figsize=(10, 8), sharex=True)
-        self.fig.tight_layout(pad=3.0)
-        
-        # Crear canvas
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        # Configurar subplots
-        channel_names = ['Fp1', 'Fp2', 'C3', 'C4', 'O1', 'O2', 'F7', 'F8']
-        for ax, name in zip(self.axes, channel_names):
-            ax.set_ylabel(name)
-            ax.grid(True)
-        
-        self.axes[-1].set_xlabel('Muestras')
-        
-    def update_plot(self):
-        for i, ax in enumerate(self.axes):
-            ax.clear()
-            ax.plot(list(self.data_buffer[i]))
-            ax.set_ylabel(f'Canal {i+1}')
-            ax.grid(True)
-        
-        self.axes[-1].set_xlabel('Muestras')
-        self.canvas.draw()
-        
-    def receive_data(self):
-        # Buscar stream EEG
-        print("Buscando stream LSL 'SimulatedEEG'...")
-        streams = resolve_stream('name', 'SimulatedEEG')
-        
-        if not streams:
-            print("No se encontró el stream LSL")
-            self.status_label.config(text="Estado: Stream no encontrado")
-            return
-            
-        # Crear inlet
-        inlet = StreamInlet(streams[0])
-        print(f"Stream LSL encontrado: {streams[0].name()}")
-        self.status_label.config(text=f"Estado: Conectado a {streams[0].name()}")
-        
-        # Recibir datos
-        while self.running:
-            try:
-                # Recibir muestra
-                sample, timestamp = inlet.pull_sample(timeout=1.0)
-                
-                if sample:
-                    # Actualizar buffer para visualización
-                    for i, value in enumerate(sample):
-                        if i < self.n_channels:  # Asegurarse de no exceder el número de canales
-                            self.data_buffer[i].append(value)
-                    
-                    # Actualizar gráfico cada 10 muestras
-                    if len(self.data_buffer[0]) % 10 == 0:
-                        self.update_plot()
-                
-            except Exception as e:
-                print(f"Error al recibir datos: {e}")
-                break
+        # Bus de mensajes: el hilo de recepción nunca toca los widgets
+        self.bus = GuiBus(self.root)
+        self.bus.subscribe('status', self.set_status, coalesce=True)
+        self.bus.start()
+        self.receiver.on_status = lambda text: self.bus.post('status', text)
         
-        print("Recepción de datos detenida")
+        # Actualizar tiempo de render periódicamente
+        self.update_render_label()
+    
+    def set_status(self, text):
+        self.status_label.config(text=text)
+    
+    def update_render_label(self):
+        text = self.plot.format_stats()
+        if self.receiver.chunk_reader is not None:
+            text = f"{self.receiver.format_stats()} | {text}"
+        self.render_label.config(text=text)
+        self.root.after(1000, self.update_render_label)
+    
+    def setup_plot(self):
+        # Matplotlib solo se importa cuando se usa la interfaz gráfica
+        from common.plot_engine import EEGPlotEngine
         
+        # Motor de gráficos con blitting, refrescado por un temporizador de Tk
+        names = channel_names(self.n_plot_channels)
+        self.plot = EEGPlotEngine(self.root, self.receiver.data_buffer, names, fps=self.fps)
+    
     def toggle_receiving(self):
-        if not self.running:
-            self.running = True
+        if not self.receiver.running:
+            self.receiver.start()
             self.toggle_button.config(text="Desconectar")
             self.status_label.config(text="Estado: Conectando...")
-            self.receive_thread = threading.Thread(target=self.receive_data)
-            self.receive_thread.daemon = True
-            self.receive_thread.start()
+            self.plot.start()
         else:
-            self.running = False
+            self.receiver.stop()
+            self.plot.stop()
             self.toggle_button.config(text="Conectar")
+            self.record_button.config(text="Grabar")
             self.status_label.config(text="Estado: Desconectado")
     
+    def toggle_recording(self):
+        from tkinter import filedialog
+        
+        if self.receiver.record_path is None:
+            path = filedialog.asksaveasfilename(defaultextension=".eegrec",
+                                                filetypes=[("Grabación EEG", "*.eegrec")])
+            if path:
+                self.receiver.start_recording(path)
+                self.record_button.config(text="Detener grabación")
+        else:
+            self.receiver.stop_recording()
+            self.record_button.config(text="Grabar")
+    
+    def on_closing(self):
+        self.receiver.stop()
+        self.root.destroy()
+    
     def run(self):
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        if self.duration:
+            self.root.after(int(self.duration * 1000), self.on_closing)
         self.root.mainloop()
 
+def main():
+    parser = create_parser("Receptor EEG - LSL", srate=False, chunk_size=1024, record=True, dsp=True, metrics=True)
+    parser.add_argument('--stream', default='SimulatedEEG', help='Nombre del stream LSL a recibir')
+    args = parser.parse_args()
+    
+    receiver = EEGReceiver(args.channels, max_chunk_len=args.chunk_size, dsp_options=dsp_options(args),
+                           band_power_lsl=args.band_power, band_power_port=args.band_power_port,
+                           stream_name=args.stream)
+    if args.record:
+        receiver.start_recording(args.record)
+    if args.headless:
+        run_headless(receiver, args.duration, metrics_port=args.metrics_port)
+    else:
+        EEGReceiverGUI(receiver, fps=args.fps, duration=args.duration).run()
+
 if __name__ == "__main__":
-    app = EEGReceiver()
-    app.run() 
\ No newline at end of file
+    main()
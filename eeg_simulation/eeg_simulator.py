@@ -1,45 +1,64 @@
-import numpy as np
-from pylsl import StreamInfo, StreamOutlet
-import time
+import os
+import sys
+from pylsl import StreamInfo, StreamOutlet, local_clock
 import threading
-import tkinter as tk
-from tkinter import ttk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from collections import deque
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cli import create_parser, run_headless
+from common.eeg_generator import EEGChunkGenerator, channel_names
+from common.ring_buffer import RingBuffer
+from common.replay import RecordingReplay
+from common.scheduler import create_scheduler
+from common.signal_model import create_generator
 
 class EEGSimulator:
-    def __init__(self):
+    def __init__(self, n_channels=8, srate=100, chunk_size=10, buffer_size=500,
+                 replay=None, speed=1.0, original_timestamps=False, generator=None):
+        # Una grabación reproducida impone sus canales y su frecuencia
+        self.replay = replay  # RecordingReplay opcional en lugar de la señal simulada
+        if replay is not None:
+            n_channels, srate = replay.n_channels, replay.srate
+        
         # Parámetros de la señal EEG
-        self.srate = 100  # Frecuencia de muestreo (Hz)
-        self.n_channels = 8  # Número de canales
-        self.buffer_size = 500  # Tamaño del buffer para visualización
+        self.srate = srate  # Frecuencia de muestreo (Hz)
+        self.n_channels = n_channels  # Número de canales
+        self.chunk_size = chunk_size  # Muestras generadas por bloque
+        self.buffer_size = buffer_size  # Tamaño del buffer para visualización
+        self.speed = speed  # Multiplicador de velocidad (0 = lo más rápido posible)
+        self.original_timestamps = original_timestamps  # Timestamps grabados en lugar de rebasados
         self.running = False
+        self.channel_names = replay.channel_names if replay is not None else channel_names(self.n_channels)
         
-        # Crear buffer circular para cada canal
-        self.data_buffer = [deque(maxlen=self.buffer_size) for _ in range(self.n_channels)]
+        # Generador vectorizado de bloques EEG (p. ej. un SignalModel cargado de un escenario)
+        self.generator = generator or EEGChunkGenerator(self.n_channels, self.srate, self.chunk_size)
         
-        # Configurar LSL Stream
-        self.setup_lsl()
+        # Planificador con deadlines absolutos para mantener la frecuencia
+        self.scheduler = create_scheduler(self.srate, self.chunk_size, self.speed, clock=local_clock)
+        self.skipped_samples = 0  # Saltos del planificador ya aplicados al generador
         
-        # Configurar GUI
-        self.setup_gui()
+        # Buffer circular preasignado (buffer_size, n_channels)
+        self.data_buffer = RingBuffer(self.buffer_size, self.n_channels)
         
+        # Configurar LSL Stream
+        self.setup_lsl()
+    
     def setup_lsl(self):
-        # Crear info del stream LSL
+        # Crear info del stream LSL con la frecuencia a la que se fechan las muestras: a speed != 1
+        # el reloj de muestras avanza a srate·speed y los receptores deducen la secuencia de él
+        nominal_srate = self.srate if self.original_timestamps else self.scheduler.srate
         self.info = StreamInfo(
             name='SimulatedEEG',
             type='EEG',
             channel_count=self.n_channels,
-            nominal_srate=self.srate,
+            nominal_srate=nominal_srate,
             channel_format='float32',
             source_id='SimEEG001'
         )
         
         # Añadir metadatos de los canales
         channels = self.info.desc().append_child("channels")
-        channel_names = ['Fp1', 'Fp2', 'C3', 'C4', 'O1', 'O2', 'F7', 'F8']
-        for c in channel_names:
+        for c in self.channel_names:
             channels.append_child("channel")\
                    .append_child_value("label", c)\
                    .append_child_value("type", "EEG")\
@@ -47,38 +66,88 @@ class EEGSimulator:
         
         # Crear outlet
         self.outlet = StreamOutlet(self.info)
-        
+    
     def generate_eeg_sample(self):
-        # Generar componente de onda alfa (8-13 Hz)
-        t = time.time()
-        alpha = np.sin(2 * np.pi * 10 * t) * 10  # 10 Hz onda alfa
-        
-        # Generar ruido para cada canal
-        noise = np.random.normal(0, 2, self.n_channels)
-        
-        # Combinar señal y ruido
-        sample = noise + alpha
-        return sample
-        
+        # Generar una única muestra (onda alfa de 10 Hz + ruido)
+        return self.generator.next_chunk(1)[0]
+    
+    def generate_eeg_chunk(self, n_samples=None):
+        # Generar un bloque (n_samples, n_channels) de muestras
+        return self.generator.next_chunk(n_samples)
+    
+    def next_block(self, n_samples):
+        # Bloque simulado o reproducido, con timestamps grabados si se piden
+        if self.replay is None:
+            return self.generate_eeg_chunk(n_samples), None
+        chunk, timestamps = self.replay.next_chunk(n_samples)
+        return chunk, (timestamps if self.original_timestamps else None)
+    
+    def skip_lost_samples(self):
+        # Muestras saltadas por el planificador al ir con retraso: la señal simulada y la reproducción
+        # las saltan también, para que su posición coincida con los timestamps
+        skipped = self.scheduler.skipped_samples - self.skipped_samples
+        if skipped:
+            self.skipped_samples += skipped
+            if self.replay is None:
+                self.generator.skip(skipped)
+            else:
+                self.replay.skip(skipped)
+    
     def stream_data(self):
+        self.scheduler.start()
+        self.skipped_samples = 0
         while self.running:
-            sample = self.generate_eeg_sample()
+            # Esperar al siguiente deadline (puede pedir varios bloques si vamos tarde)
+            n_samples, _ = self.scheduler.wait()
+            self.skip_lost_samples()
+            chunk, original = self.next_block(n_samples)
+            if not len(chunk):
+                self.running = False  # Fin de la reproducción
+                break
+            if len(chunk) < n_samples:
+                # Bloque corto (fin de la grabación o vuelta del bucle): se devuelve lo no emitido
+                self.scheduler.give_back(n_samples - len(chunk))
             
-            # Enviar muestra a través de LSL
-            self.outlet.push_sample(sample)
+            # Un timestamp explícito por muestra: reloj de muestras (retrofechado si vamos tarde)
+            # o los timestamps grabados en la reproducción
+            timestamps = self.scheduler.timestamps(len(chunk)) if original is None else original
+            self.outlet.push_chunk(chunk, timestamps.tolist())
             
             # Actualizar buffer para visualización
-            for i, value in enumerate(sample):
-                self.data_buffer[i].append(value)
-            
-            # Actualizar gráfico cada 10 muestras
-            if len(self.data_buffer[0]) % 10 == 0:
-                self.update_plot()
-            
-            # Esperar para mantener la frecuencia de muestreo
-            time.sleep(1.0/self.srate)
+            self.data_buffer.extend(chunk, timestamps)
+    
+    def start(self):
+        if not self.running:
+            if self.replay is not None and self.replay.finished:
+                self.replay.rewind()
+            self.running = True
+            self.stream_thread = threading.Thread(target=self.stream_data)
+            self.stream_thread.daemon = True
+            self.stream_thread.start()
+    
+    def stop(self):
+        self.running = False
+    
+    def format_stats(self):
+        if self.replay is not None:
+            return f"{self.scheduler.format_stats()} | {self.replay.format_stats()}"
+        return self.scheduler.format_stats()
+
+class EEGSimulatorGUI:
+    def __init__(self, simulator, fps=20, duration=None):
+        self.simulator = simulator
+        self.n_plot_channels = min(simulator.n_channels, 8)  # Canales visualizados
+        self.fps = fps  # Fotogramas por segundo del gráfico
+        self.duration = duration  # Cierre automático (s), opcional
+        
+        # Configurar GUI
+        self.setup_gui()
     
     def setup_gui(self):
+        # Tk solo se importa cuando se usa la interfaz gráfica
+        import tkinter as tk
+        from tkinter import ttk
+        
         self.root = tk.Tk()
         self.root.title("Simulador EEG - LSL")
         self.root.geometry("800x600")
@@ -95,52 +164,70 @@ class EEGSimulator:
         self.status_label = ttk.Label(control_frame, text="Estado: Detenido")
         self.status_label.pack(side=tk.LEFT, padx=5)
         
+        # Tasa efectiva, jitter del planificador y tiempo de render
+        self.rate_label = ttk.Label(control_frame, text="Tasa: -")
+        self.rate_label.pack(side=tk.LEFT, padx=5)
+        
         # Configurar gráfico
         self.setup_plot()
         
+        # Actualizar tasa efectiva periódicamente
+        self.update_rate_label()
+    
+    def update_rate_label(self):
+        if self.simulator.running:
+            self.rate_label.config(text=f"{self.simulator.format_stats()} | {self.plot.format_stats()}")
+        elif self.plot.running:
+            # La reproducción terminó sola: dejar la interfaz como detenida
+            self.plot.stop()
+            self.toggle_button.config(text="Iniciar")
+            self.status_label.config(text="Estado: Reproducción terminada")
+        self.root.after(1000, self.update_rate_label)
+    
     def setup_plot(self):
-        self.fig, self.axes = plt.subplots(self.n_channels, 1, figsize=(10, 8), sharex=True)
-        self.fig.tight_layout(pad=3.0)
-        
-        # Crear canvas
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        # Configurar subplots
-        channel_names = ['Fp1', 'Fp2', 'C3', 'C4', 'O1', 'O2', 'F7', 'F8']
-        for ax, name in zip(self.axes, channel_names):
-            ax.set_ylabel(name)
-            ax.grid(True)
-        
-        self.axes[-1].set_xlabel('Muestras')
-        
-    def update_plot(self):
-        for i, ax in enumerate(self.axes):
-            ax.clear()
-            ax.plot(list(self.data_buffer[i]))
-            ax.set_ylabel(f'Canal {i+1}')
-            ax.grid(True)
-        
-        self.axes[-1].set_xlabel('Muestras')
-        self.canvas.draw()
+        # Matplotlib solo se importa cuando se usa la interfaz gráfica
+        from common.plot_engine import EEGPlotEngine
         
+        # Motor de gráficos con blitting, refrescado por un temporizador de Tk
+        names = self.simulator.channel_names[:self.n_plot_channels]
+        self.plot = EEGPlotEngine(self.root, self.simulator.data_buffer, names, fps=self.fps)
+    
     def toggle_streaming(self):
-        if not self.running:
-            self.running = True
+        if not self.simulator.running:
+            self.simulator.start()
             self.toggle_button.config(text="Detener")
             self.status_label.config(text="Estado: Transmitiendo")
-            self.stream_thread = threading.Thread(target=self.stream_data)
-            self.stream_thread.daemon = True
-            self.stream_thread.start()
+            self.plot.start()
         else:
-            self.running = False
+            self.simulator.stop()
+            self.plot.stop()
             self.toggle_button.config(text="Iniciar")
             self.status_label.config(text="Estado: Detenido")
     
+    def on_closing(self):
+        self.simulator.stop()
+        self.root.destroy()
+    
     def run(self):
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        if self.duration:
+            self.root.after(int(self.duration * 1000), self.on_closing)
         self.root.mainloop()
 
+def main():
+    parser = create_parser("Simulador EEG - LSL", replay=True, scenario=True)
+    args = parser.parse_args()
+    
+    replay = RecordingReplay(args.replay, loop=args.loop) if args.replay else None
+    generator = create_generator(args.channels, args.srate, args.chunk_size, args.scenario, args.seed)
+    simulator = EEGSimulator(args.channels, args.srate, args.chunk_size, replay=replay,
+                             speed=args.speed, original_timestamps=args.original_timestamps,
+                             generator=generator)
+    if args.headless:
+        print(f"Transmitiendo 'SimulatedEEG': {simulator.n_channels} canales a {simulator.srate:g} Hz")
+        run_headless(simulator, args.duration)
+    else:
+        EEGSimulatorGUI(simulator, fps=args.fps, duration=args.duration).run()
+
 if __name__ == "__main__":
-    app = EEGSimulator()
-    app.run() 
\ No newline at end of file
+    main()
@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pylsl import StreamInfo, StreamOutlet, local_clock
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cli import create_parser, run_headless
+from common.eeg_generator import channel_names
+from common.scheduler import DeadlineScheduler
+from common.signal_model import create_generator
+
+# Formatos numéricos de LSL admitidos; 'string' solo para streams de marcadores
+SAMPLE_FORMATS = ('float32', 'double64', 'int32', 'int16')
+
+def is_marker_spec(spec):
+    return spec.get('format') == 'string' or spec.get('type') == 'Markers'
+
+class SimulatedStream:
+    def __init__(self, spec, base_dir='.'):
+        # Un outlet LSL con su propio generador y su propio reloj de muestras
+        self.name = spec['name']
+        self.type = spec.get('type', 'EEG')
+        self.n_channels = spec.get('channels', 8)
+        self.srate = spec.get('srate', 100)
+        self.chunk_size = spec.get('chunk_size', 1)  # Mínimo de muestras por envío
+        self.format = spec.get('format', 'float32')
+        self.source_id = spec.get('source_id', f"Sim-{self.name}")
+        self.max_backlog = max(int(self.srate), self.chunk_size)  # Retraso máximo recuperado (1 s)
+        if self.format not in SAMPLE_FORMATS:
+            raise ValueError(f"{self.name}: formato desconocido {self.format} "
+                             f"(opciones: {', '.join(SAMPLE_FORMATS)})")
+        
+        scenario = spec.get('scenario')
+        if scenario is not None and not os.path.isabs(scenario):
+            scenario = os.path.join(base_dir, scenario)
+        self.generator = create_generator(self.n_channels, self.srate, self.chunk_size, scenario,
+                                          spec.get('seed'))
+        self.start_time = None
+        self.sample_count = 0
+        self.skipped_samples = 0
+        self.outlet = None
+    
+    def open(self):
+        info = StreamInfo(self.name, self.type, self.n_channels, self.srate, self.format, self.source_id)
+        channels = info.desc().append_child("channels")
+        for c in channel_names(self.n_channels):
+            channels.append_child("channel")\
+                   .append_child_value("label", c)\
+                   .append_child_value("type", self.type)\
+                   .append_child_value("unit", "microvolts")
+        self.outlet = StreamOutlet(info)
+    
+    def reset(self, start_time):
+        self.start_time = start_time
+        self.sample_count = 0
+        self.skipped_samples = 0
+    
+    def step(self, now):
+        # Emitir las muestras vencidas en 'now', en bloques completos
+        due = int((now - self.start_time) * self.srate) - self.sample_count
+        if due > self.max_backlog:
+            # Demasiado retraso: saltar muestras (y la señal con ellas) en lugar de acumularlas
+            skipped = due - self.max_backlog
+            self.generator.skip(skipped)
+            self.sample_count += skipped
+            self.skipped_samples += skipped
+            due = self.max_backlog
+        n_samples = (due // self.chunk_size) * self.chunk_size
+        if n_samples <= 0:
+            return 0
+        
+        chunk = self.generator.next_chunk(n_samples)
+        if self.format.startswith('int'):
+            chunk = np.rint(chunk)  # pylsl convierte el bloque al formato del outlet
+        timestamps = self.start_time + (self.sample_count + np.arange(n_samples)) / self.srate
+        self.outlet.push_chunk(chunk, timestamps.tolist())
+        self.sample_count += n_samples
+        return n_samples
+    
+    def stats(self):
+        return {'sent': self.sample_count - self.skipped_samples, 'skipped': self.skipped_samples}
+
+class MarkerStream:
+    def __init__(self, spec, source=None):
+        # Stream irregular de marcadores de texto: los estímulos del modelo de señal de 'source'
+        # o etiquetas al azar cada interval ± jitter segundos
+        self.name = spec['name']
+        self.type = spec.get('type', 'Markers')
+        self.source = source  # SimulatedStream cuyo SignalModel genera los eventos
+        self.source_id = spec.get('source_id', f"Sim-{self.name}")
+        self.labels = spec.get('labels', ['stimulus'])
+        self.interval = spec.get('interval', 1.0)
+        self.jitter = spec.get('jitter', 0.0)
+        self.rng = np.random.default_rng(spec.get('seed'))
+        self.start_time = None
+        self.next_time = None
+        self.sample_count = 0
+        self.outlet = None
+    
+    def open(self):
+        self.outlet = StreamOutlet(StreamInfo(self.name, self.type, 1, 0, 'string', self.source_id))
+    
+    def reset(self, start_time):
+        self.start_time = start_time
+        self.next_time = self.draw()
+        self.sample_count = 0
+    
+    def draw(self):
+        return self.interval + self.rng.uniform(-self.jitter, self.jitter)
+    
+    def step(self, now):
+        markers = []
+        if self.source is not None:
+            # Eventos del modelo de señal, fechados con el reloj de muestras de su stream
+            pop_markers = getattr(self.source.generator, 'pop_markers', None)
+            if pop_markers is not None:
+                markers = [(self.start_time + index / self.source.srate, label) for index, label in pop_markers()]
+        else:
+            while self.start_time + self.next_time <= now:
+                markers.append((self.start_time + self.next_time, str(self.rng.choice(self.labels))))
+                self.next_time += self.draw()
+        for timestamp, label in markers:
+            self.outlet.push_sample([label], timestamp)
+        self.sample_count += len(markers)
+        return len(markers)
+    
+    def stats(self):
+        return {'sent': self.sample_count, 'skipped': 0}
+
+class StreamGroup:
+    def __init__(self, specs, base_dir='.'):
+        # Conjunto de streams atendido por un mismo trabajador (hilo o proceso); los marcadores
+        # van en el grupo del stream del que salen sus eventos
+        self.streams = []
+        by_name = {}
+        for spec in specs:
+            if is_marker_spec(spec):
+                if spec.get('source') is not None and spec['source'] not in by_name:
+                    raise ValueError(f"{spec['name']}: stream de origen desconocido {spec['source']}")
+                stream = MarkerStream(spec, by_name.get(spec.get('source')))
+            else:
+                stream = SimulatedStream(spec, base_dir)
+            by_name[stream.name] = stream
+            self.streams.append(stream)
+    
+    def open(self):
+        for stream in self.streams:
+            stream.open()
+    
+    def reset(self, start_time):
+        for stream in self.streams:
+            stream.reset(start_time)
+    
+    def step(self, now):
+        # Un tick del planificador común: cada stream emite lo que le toca
+        for stream in self.streams:
+            stream.step(now)
+        return {stream.name: stream.stats() for stream in self.streams}
+
+def run_group_process(specs, base_dir, conn):
+    # Trabajador en otro proceso: crea sus outlets y atiende los ticks que le envía el principal.
+    # local_clock es el reloj del sistema, común a todos los procesos
+    group = StreamGroup(specs, base_dir)
+    group.open()
+    conn.send('ready')
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        command, value = message
+        if command == 'reset':
+            group.reset(value)
+        else:
+            conn.send(group.step(value))
+    conn.close()
+
+class ProcessWorker:
+    def __init__(self, specs, base_dir):
+        # Misma interfaz que StreamGroup, delegando por una tubería en un proceso hijo
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=run_group_process, args=(specs, base_dir, child),
+                                               daemon=True)
+        self.process.start()
+    
+    def open(self):
+        self.conn.recv()  # Esperar a que el hijo tenga sus outlets
+    
+    def reset(self, start_time):
+        self.conn.send(('reset', start_time))
+    
+    def send_step(self, now):
+        self.conn.send(('step', now))
+    
+    def receive_step(self):
+        return self.conn.recv()
+    
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=2)
+
+def partition(specs, n_groups):
+    # Repartir los streams entre los trabajadores por coste (canales × frecuencia);
+    # un stream de marcadores sigue al stream del que toma los eventos
+    groups = [[] for _ in range(n_groups)]
+    loads = [0.0] * n_groups
+    home = {}
+    for spec in sorted(specs, key=lambda s: 'source' in s):
+        if spec.get('source') in home:
+            index = home[spec['source']]
+        else:
+            index = loads.index(min(loads))
+            loads[index] += spec.get('channels', 8) * spec.get('srate', 100)
+        home[spec['name']] = index
+        groups[index].append(spec)
+    return [group for group in groups if group]
+
+class MultiStreamSimulator:
+    def __init__(self, specs, tick=0.01, workers=1, pool='thread', base_dir='.'):
+        if pool not in ('thread', 'process'):
+            raise ValueError(f"Pool desconocido: {pool} (opciones: thread, process)")
+        names = [spec['name'] for spec in specs]
+        if len(set(names)) != len(names):
+            raise ValueError("Los nombres de los streams deben ser distintos")
+        
+        # Varios outlets LSL en un proceso, movidos por un único planificador de ticks
+        self.specs = specs
+        self.tick = tick  # Periodo del planificador (s)
+        self.pool = pool  # 'thread': hilos del mismo proceso; 'process': un proceso por grupo
+        self.running = False
+        self.stream_stats = {}
+        self.stream_thread = None
+        self.scheduler = DeadlineScheduler(1.0 / tick, chunk_size=1, clock=local_clock)
+        
+        groups = partition(specs, max(workers, 1))
+        if pool == 'process':
+            self.groups = [ProcessWorker(group, base_dir) for group in groups]
+        else:
+            self.groups = [StreamGroup(group, base_dir) for group in groups]
+            self.executor = ThreadPoolExecutor(max_workers=len(self.groups))
+        for group in self.groups:
+            group.open()
+    
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        # Configuración JSON {"streams": [...]}; los escenarios se buscan junto al fichero
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config['streams'], base_dir=os.path.dirname(os.path.abspath(path)), **kwargs)
+    
+    def stream_data(self):
+        self.scheduler.start()
+        for group in self.groups:
+            group.reset(self.scheduler.start_time)
+        while self.running:
+            # Instante nominal del tick (los streams vencen según su propia frecuencia)
+            self.scheduler.wait()
+            now = self.scheduler.start_time + self.scheduler.sample_count * self.tick
+            if self.pool == 'process':
+                for group in self.groups:
+                    group.send_step(now)
+                results = [group.receive_step() for group in self.groups]
+            else:
+                results = list(self.executor.map(lambda group: group.step(now), self.groups))
+            for result in results:
+                self.stream_stats.update(result)
+    
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.stream_thread = threading.Thread(target=self.stream_data)
+            self.stream_thread.daemon = True
+            self.stream_thread.start()
+    
+    def stop(self):
+        self.running = False
+    
+    def close(self):
+        self.stop()
+        if self.stream_thread is not None:
+            self.stream_thread.join(timeout=2)
+        if self.pool == 'process':
+            for group in self.groups:
+                group.close()
+        else:
+            self.executor.shutdown()
+    
+    def metrics(self):
+        elapsed = local_clock() - self.scheduler.start_time if self.scheduler.start_time else 0.0
+        return {
+            'scheduler': self.scheduler.stats(),
+            'streams': {name: dict(stats, rate=stats['sent'] / elapsed if elapsed > 0 else 0.0)
+                        for name, stats in dict(self.stream_stats).items()},
+        }
+    
+    def format_stats(self):
+        stats = dict(self.stream_stats)
+        sent = sum(s['sent'] for s in stats.values())
+        skipped = sum(s['skipped'] for s in stats.values())
+        return (f"{self.scheduler.format_stats()} (ticks) | Streams: {len(self.specs)} en {len(self.groups)} "
+                f"{'procesos' if self.pool == 'process' else 'hilos'} | Muestras: {sent} | Saltadas: {skipped}")
+
+def main():
+    parser = create_parser("Simulador EEG - varios streams LSL", gui=False, metrics=True, scenario=True)
+    parser.add_argument('--config', metavar='PATH', default=None,
+                        help='Fichero JSON {"streams": [...]} con nombre, canales, frecuencia y formato de cada stream')
+    parser.add_argument('--streams', type=int, default=4,
+                        help='Sin --config: número de streams EEG iguales (SimulatedEEG-1, -2, ...)')
+    parser.add_argument('--markers', action='store_true',
+                        help="Sin --config: añadir un stream de marcadores 'SimulatedMarkers'")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Trabajadores del pool')
+    parser.add_argument('--pool', choices=('thread', 'process'), default='thread',
+                        help='Generar en hilos del mismo proceso o en procesos separados')
+    parser.add_argument('--tick', type=float, default=0.01, help='Periodo del planificador común (s)')
+    args = parser.parse_args()
+    
+    options = dict(tick=args.tick, workers=args.workers, pool=args.pool)
+    if args.config:
+        simulator = MultiStreamSimulator.from_file(args.config, **options)
+    else:
+        specs = [dict(name=f"SimulatedEEG-{i + 1}", channels=args.channels, srate=args.srate,
+                      chunk_size=args.chunk_size, scenario=args.scenario,
+                      seed=None if args.seed is None else args.seed + i) for i in range(args.streams)]
+        if args.markers:
+            # Con escenario, los marcadores son sus estímulos; sin él, etiquetas al azar cada segundo
+            markers = dict(name='SimulatedMarkers', type='Markers', format='string', seed=args.seed)
+            if args.scenario:
+                markers['source'] = specs[0]['name']
+            specs.append(markers)
+        simulator = MultiStreamSimulator(specs, **options)
+    
+    for spec in simulator.specs:
+        if is_marker_spec(spec):
+            print(f"Transmitiendo '{spec['name']}': marcadores")
+        else:
+            print(f"Transmitiendo '{spec['name']}': {spec.get('channels', 8)} canales a {spec.get('srate', 100):g} Hz "
+                  f"({spec.get('format', 'float32')})")
+    try:
+        run_headless(simulator, args.duration, metrics_port=args.metrics_port)
+    finally:
+        simulator.close()
+
+if __name__ == "__main__":
+    main()
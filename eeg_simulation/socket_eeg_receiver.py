@@ -1,30 +1,367 @@
 import numpy as np
 import socket
-import time
 import threading
-import tkinter as tk
-from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from collections import deque
 import json
+import os
+import sys
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.band_power import BandPowerPublisher
+from common.cli import create_parser, dsp_options, run_headless
+from common.dsp import create_pipeline
+from common.eeg_generator import channel_names
+from common.reconnect import Backoff, mark_gap
+from common.recorder import StreamRecorder
+from common.scheduler import default_clock
+from common.stream_stats import StreamStats
+from common.ring_buffer import RingBuffer
+from common.wire_protocol import HELLO, HELLO_JSON, BinaryFrameReader, peek_header
 
 class SocketEEGReceiver:
-    def __init__(self):
-        # Parámetros de visualización
-        self.n_channels = 8  # Número de canales esperados
-        self.buffer_size = 500  # Tamaño del buffer para visualización
+    def __init__(self, n_channels=8, host='localhost', port=5555, binary=True, max_chunk_len=256, buffer_size=500,
+                 dsp_options=None, band_power_lsl=False, band_power_port=None, reconnect=True):
+        # Parámetros de recepción
+        self.n_channels = n_channels  # Número de canales esperados
+        self.channel_names = channel_names(n_channels)  # Etiquetas anunciadas por el servidor
+        self.buffer_size = buffer_size  # Tamaño del buffer para visualización
+        self.host = host
+        self.port = port
+        self.binary_mode = binary  # Solicitar protocolo binario (con respaldo JSON)
+        self.max_chunk_len = max_chunk_len  # Muestras preasignadas para cada trama binaria
         self.running = False
         self.connected = False
         self.socket = None
+        self.samples_received = 0
+        self.reconnect = reconnect  # Reconectar con espera exponencial si el servidor se cae
+        self.on_connection_lost = None  # Callback (desde el hilo de recepción)
+        self.on_status = print  # Callback de estado (la GUI lo redirige a su bus)
+        self.srate = None  # Frecuencia anunciada por el servidor (0 si se desconoce)
+        self.recorder = None
+        self.record_path = None
+        self.dsp_options = dsp_options or {}  # Argumentos de create_pipeline
+        self.pipeline = None
+        self.band_power_lsl = band_power_lsl  # Publicar potencias por banda por LSL
+        self.band_power_port = band_power_port  # ... y/o por este puerto TCP
+        self.band_power = None
+        self.band_power_options = {}  # Opciones de BandPowerEngine (p. ej. segment_seconds)
+        self.on_features = None  # Callback (potencias, timestamp, llegada) desde el hilo de recepción
+        self.on_chunk = None  # Callback (bloque en bruto, timestamps, llegada) desde el hilo de recepción
+        self.stream_stats = StreamStats()  # Pérdidas, desorden, jitter y tasa efectiva
+        self.clock = default_clock()  # Mismo reloj de muestras que el simulador
+        self.last_frame = None  # (secuencia siguiente, timestamp) de la trama anterior
+        
+        # Buffer circular preasignado (buffer_size, n_channels)
+        self.data_buffer = RingBuffer(self.buffer_size, self.n_channels)
+    
+    def process_chunk(self, chunk, timestamp=None, seq=None):
+        received = self.clock()  # Instante de llegada (mismo reloj que los timestamps del servidor)
+        if seq is None:
+            seq = self.samples_received  # Servidor sin secuencia: no se pueden detectar pérdidas
+        self.stream_stats.update(seq, len(chunk), received, timestamp)
+        self.samples_received += len(chunk)
+        timestamps = self.sample_timestamps(timestamp, len(chunk), seq)
+        if self.on_chunk is not None:
+            self.on_chunk(chunk, timestamps, received)
+        
+        # Encolar los datos sin procesar para el hilo escritor (no bloquea la recepción)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.write(chunk, timestamps)
+        
+        # Filtrar, re-referenciar y diezmar antes de visualizar
+        if self.pipeline is not None:
+            chunk, timestamps = self.pipeline.process(chunk, timestamps)
+        
+        # Actualizar buffer para visualización con un bloque (n_samples, n_channels)
+        self.data_buffer.extend(chunk, timestamps)
+        
+        # Potencias por banda incrementales sobre los datos procesados
+        band_power = self.band_power
+        if band_power is not None:
+            features = band_power.push(chunk, timestamps)
+            if features is not None and self.on_features is not None:
+                self.on_features(*features, received)
+    
+    def sample_timestamps(self, timestamp, n_samples, seq):
+        # La trama solo lleva el timestamp de su última muestra: la muestra k del bloque se fecha
+        # en timestamp - (n - 1 - k) / srate. Sin frecuencia conocida (JSON) se interpola desde la
+        # última muestra de la trama anterior si es contigua; si no, todo el bloque lleva el de la trama
+        previous, self.last_frame = self.last_frame, (seq + n_samples, timestamp)
+        if timestamp is None:
+            return None
+        if self.srate:
+            return timestamp - np.arange(n_samples - 1, -1, -1) / self.srate
+        if previous is not None and previous[0] == seq and previous[1] is not None:
+            return previous[1] + (timestamp - previous[1]) * np.arange(1, n_samples + 1) / n_samples
+        return timestamp
+    
+    def accept_channels(self, names):
+        # Grabación y potencias se etiquetan con los canales del servidor; el buffer de visualización
+        # se dimensionó con --channels, así que un stream con otro número de canales se rechaza
+        if names is None:
+            return True  # Servidor JSON antiguo: sin etiquetas
+        if len(names) != self.n_channels:
+            print(f"El servidor envía {len(names)} canales y se esperaban {self.n_channels} "
+                  f"(use --channels {len(names)})")
+            self.on_status(f"Estado: el servidor envía {len(names)} canales, se esperaban {self.n_channels}")
+            self.running = False
+            return False
+        self.channel_names = list(names)
+        return True
+    
+    def on_stream_info(self, srate):
+        # Al reconectar a un stream con la misma frecuencia se conservan contadores y publicador
+        # de potencias; el procesado empieza de nuevo para no filtrar a través del corte. Una
+        # frecuencia desconocida (0, servidor JSON antiguo) no sustituye a la última conocida
+        self.last_frame = None
+        if not srate and self.srate:
+            srate = self.srate
+        if srate != self.srate:
+            self.srate = srate
+            self.stream_stats.reset(srate)
+            self.setup_pipeline()
+            self.close_band_power()
+            self.setup_band_power()
+        else:
+            self.setup_pipeline()
+        
+        # Abrir la grabación pendiente ahora que se conocen los metadatos
+        if self.record_path is not None and self.recorder is None:
+            self.open_recorder()
+    
+    def receive_data(self):
+        backoff = Backoff()
+        while True:
+            sock = self.socket
+            received = self.samples_received
+            try:
+                # El servidor responde con la cabecera binaria solo si aceptó el saludo
+                if self.binary_mode and peek_header(sock):
+                    self.receive_binary()
+                else:
+                    self.receive_json()
+            except Exception as e:
+                print(f"Error de conexión: {e}")
+            
+            # Corte: reconectar (sin vaciar el buffer) salvo que el usuario haya desconectado.
+            # La espera solo vuelve a la corta si la conexión anterior llegó a traer datos
+            if self.samples_received > received:
+                backoff.reset()
+            if not (self.reconnect and self.running and self.connected) or not self.reopen(backoff):
+                break
+            mark_gap(self.data_buffer)
+            self.stream_stats.restart()
+            self.on_status(f"Estado: Reconectado a {self.host}:{self.port} (corte {self.stream_stats.gaps})")
+        
+        # Avisar del fin de la conexión (la GUI desconecta en el hilo de Tk)
+        if self.on_connection_lost is not None:
+            self.on_connection_lost(sock)
+        elif sock is self.socket:
+            self.disconnect()
+    
+    def receive_binary(self):
+        reader = BinaryFrameReader(self.socket, self.max_chunk_len)
+        meta = reader.read_header()
+        if meta is None:
+            return
+        print(f"Protocolo binario: {meta['n_channels']} canales a {meta['srate']} Hz")
+        if not self.accept_channels(meta['channels']):
+            return
+        self.on_stream_info(meta['srate'])
         
-        # Crear buffer circular para cada canal
-        self.data_buffer = [deque(maxlen=self.buffer_size) for _ in range(self.n_channels)]
+        while self.running and self.connected:
+            # Recibir bloque directamente en el buffer NumPy del lector
+            frame = reader.read_frame()
+            if frame is None:
+                break
+            seq, timestamp, chunk = frame
+            self.process_chunk(chunk, timestamp, seq)
+    
+    def receive_json(self):
+        # El protocolo JSON no tiene cabecera: la frecuencia llega con los mensajes, así que la
+        # grabación y el procesado se preparan con el primero (0 si el servidor no la envía)
+        announced = False
+        buffer = ""
+        while self.running and self.connected:
+            # Recibir datos
+            data = self.socket.recv(4096).decode('utf-8')
+            if not data:
+                break
+            
+            # Añadir al buffer y procesar líneas completas
+            buffer += data
+            lines = buffer.split('\n')
+            
+            # Procesar todas las líneas completas
+            for i in range(len(lines) - 1):
+                try:
+                    # Parsear JSON
+                    json_data = json.loads(lines[i])
+                    if not announced:
+                        announced = True
+                        if not self.accept_channels(json_data.get('channels')):
+                            return
+                        self.on_stream_info(json_data.get('srate') or 0.0)
+                    
+                    # Extraer datos (una muestra o un bloque de muestras)
+                    chunk = np.atleast_2d(np.asarray(json_data['data'], dtype=np.float32))
+                    self.process_chunk(chunk, json_data.get('timestamp'), json_data.get('seq'))
+                except json.JSONDecodeError:
+                    self.stream_stats.count_malformed()
+                    print(f"Error decodificando JSON: {lines[i]}")
+                except Exception as e:
+                    self.stream_stats.count_malformed()
+                    print(f"Error procesando datos: {e}")
+            
+            # Guardar la última línea incompleta
+            buffer = lines[-1]
+    
+    def open_socket(self):
+        # Lanza una excepción si no se puede conectar
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.connect((self.host, self.port))
+            
+            # Solicitar el protocolo binario o JSON por bloques (los servidores antiguos lo ignoran
+            # y envían JSON con una muestra por línea, que también se entiende)
+            sock.sendall(HELLO if self.binary_mode else HELLO_JSON)
+        except OSError:
+            sock.close()
+            raise
+        self.socket = sock
+    
+    def reopen(self, backoff):
+        # Reintentar la conexión con espera exponencial hasta lograrlo o que el usuario desconecte
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+        cancel = lambda: not (self.running and self.connected)
+        while True:
+            self.on_status(f"Estado: Conexión perdida, reintentando en {self.host}:{self.port}...")
+            if not backoff.sleep(cancel=cancel):
+                return False
+            try:
+                self.open_socket()
+            except OSError as e:
+                print(f"Reconexión fallida: {e}")
+                continue
+            if cancel():
+                # disconnect() llegó mientras se conectaba: no dejar el socket abierto
+                self.socket.close()
+                return False
+            print(f"Reconectado a {self.host}:{self.port}")
+            return True
+    
+    def connect(self):
+        self.open_socket()
+        self.connected = True
+        self.running = True
+        
+        # Iniciar thread para recibir datos
+        self.receive_thread = threading.Thread(target=self.receive_data)
+        self.receive_thread.daemon = True
+        self.receive_thread.start()
+    
+    def disconnect(self):
+        self.running = False
+        self.connected = False
+        self.srate = None
+        self.stop_recording()
+        self.close_band_power()
+        
+        if self.socket:
+            try:
+                self.socket.close()
+            except:
+                pass
+    
+    def start(self):
+        self.connect()
+    
+    def stop(self):
+        self.disconnect()
+    
+    def setup_pipeline(self):
+        # Cadena de procesado según la frecuencia del stream (sin etapas: datos en bruto)
+        try:
+            self.pipeline = create_pipeline(self.srate, **self.dsp_options)
+        except (ImportError, ValueError) as e:
+            self.pipeline = None
+            print(f"Procesado desactivado: {e}")
+    
+    def setup_band_power(self):
+        # Publicador de potencias por banda a la frecuencia de salida del procesado
+        if not (self.band_power_lsl or self.band_power_port or self.on_features):
+            return
+        srate = self.pipeline.srate if self.pipeline is not None else self.srate
+        if not srate:
+            print("Potencias por banda desactivadas: frecuencia de muestreo desconocida")
+            return
+        self.band_power = BandPowerPublisher(srate, self.channel_names,
+                                             lsl=self.band_power_lsl, port=self.band_power_port,
+                                             **self.band_power_options)
+    
+    def close_band_power(self):
+        band_power, self.band_power = self.band_power, None
+        if band_power is not None:
+            band_power.close()
+    
+    def start_recording(self, path):
+        # Si aún no hay conexión, la grabación se abre al recibir la cabecera
+        self.record_path = path
+        if self.srate is not None:
+            self.open_recorder()
+    
+    def open_recorder(self):
+        self.recorder = StreamRecorder(self.record_path, self.channel_names, self.srate)
+        print(f"Grabando en {self.record_path}")
+    
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        self.record_path = None
+        if recorder is not None:
+            recorder.close()
+            print(f"Grabación cerrada: {recorder.path} ({recorder.n_samples} muestras)")
+    
+    def metrics(self):
+        # Métricas para el endpoint HTTP del modo sin GUI
+        return {
+            'connected': self.connected,
+            'srate': self.srate,
+            'samples_received': self.samples_received,
+            'stream': self.stream_stats.stats(),
+            'pipeline': self.pipeline.stats() if self.pipeline is not None else None,
+        }
+    
+    def format_stats(self):
+        state = "Conectado" if self.connected else "Desconectado"
+        text = f"Estado: {state} | Muestras recibidas: {self.samples_received} | {self.stream_stats.format_stats()}"
+        if self.pipeline is not None:
+            text = f"{text} | {self.pipeline.format_stats()}"
+        if self.band_power is not None:
+            text = f"{text} | {self.band_power.format_stats()}"
+        if self.recorder is not None:
+            text = f"{text} | {self.recorder.format_stats()}"
+        return text
+
+class SocketEEGReceiverGUI:
+    def __init__(self, receiver, fps=20, duration=None):
+        self.receiver = receiver
+        self.n_plot_channels = min(receiver.n_channels, 8)  # Canales visualizados
+        self.fps = fps  # Fotogramas por segundo del gráfico
+        self.duration = duration  # Cierre automático (s), opcional
         
         # Configurar GUI
         self.setup_gui()
-        
+    
     def setup_gui(self):
+        # Tk solo se importa cuando se usa la interfaz gráfica
+        import tkinter as tk
+        from tkinter import ttk
+        from common.gui_bus import GuiBus
+        
         self.root = tk.Tk()
         self.root.title("Receptor EEG - Socket")
         self.root.geometry("800x600")
@@ -35,131 +372,112 @@ class SocketEEGReceiver:
         
         # IP y puerto
         ttk.Label(connection_frame, text="IP:").grid(row=0, column=0, padx=5, pady=5)
-        self.ip_var = tk.StringVar(value="localhost")
+        self.ip_var = tk.StringVar(value=self.receiver.host)
         ttk.Entry(connection_frame, textvariable=self.ip_var, width=15).grid(row=0, column=1, padx=5, pady=5)
         
         ttk.Label(connection_frame, text="Puerto:").grid(row=0, column=2, padx=5, pady=5)
-        self.port_var = tk.StringVar(value="5555")
+        self.port_var = tk.StringVar(value=str(self.receiver.port))
         ttk.Entry(connection_frame, textvariable=self.port_var, width=6).grid(row=0, column=3, padx=5, pady=5)
         
         # Botón de conexión
         self.connect_button = ttk.Button(connection_frame, text="Conectar", command=self.toggle_connection)
         self.connect_button.grid(row=0, column=4, padx=5, pady=5)
         
+        # Protocolo binario (si el servidor no lo soporta se usa JSON)
+        self.binary_var = tk.BooleanVar(value=self.receiver.binary_mode)
+        ttk.Checkbutton(connection_frame, text="Binario", variable=self.binary_var).grid(row=0, column=5, padx=5, pady=5)
+        
+        # Botón de grabación a disco
+        record_text = "Grabar" if self.receiver.record_path is None else "Detener grabación"
+        self.record_button = ttk.Button(connection_frame, text=record_text, command=self.toggle_recording)
+        self.record_button.grid(row=0, column=6, padx=5, pady=5)
+        
         # Estado de la conexión
         self.status_label = ttk.Label(connection_frame, text="Estado: Desconectado")
-        self.status_label.grid(row=0, column=5, padx=5, pady=5)
+        self.status_label.grid(row=0, column=7, padx=5, pady=5)
+        
+        # Tiempo de render por fotograma
+        self.render_label = ttk.Label(connection_frame, text="Render: -")
+        self.render_label.grid(row=0, column=8, padx=5, pady=5)
         
         # Configurar gráfico
         self.setup_plot()
         
-    def setup_plot(self):
-        self.fig, self.axes = plt.subplots(self.n_channels, 1, figsize=(10, 8), sharex=True)
-        self.fig.tight_layout(pad=3.0)
-        
-        # Crear canvas
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        # Configurar subplots
-        channel_names = ['Fp1', 'Fp2', 'C3', 'C4', 'O1', 'O2', 'F7', 'F8']
-        for ax, name in zip(self.axes, channel_names):
-            ax.set_ylabel(name)
-            ax.grid(True)
-        
-        self.axes[-1].set_xlabel('Muestras')
-        
-    def update_plot(self):
-        for i, ax in enumerate(self.axes):
-            ax.clear()
-            ax.plot(list(self.data_buffer[i]))
-            ax.set_ylabel(f'Canal {i+1}')
-            ax.grid(True)
-        
-        self.axes[-1].set_xlabel('Muestras')
-        self.canvas.draw()
+        # Bus de mensajes: el hilo de recepción nunca toca los widgets
+        self.bus = GuiBus(self.root)
+        self.bus.subscribe('connection_lost', self.on_connection_lost, coalesce=True)
+        self.bus.subscribe('status', self.set_status, coalesce=True)
+        self.bus.start()
+        self.receiver.on_connection_lost = lambda sock: self.bus.post('connection_lost', sock)
+        self.receiver.on_status = lambda text: self.bus.post('status', text)
         
-    def receive_data(self):
-        buffer = ""
-        while self.running and self.connected:
-            try:
-                # Recibir datos
-                data = self.socket.recv(4096).decode('utf-8')
-                if not data:
-                    break
-                
-                # Añadir al buffer y procesar líneas completas
-                buffer += data
-                lines = buffer.split('\n')
-                
-                # Procesar todas las líneas completas
-                for i in range(len(lines) - 1):
-                    try:
-                        # Parsear JSON
-                        json_data = json.loads(lines[i])
-                        
-                        # Extraer datos
-                        sample = json_data['data']
-                        
-                        # Actualizar buffer para visualización
-                        for i, value in enumerate(sample):
-                            if i < self.n_channels:
-                                self.data_buffer[i].append(value)
-                        
-                        # Actualizar gráfico cada 10 muestras
-                        if len(self.data_buffer[0]) % 10 == 0:
-                            self.update_plot()
-                    except json.JSONDecodeError:
-                        print(f"Error decodificando JSON: {lines[i]}")
-                    except Exception as e:
-                        print(f"Error procesando datos: {e}")
-                
-                # Guardar la última línea incompleta
-                buffer = lines[-1]
-                
-            except Exception as e:
-                print(f"Error de conexión: {e}")
-                self.disconnect()
-                break
+        # Actualizar tiempo de render periódicamente
+        self.update_render_label()
+    
+    def set_status(self, text):
+        if self.receiver.connected:
+            self.status_label.config(text=text)
+    
+    def update_render_label(self):
+        text = self.plot.format_stats()
+        if self.receiver.pipeline is not None:
+            text = f"{self.receiver.pipeline.format_stats()} | {text}"
+        if self.receiver.connected:
+            text = f"{self.receiver.stream_stats.format_stats()} | {text}"
+        self.render_label.config(text=text)
+        self.root.after(1000, self.update_render_label)
+    
+    def setup_plot(self):
+        # Matplotlib solo se importa cuando se usa la interfaz gráfica
+        from common.plot_engine import EEGPlotEngine
         
+        # Motor de gráficos con blitting, refrescado por un temporizador de Tk
+        names = channel_names(self.n_plot_channels)
+        self.plot = EEGPlotEngine(self.root, self.receiver.data_buffer, names, fps=self.fps)
+    
+    def on_connection_lost(self, sock):
+        # Ignorar avisos de conexiones anteriores ya cerradas
+        if sock is self.receiver.socket and self.receiver.connected:
+            self.disconnect()
+    
     def connect(self):
+        from tkinter import messagebox
+        
         try:
-            ip = self.ip_var.get()
-            port = int(self.port_var.get())
-            
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((ip, port))
-            
-            self.connected = True
-            self.running = True
-            
-            # Iniciar thread para recibir datos
-            self.receive_thread = threading.Thread(target=self.receive_data)
-            self.receive_thread.daemon = True
-            self.receive_thread.start()
+            self.receiver.host = self.ip_var.get()
+            self.receiver.port = int(self.port_var.get())
+            self.receiver.binary_mode = self.binary_var.get()
+            self.receiver.connect()
             
-            self.status_label.config(text=f"Estado: Conectado a {ip}:{port}")
+            self.status_label.config(text=f"Estado: Conectado a {self.receiver.host}:{self.receiver.port}")
             self.connect_button.config(text="Desconectar")
-            
+            self.plot.start()
+        
         except Exception as e:
             messagebox.showerror("Error de conexión", f"No se pudo conectar: {e}")
     
     def disconnect(self):
-        self.running = False
-        self.connected = False
-        
-        if self.socket:
-            try:
-                self.socket.close()
-            except:
-                pass
-            
+        self.receiver.disconnect()
+        self.plot.stop()
         self.status_label.config(text="Estado: Desconectado")
         self.connect_button.config(text="Conectar")
+        self.record_button.config(text="Grabar")
+    
+    def toggle_recording(self):
+        from tkinter import filedialog
+        
+        if self.receiver.record_path is None:
+            path = filedialog.asksaveasfilename(defaultextension=".eegrec",
+                                                filetypes=[("Grabación EEG", "*.eegrec")])
+            if path:
+                self.receiver.start_recording(path)
+                self.record_button.config(text="Detener grabación")
+        else:
+            self.receiver.stop_recording()
+            self.record_button.config(text="Grabar")
     
     def toggle_connection(self):
-        if not self.connected:
+        if not self.receiver.connected:
             self.connect()
         else:
             self.disconnect()
@@ -170,8 +488,28 @@ class SocketEEGReceiver:
     
     def run(self):
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        if self.duration:
+            self.root.after(int(self.duration * 1000), self.on_closing)
         self.root.mainloop()
 
+def main():
+    parser = create_parser("Receptor EEG - Socket", srate=False, network=True, chunk_size=256, record=True, dsp=True,
+                           metrics=True)
+    parser.add_argument('--json', action='store_true', help='Usar siempre el protocolo JSON')
+    parser.add_argument('--no-reconnect', action='store_true',
+                        help='No reconectar automáticamente si se pierde la conexión')
+    args = parser.parse_args()
+    
+    receiver = SocketEEGReceiver(args.channels, args.host, args.port, binary=not args.json,
+                                 max_chunk_len=args.chunk_size, dsp_options=dsp_options(args),
+                                 band_power_lsl=args.band_power, band_power_port=args.band_power_port,
+                                 reconnect=not args.no_reconnect)
+    if args.record:
+        receiver.start_recording(args.record)
+    if args.headless:
+        run_headless(receiver, args.duration, metrics_port=args.metrics_port)
+    else:
+        SocketEEGReceiverGUI(receiver, fps=args.fps, duration=args.duration).run()
+
 if __name__ == "__main__":
-    app = SocketEEGReceiver()
-    app.run() 
\ No newline at end of file
+    main()
@@ -1,109 +1,192 @@
-import numpy as np
-import socket
-import time
+import os
+import sys
 import threading
-import tkinter as tk
-from tkinter import ttk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from collections import deque
 import json
 
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.broadcast_server import SLOW_CLIENT_POLICIES, BroadcastServer
+from common.cli import create_parser, run_headless
+from common.eeg_generator import EEGChunkGenerator, channel_names
+from common.ring_buffer import RingBuffer
+from common.replay import RecordingReplay
+from common.scheduler import create_scheduler
+from common.signal_model import create_generator
+from common.wire_protocol import encode_frame, encode_header
+
 class SocketEEGSimulator:
-    def __init__(self):
+    def __init__(self, n_channels=8, srate=100, chunk_size=10, host='localhost', port=5555, buffer_size=500,
+                 client_queue_size=64, slow_client_policy='drop_oldest', replay=None, speed=1.0,
+                 original_timestamps=False, generator=None):
+        # Una grabación reproducida impone sus canales y su frecuencia
+        self.replay = replay  # RecordingReplay opcional en lugar de la señal simulada
+        if replay is not None:
+            n_channels, srate = replay.n_channels, replay.srate
+        
         # Parámetros de la señal EEG
-        self.srate = 100  # Frecuencia de muestreo (Hz)
-        self.n_channels = 8  # Número de canales
-        self.buffer_size = 500  # Tamaño del buffer para visualización
+        self.srate = srate  # Frecuencia de muestreo (Hz)
+        self.n_channels = n_channels  # Número de canales
+        self.chunk_size = chunk_size  # Muestras generadas por bloque
+        self.buffer_size = buffer_size  # Tamaño del buffer para visualización
+        self.host = host
+        self.port = port
+        self.client_queue_size = client_queue_size  # Tramas en cola por cliente
+        self.slow_client_policy = slow_client_policy  # drop_oldest, drop_newest o disconnect
+        self.speed = speed  # Multiplicador de velocidad (0 = lo más rápido posible)
+        self.original_timestamps = original_timestamps  # Timestamps grabados en lugar de rebasados
         self.running = False
-        self.server_running = False
-        self.clients = []
+        self.sample_index = 0  # Índice de la primera muestra del próximo bloque (continúa tras pausar)
+        self.skipped_samples = 0  # Saltos del planificador ya aplicados al generador
+        self.channel_names = replay.channel_names if replay is not None else channel_names(self.n_channels)
         
-        # Crear buffer circular para cada canal
-        self.data_buffer = [deque(maxlen=self.buffer_size) for _ in range(self.n_channels)]
+        # Generador vectorizado de bloques EEG (p. ej. un SignalModel cargado de un escenario)
+        self.generator = generator or EEGChunkGenerator(self.n_channels, self.srate, self.chunk_size)
         
-        # Configurar socket servidor
-        self.setup_server()
+        # Planificador con deadlines absolutos; también es el reloj de muestras (pylsl.local_clock
+        # si está instalado, para que los receptores comparen con el mismo reloj)
+        self.scheduler = create_scheduler(self.srate, self.chunk_size, self.speed)
         
-        # Configurar GUI
-        self.setup_gui()
+        # Buffer circular preasignado (buffer_size, n_channels)
+        self.data_buffer = RingBuffer(self.buffer_size, self.n_channels)
         
+        # Configurar socket servidor
+        self.setup_server()
+    
     def setup_server(self):
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind(('localhost', 5555))
-        self.server_socket.listen(5)
-        
-        # Iniciar thread para aceptar conexiones
-        self.server_thread = threading.Thread(target=self.accept_connections)
-        self.server_thread.daemon = True
-        self.server_running = True
-        self.server_thread.start()
-        
-        print("Servidor socket iniciado en puerto 5555")
-        
-    def accept_connections(self):
-        while self.server_running:
-            try:
-                client_socket, address = self.server_socket.accept()
-                print(f"Cliente conectado desde {address}")
-                self.clients.append(client_socket)
-            except:
-                break
+        # Servidor asyncio de difusión: la generación solo encola tramas ya codificadas
+        self.server = BroadcastServer(
+            self.host, self.port,
+            binary_header=encode_header(self.channel_names, self.srate),
+            queue_size=self.client_queue_size,
+            policy=self.slow_client_policy
+        )
+        self.server.start()
         
+        print(f"Servidor socket iniciado en {self.host}:{self.port}")
+    
     def generate_eeg_sample(self):
-        # Generar componente de onda alfa (8-13 Hz)
-        t = time.time()
-        alpha = np.sin(2 * np.pi * 10 * t) * 10  # 10 Hz onda alfa
-        
-        # Generar ruido para cada canal
-        noise = np.random.normal(0, 2, self.n_channels)
-        
-        # Combinar señal y ruido
-        sample = noise + alpha
-        return sample
-        
+        # Generar una única muestra (onda alfa de 10 Hz + ruido)
+        return self.generator.next_chunk(1)[0]
+    
+    def generate_eeg_chunk(self, n_samples=None):
+        # Generar un bloque (n_samples, n_channels) de muestras
+        return self.generator.next_chunk(n_samples)
+    
+    def next_block(self, n_samples):
+        # Bloque simulado o reproducido, con timestamps grabados si se piden
+        if self.replay is None:
+            return self.generate_eeg_chunk(n_samples), None
+        chunk, timestamps = self.replay.next_chunk(n_samples)
+        return chunk, (timestamps if self.original_timestamps else None)
+    
+    def skip_lost_samples(self):
+        # Muestras saltadas por el planificador al ir con retraso: la señal simulada y la reproducción
+        # las saltan también, para que su posición coincida con los timestamps
+        skipped = self.scheduler.skipped_samples - self.skipped_samples
+        if skipped:
+            self.skipped_samples += skipped
+            self.sample_index += skipped
+            if self.replay is None:
+                self.generator.skip(skipped)
+            else:
+                self.replay.skip(skipped)
+    
     def stream_data(self):
+        self.scheduler.start()
+        self.skipped_samples = 0
         while self.running:
-            sample = self.generate_eeg_sample()
+            # Esperar al siguiente deadline (puede pedir varios bloques si vamos tarde)
+            n_samples, _ = self.scheduler.wait()
+            self.skip_lost_samples()
+            chunk, original = self.next_block(n_samples)
+            if not len(chunk):
+                self.running = False  # Fin de la reproducción
+                break
+            if len(chunk) < n_samples:
+                # Bloque corto (fin de la grabación o vuelta del bucle): se devuelve lo no emitido
+                self.scheduler.give_back(n_samples - len(chunk))
             
-            # Enviar muestra a través de socket a todos los clientes conectados
-            if self.clients:
-                # Convertir a lista y luego a JSON
-                sample_list = sample.tolist()
-                data_to_send = json.dumps({
-                    'timestamp': time.time(),
-                    'data': sample_list,
-                    'channels': ['Fp1', 'Fp2', 'C3', 'C4', 'O1', 'O2', 'F7', 'F8']
-                })
-                
-                # Enviar a todos los clientes
-                disconnected_clients = []
-                for client in self.clients:
-                    try:
-                        client.send((data_to_send + '\n').encode())
-                    except:
-                        disconnected_clients.append(client)
+            # Secuencia y timestamps del reloj de muestras, fijados al generar el bloque: la secuencia
+            # avanza con lo enviado y las muestras saltadas por retraso aparecen como huecos en el receptor
+            seq = self.sample_index
+            self.sample_index += len(chunk)
+            timestamps = self.scheduler.timestamps(len(chunk)) if original is None else original
+            send_time = float(timestamps[-1])
+            
+            # Enviar el bloque a través de socket a todos los clientes conectados
+            modes = self.server.client_modes()
+            if modes:
+                # Codificar cada protocolo una sola vez por bloque
+                frames = {}
+                if 'binary' in modes:
+                    frames['binary'] = encode_frame(seq, send_time, chunk)
+                if 'json-chunks' in modes:
+                    # Clientes que lo pidieron en el saludo: un mensaje por bloque ('data' es una lista de muestras)
+                    data_to_send = json.dumps({
+                        'seq': seq,  # Índice de la primera muestra del bloque
+                        'timestamp': send_time,  # Timestamp de la última muestra
+                        'srate': self.srate,
+                        'data': chunk.tolist(),
+                        'channels': self.channel_names
+                    })
+                    frames['json-chunks'] = (data_to_send + '\n').encode()
+                if 'json' in modes:
+                    # Clientes antiguos: una línea por muestra con 'data' plano, como siempre
+                    lines = [json.dumps({
+                        'seq': seq + k,
+                        'timestamp': float(timestamps[k]),
+                        'srate': self.srate,
+                        'data': sample,
+                        'channels': self.channel_names
+                    }) for k, sample in enumerate(chunk.tolist())]
+                    frames['json'] = ('\n'.join(lines) + '\n').encode()
                 
-                # Eliminar clientes desconectados
-                for client in disconnected_clients:
-                    if client in self.clients:
-                        self.clients.remove(client)
+                # Entregar las mismas tramas a la cola de cada cliente sin bloquear
+                self.server.broadcast(frames)
             
             # Actualizar buffer para visualización
-            for i, value in enumerate(sample):
-                self.data_buffer[i].append(value)
-            
-            # Actualizar gráfico cada 10 muestras
-            if len(self.data_buffer[0]) % 10 == 0:
-                self.update_plot()
-            
-            # Esperar para mantener la frecuencia de muestreo
-            time.sleep(1.0/self.srate)
+            self.data_buffer.extend(chunk, timestamps)
+    
+    def start(self):
+        if not self.running:
+            if self.replay is not None and self.replay.finished:
+                self.replay.rewind()
+            self.running = True
+            self.stream_thread = threading.Thread(target=self.stream_data)
+            self.stream_thread.daemon = True
+            self.stream_thread.start()
+    
+    def stop(self):
+        self.running = False
+    
+    def close(self):
+        self.running = False
+        
+        # Cerrar todas las conexiones y el servidor
+        self.server.stop()
+    
+    def format_stats(self):
+        if self.replay is not None:
+            return f"{self.scheduler.format_stats()} | {self.replay.format_stats()} | {self.server.format_stats()}"
+        return f"{self.scheduler.format_stats()} | {self.server.format_stats()}"
+
+class SocketEEGSimulatorGUI:
+    def __init__(self, simulator, fps=20, duration=None):
+        self.simulator = simulator
+        self.n_plot_channels = min(simulator.n_channels, 8)  # Canales visualizados
+        self.fps = fps  # Fotogramas por segundo del gráfico
+        self.duration = duration  # Cierre automático (s), opcional
+        
+        # Configurar GUI
+        self.setup_gui()
     
     def setup_gui(self):
+        # Tk solo se importa cuando se usa la interfaz gráfica
+        import tkinter as tk
+        from tkinter import ttk
+        
         self.root = tk.Tk()
-        self.root.title("Simulador EEG - Socket (Puerto 5555)")
+        self.root.title(f"Simulador EEG - Socket (Puerto {self.simulator.port})")
         self.root.geometry("800x600")
         
         # Frame de control
@@ -118,6 +201,10 @@ class SocketEEGSimulator:
         self.status_label = ttk.Label(control_frame, text="Estado: Detenido")
         self.status_label.pack(side=tk.LEFT, padx=5)
         
+        # Tasa efectiva, jitter del planificador y tiempo de render
+        self.rate_label = ttk.Label(control_frame, text="Tasa: -")
+        self.rate_label.pack(side=tk.LEFT, padx=5)
+        
         # Clientes conectados
         self.clients_label = ttk.Label(control_frame, text="Clientes: 0")
         self.clients_label.pack(side=tk.LEFT, padx=5)
@@ -125,75 +212,75 @@ class SocketEEGSimulator:
         # Configurar gráfico
         self.setup_plot()
         
-        # Actualizar contador de clientes periódicamente
+        # Actualizar contador de clientes y tasa efectiva periódicamente
         self.update_client_count()
-        
+        self.update_rate_label()
+    
     def update_client_count(self):
-        self.clients_label.config(text=f"Clientes: {len(self.clients)}")
+        self.clients_label.config(text=f"Clientes: {self.simulator.server.client_count()}")
         self.root.after(1000, self.update_client_count)
-        
+    
+    def update_rate_label(self):
+        if self.simulator.running:
+            self.rate_label.config(text=f"{self.simulator.scheduler.format_stats()} | {self.plot.format_stats()}")
+        elif self.plot.running:
+            # La reproducción terminó sola: dejar la interfaz como detenida
+            self.plot.stop()
+            self.toggle_button.config(text="Iniciar")
+            self.status_label.config(text="Estado: Reproducción terminada")
+        self.root.after(1000, self.update_rate_label)
+    
     def setup_plot(self):
-        self.fig, self.axes = plt.subplots(self.n_channels, 1, figsize=(10, 8), sharex=True)
-        self.fig.tight_layout(pad=3.0)
-        
-        # Crear canvas
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        # Configurar subplots
-        channel_names = ['Fp1', 'Fp2', 'C3', 'C4', 'O1', 'O2', 'F7', 'F8']
-        for ax, name in zip(self.axes, channel_names):
-            ax.set_ylabel(name)
-            ax.grid(True)
-        
-        self.axes[-1].set_xlabel('Muestras')
-        
-    def update_plot(self):
-        for i, ax in enumerate(self.axes):
-            ax.clear()
-            ax.plot(list(self.data_buffer[i]))
-            ax.set_ylabel(f'Canal {i+1}')
-            ax.grid(True)
-        
-        self.axes[-1].set_xlabel('Muestras')
-        self.canvas.draw()
+        # Matplotlib solo se importa cuando se usa la interfaz gráfica
+        from common.plot_engine import EEGPlotEngine
         
+        # Motor de gráficos con blitting, refrescado por un temporizador de Tk
+        names = self.simulator.channel_names[:self.n_plot_channels]
+        self.plot = EEGPlotEngine(self.root, self.simulator.data_buffer, names, fps=self.fps)
+    
     def toggle_streaming(self):
-        if not self.running:
-            self.running = True
+        if not self.simulator.running:
+            self.simulator.start()
             self.toggle_button.config(text="Detener")
             self.status_label.config(text="Estado: Transmitiendo")
-            self.stream_thread = threading.Thread(target=self.stream_data)
-            self.stream_thread.daemon = True
-            self.stream_thread.start()
+            self.plot.start()
         else:
-            self.running = False
+            self.simulator.stop()
+            self.plot.stop()
             self.toggle_button.config(text="Iniciar")
             self.status_label.config(text="Estado: Detenido")
     
     def on_closing(self):
-        self.running = False
-        self.server_running = False
-        
-        # Cerrar todas las conexiones
-        for client in self.clients:
-            try:
-                client.close()
-            except:
-                pass
-        
-        try:
-            self.server_socket.close()
-        except:
-            pass
-            
+        self.simulator.close()
         self.root.destroy()
     
     def run(self):
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        if self.duration:
+            self.root.after(int(self.duration * 1000), self.on_closing)
         self.root.mainloop()
 
+def main():
+    parser = create_parser("Simulador EEG - Socket", network=True, replay=True, scenario=True)
+    parser.add_argument('--client-queue', type=int, default=64, help='Tramas en cola por cliente')
+    parser.add_argument('--slow-client-policy', choices=SLOW_CLIENT_POLICIES, default='drop_oldest',
+                        help='Qué hacer cuando la cola de un cliente lento se llena')
+    args = parser.parse_args()
+    
+    replay = RecordingReplay(args.replay, loop=args.loop) if args.replay else None
+    generator = create_generator(args.channels, args.srate, args.chunk_size, args.scenario, args.seed)
+    simulator = SocketEEGSimulator(args.channels, args.srate, args.chunk_size, args.host, args.port,
+                                   client_queue_size=args.client_queue,
+                                   slow_client_policy=args.slow_client_policy, replay=replay,
+                                   speed=args.speed, original_timestamps=args.original_timestamps,
+                                   generator=generator)
+    if args.headless:
+        try:
+            run_headless(simulator, args.duration)
+        finally:
+            simulator.close()
+    else:
+        SocketEEGSimulatorGUI(simulator, fps=args.fps, duration=args.duration).run()
+
 if __name__ == "__main__":
-    app = SocketEEGSimulator()
-    app.run() 
\ No newline at end of file
+    main()
@@ -1,12 +1,38 @@
-from pylsl import StreamInlet, resolve_stream
-#Resolve the stream on the network
-streams= resolve_stream('type', 'EEG')
+import os
+import sys
+import time
+from pylsl import StreamInlet
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.lsl_chunks import ChunkedInlet
+from common.stream_discovery import ConnectionTimer, StreamDiscovery
+
+#Resolve the stream on the network (short timeouts, retried until it appears)
+timer= ConnectionTimer()
+discovery= StreamDiscovery()
+print("Looking for an EEG stream...")
+info= discovery.wait_for(type='EEG')
+timer.mark('resolved')
 #Create an inlet to recieve data
 
-inlet= StreamInlet(streams[0])
+inlet= StreamInlet(info)
+inlet.open_stream()
+timer.mark('opened')
+#Pull whole chunks into a preallocated array
+reader= ChunkedInlet(inlet, max_chunk_len=1024, timeout=0.2)
 
 print ("Now receiving data...")
 
+last_report= time.monotonic()
 while True:
-    sample, timestamp= inlet.pull_sample()
-    print("fTimestamp: {timestamp}, Sample: {sample}")
+    chunk, timestamps= reader.pull()
+    if len(chunk):
+        if 'first_sample' not in timer.marks:
+            timer.mark('first_sample')
+            print(timer.format_stats())
+        print(f"Timestamp: {timestamps[-1]:.3f}, Chunk: {chunk.shape[0]} samples x {chunk.shape[1]} channels")
+    #Report throughput and chunk sizes every 5 seconds
+    if time.monotonic() - last_report >= 5.0:
+        last_report= time.monotonic()
+        print(reader.format_stats())
@@ -2,13 +2,29 @@ import serial
 import serial.tools.list_ports
 import tkinter as tk
 from tkinter import ttk, messagebox
-from pylsl import StreamInlet, resolve_stream
+from pylsl import StreamInlet
 import threading
+import os
+import sys
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.gui_bus import GuiBus
+from common.serial_reader import SerialReader, TelemetryOutlet
+from common.serial_writer import SerialWriter
+from common.stream_discovery import ConnectionTimer, StreamDiscovery
 
 # Variables globales
 arduino = None  # Objeto para la conexión serial
 inlet = None    # Stream inlet para LSL
 
+MAX_LINEAS_LOG = 1000  # Líneas conservadas en el área de mensajes
+COLA_SERIE = 64  # Comandos pendientes como máximo en el escritor serie
+POLITICA_SERIE = 'drop_oldest'  # drop_oldest, drop_newest o block (contrapresión)
+SECUENCIA_SERIE = False  # Prefijar "@<seq> " a cada comando; el Arduino responde "ACK <seq>"
+FORMATO_TELEMETRIA = 'line'  # 'line' ("T v1,v2") o 'binary' (tramas con checksum)
+STREAM_COMANDOS = 'ArduinoCommands3'  # Nombre del stream que publica lsl_student.py
+
 # Función para detectar los puertos disponibles
 def detectar_puertos():
     ports = serial.tools.list_ports.comports()
@@ -23,25 +39,52 @@ def conectar_arduino():
     if port and baudrate:
         try:
             arduino = serial.Serial(port, int(baudrate), timeout=1)
+            writer.set_port(arduino)
+            reader.set_port(arduino)
             messagebox.showinfo("Conexión", f"Conectado a {port} con {baudrate} baud.")
         except serial.SerialException:
             messagebox.showerror("Error", "No se pudo conectar al puerto seleccionado.")
     else:
         messagebox.showwarning("Advertencia", "Seleccione un puerto y un baudrate.")
 
+# Función para registrar los comandos ya escritos (desde el hilo escritor)
+def comandos_escritos(comandos):
+    for comando in comandos:
+        bus.post('log', f"Enviado a Arduino: {comando}")
+
+# Función para publicar la telemetría del Arduino (desde el hilo lector)
+def telemetria_recibida(valores):
+    telemetria.push(valores)
+
+# Función para mostrar el histograma de RTT de los comandos confirmados
+def mostrar_rtt():
+    bus.post('log', writer.format_rtt_histogram())
+
+# Función para actualizar las métricas del puerto serie (hilo de Tk)
+def actualizar_metricas():
+    metricas_label.config(text=writer.format_stats())
+    root.after(1000, actualizar_metricas)
+
+# Función para mostrar mensajes en lote (se ejecuta en el hilo de Tk)
+def mostrar_mensajes(mensajes):
+    mensaje_recibido.insert(tk.END, "".join(f"{m}\n" for m in mensajes))
+    mensaje_recibido.delete("1.0", f"end-{MAX_LINEAS_LOG + 1}l")
+    mensaje_recibido.see(tk.END)
+
 # Función para recibir datos LSL
 def receive_lsl_data():
     global inlet, arduino
     
-    print("Buscando stream LSL 'ArduinoCommands3'...")
-    streams = resolve_stream('name', 'ArduinoCommands6')
+    # Búsqueda con timeouts cortos en la caché del descubrimiento (no bloquea para siempre en resolve)
+    print(f"Buscando stream LSL '{STREAM_COMANDOS}'...")
+    timer = ConnectionTimer()
+    info = discovery.wait_for(name=STREAM_COMANDOS)
+    timer.mark('resolved')
     
-    if not streams:
-        print("No se encontró el stream LSL")
-        return
-        
-    inlet = StreamInlet(streams[0])
-    print("Stream LSL encontrado y conectado")
+    inlet = StreamInlet(info)
+    inlet.open_stream()
+    timer.mark('opened')
+    print(f"Stream LSL encontrado y conectado ({timer.format_stats()})")
     
     while True:
         try:
@@ -49,16 +92,18 @@ def receive_lsl_data():
             sample, timestamp = inlet.pull_sample()
             if sample:
                 message = sample[0]  # El primer elemento del sample es nuestro comando
+                if 'first_sample' not in timer.marks:
+                    timer.mark('first_sample')
+                    bus.post('log', timer.format_stats())
                 
                 # Mostrar el mensaje recibido en la interfaz
-                mensaje_recibido.insert(tk.END, f"Mensaje recibido: {message}\n")
-                mensaje_recibido.see(tk.END)
+                bus.post('log', f"Mensaje recibido: {message}")
                 
                 # Si Arduino está conectado, enviar el mensaje
                 if arduino and arduino.is_open:
-                    arduino.write((message + "\n").encode())
-                    mensaje_recibido.insert(tk.END, f"Enviado a Arduino: {message}\n")
-                    mensaje_recibido.see(tk.END)
+                    # El hilo escritor hace el write; aquí solo se encola
+                    if not writer.send(message):
+                        bus.post('log', f"Descartado (cola serie llena): {message}")
                 
         except Exception as e:
             print(f"Error al recibir datos LSL: {e}")
@@ -91,6 +136,13 @@ baudrate_dropdown.grid(row=1, column=1, padx=5, pady=5)
 # Botón para conectar
 ttk.Button(frame_conexion, text="Conectar", command=conectar_arduino).grid(row=1, column=2, padx=5, pady=5)
 
+# Botón para ver el histograma de RTT (requiere SECUENCIA_SERIE)
+ttk.Button(frame_conexion, text="RTT", command=mostrar_rtt).grid(row=2, column=2, padx=5, pady=5)
+
+# Métricas del escritor serie (cola, throughput, descartes)
+metricas_label = ttk.Label(frame_conexion, text="Cola: -")
+metricas_label.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
 # Frame para mostrar mensajes recibidos
 frame_mensajes = ttk.LabelFrame(root, text="Mensajes Recibidos")
 frame_mensajes.pack(pady=10, padx=10, fill="both", expand=True)
@@ -104,6 +156,32 @@ scrollbar = ttk.Scrollbar(frame_mensajes, command=mensaje_recibido.yview)
 scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 mensaje_recibido.config(yscrollcommand=scrollbar.set)
 
+# Bus de mensajes: los hilos de red solo encolan, Tk vacía la cola por lotes
+bus = GuiBus(root)
+bus.subscribe('log', mostrar_mensajes)
+bus.start()
+
+# Descubrimiento de streams LSL en segundo plano: avisa cuando el estudiante aparece o se va
+discovery = StreamDiscovery()
+discovery.on_appear = lambda info: bus.post('log', f"Stream LSL disponible: {info.name()} ({info.hostname()})")
+discovery.on_vanish = lambda info: bus.post('log', f"Stream LSL desaparecido: {info.name()}")
+discovery.start()
+
+# Escritor serie en su propio hilo: cola acotada, fusión de consignas y métricas
+writer = SerialWriter(COLA_SERIE, POLITICA_SERIE, seq_ids=SECUENCIA_SERIE)
+writer.on_written = comandos_escritos
+writer.on_error = lambda e: bus.post('log', f"Error de escritura serie: {e}")
+writer.start()
+
+# Lector serie en su propio hilo: ACK (RTT por comando), telemetría (LSL) y mensajes del Arduino
+telemetria = TelemetryOutlet()
+reader = SerialReader(FORMATO_TELEMETRIA)
+reader.on_ack = writer.acknowledge
+reader.on_telemetry = telemetria_recibida
+reader.on_line = lambda linea: bus.post('log', f"Arduino: {linea}")
+reader.start()
+actualizar_metricas()
+
 # Iniciar el receptor LSL en un hilo separado
 lsl_thread = threading.Thread(target=receive_lsl_data, daemon=True)
 lsl_thread.start()
@@ -1,13 +1,26 @@
-from pylsl import StreamInfo, StreamOutlet
-import time
+import os
+import sys
+from pylsl import StreamInfo, StreamOutlet, local_clock
 import random
+
+# Permitir importar los módulos compartidos de common/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.scheduler import DeadlineScheduler
+
 # Define String info
 info=StreamInfo('EEG', 'EEG', 8, 100, 'float32', 'myuid34234')
 #Create an outlet for streaming
 outlet= StreamOutlet(info)
+#Pace the stream against absolute deadlines (100 Hz)
+scheduler= DeadlineScheduler(100, chunk_size=1, clock=local_clock)
 print("Now sending data...")
 #Send random data to the stream
+last_report= local_clock()
 while True:
-    sample= [random.random() for _ in range(8)]
-    outlet.push_sample(sample)
-    time.sleep(0.01)
+    n_samples, timestamp= scheduler.wait()
+    chunk= [[random.random() for _ in range(8)] for _ in range(n_samples)]
+    outlet.push_chunk(chunk, timestamp)
+    #Report achieved rate and jitter every 5 seconds
+    if local_clock() - last_report >= 5.0:
+        last_report= local_clock()
+        print(scheduler.format_stats())
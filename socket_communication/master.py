@@ -35,6 +35,8 @@ def start_server():
     
     while True:
         client_socket, address = server.accept()
+        # Responder sin esperar a agrupar (Nagle) / Reply without Nagle delay
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         client_handler = threading.Thread(target=handle_client, args=(client_socket, address))
         client_handler.start()
 
@@ -18,6 +18,8 @@ def receive_messages(client_socket):
 
 def start_client():
     client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Enviar cada mensaje sin esperar a agruparlo (Nagle) / Send each message immediately
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     
     try:
         client.connect(('localhost', 5555))